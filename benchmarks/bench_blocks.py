@@ -0,0 +1,34 @@
+# Compares serial and block parallel sanitising (with a pointify pass)
+# of a program with many blocks, made by tiling the given file.
+# usage: python benchmarks/bench_blocks.py file.nc [copies] [workers]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gml import GrblConfig, GrblCommand
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: python benchmarks/bench_blocks.py file.nc [copies] [workers]")
+        return
+    copies = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else (os.cpu_count() or 1)
+    with open(sys.argv[1], "r") as f:
+        text = f.read()
+    lines = (text + "\n") * copies
+    outputs = []
+    for w in (0, workers):
+        config = GrblConfig.current().replace(block_workers=w)
+        c = GrblCommand.slurp(lines, config)
+        start = time.perf_counter()
+        blocks = c.getBlocks([("pointify", [])])
+        elapsed = time.perf_counter() - start
+        outputs.append([str(b.getFirst()) + str(b.getLength()) for b in blocks])
+        print("workers {:3d} : {:8.2f} s ({} blocks)".format(w, elapsed, len(blocks)))
+    print("identical   : " + str(outputs[0] == outputs[1]))
+
+
+if __name__ == "__main__":
+    main()
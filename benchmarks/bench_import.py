@@ -0,0 +1,36 @@
+# Measures how long a fresh interpreter takes to import the gml core
+# and checks that doing so does not pull in the svg reader.
+# usage: python benchmarks/bench_import.py [runs]
+import os
+import sys
+import subprocess
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHECK = "import sys, gml; assert 'gml.svgread' not in sys.modules, 'svg reader imported eagerly'"
+
+
+def timeRun(code: str, runs: int) -> float:
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+        t = time.perf_counter() - start
+        if best is None or t < best:
+            best = t
+    return best
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    base = timeRun("pass", runs)
+    core = timeRun(CHECK, runs)
+    print("interpreter startup : {:8.2f} ms".format(base * 1000))
+    print("import gml          : {:8.2f} ms".format(core * 1000))
+    print("import cost         : {:8.2f} ms (best of {})".format((core - base) * 1000, runs))
+    svg = timeRun("import gml.svgread", runs)
+    print("svg reader (lazy)   : {:8.2f} ms".format((svg - core) * 1000))
+
+
+if __name__ == "__main__":
+    main()
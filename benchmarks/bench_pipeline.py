@@ -0,0 +1,49 @@
+# Times applying setCutSpeed, setFastTravelSpeed, setEvacuateHeight,
+# setPenetrateSpeed, setPenetrateDepth, translate and scale one after the
+# other (a walk of the chain each) and as a single gml.pipeline.GrblPipeline
+# (fused into one walk), checking both give the same program.
+# usage: python benchmarks/bench_pipeline.py [blocks] [moves per block]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gml import GrblCommand
+from gml.pipeline import GrblPipeline
+
+passes = [("setCutSpeed", [150]), ("setFastTravelSpeed", [900]), ("setEvacuateHeight", [2]), ("setPenetrateSpeed", [40]),
+          ("setPenetrateDepth", [0.5]), ("translate", [10, 5]), ("scale", [1.5])]
+
+
+def build(blocks: int, moves: int) -> GrblCommand:
+    first = c = GrblCommand("G21")
+    for b in range(blocks):
+        c = c.appendObject(GrblCommand("G00 Z1.000000"))
+        c = c.appendObject(GrblCommand("G00 X{} Y0".format(b)))
+        c = c.appendObject(GrblCommand("G01 Z-0.350000 F100.0(Penetrate)"))
+        for k in range(moves):
+            c = c.appendObject(GrblCommand("G01 X{} Y{} Z-0.350000 F400".format(b + k * 0.01, k * 0.1)))
+    return first
+
+
+def main():
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    moves = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    a = build(blocks, moves)
+    b = build(blocks, moves)
+    start = time.perf_counter()
+    for name, args in passes:
+        getattr(a, name)(*args)
+    separate = time.perf_counter() - start
+    start = time.perf_counter()
+    GrblPipeline(passes).run(b)
+    fused = time.perf_counter() - start
+    if a.getLast().__str__() != b.getLast().__str__() or a.getLength() != b.getLength():
+        raise ValueError("fused and separate passes disagree")
+    print("{} lines, {} passes".format(a.getLength(), len(passes)))
+    print("separate: {:8.2f} ms".format(separate * 1000))
+    print("fused   : {:8.2f} ms".format(fused * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# Times saving and (memory mapped) loading of a large program in the
+# GML binary format.
+# usage: python benchmarks/bench_program.py file.nc [lines]
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gml import GrblCommand
+from gml.program import GrblProgram
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: python benchmarks/bench_program.py file.nc [lines]")
+        return
+    lines = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+    small = GrblCommand.slurpFile(sys.argv[1]).sanitise().toProgram()
+    # tile the program until it has (about) the requested number of lines
+    reps = max(1, lines // small.getLength())
+    n = small.getLength()
+    block = np.concatenate([np.where(small.block > -1, small.block + r * small.getBlockCount(), -1) for r in range(reps)]).astype(np.int32)
+    big = GrblProgram(np.tile(small.vals, reps), np.tile(small.intmask, reps), np.tile(small.flags, reps),
+                      block, np.tile(small.blockIndex, reps))
+    path = os.path.join(tempfile.mkdtemp(), "bench.gmlb")
+    start = time.perf_counter()
+    big.save(path)
+    saved = time.perf_counter() - start
+    start = time.perf_counter()
+    p = GrblProgram.load(path)
+    loaded = time.perf_counter() - start
+    start = time.perf_counter()
+    xmax = float(np.nanmax(p.getColumn("X")))
+    scanned = time.perf_counter() - start
+    print("{} lines ({} blocks), {:.1f} MB".format(reps * n, p.getBlockCount(), os.path.getsize(path) / 1e6))
+    print("save        : {:8.2f} ms".format(saved * 1000))
+    print("load (mmap) : {:8.2f} ms".format(loaded * 1000))
+    print("scan X      : {:8.2f} ms (max {:.3f})".format(scanned * 1000, xmax))
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
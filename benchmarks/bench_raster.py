@@ -0,0 +1,36 @@
+# Times converting a grayscale image to laser scanlines and writing them.
+# Without an image file a (worst case) noisy image of the given size is used.
+# usage: python benchmarks/bench_raster.py [image.png | size] [pixel_size]
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gml.raster import GrblRaster
+
+
+def main():
+    arg = sys.argv[1] if len(sys.argv) > 1 else "4000"
+    pixel_size = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    if arg.isdigit():
+        size = int(arg)
+        image = (np.random.default_rng(0).random((size, size)) ** 3 * 255).astype(np.uint8)
+    else:
+        image = GrblRaster.loadImage(arg)
+    start = time.perf_counter()
+    raster = GrblRaster(image, pixel_size)
+    converted = time.perf_counter() - start
+    path = os.path.join(tempfile.mkdtemp(), "raster.nc")
+    start = time.perf_counter()
+    lines = raster.burp(path)
+    written = time.perf_counter() - start
+    print("image      : {} x {}".format(image.shape[1], image.shape[0]))
+    print("convert    : {:8.2f} s ({} runs)".format(converted, raster.getRunCount()))
+    print("write      : {:8.2f} s ({} lines, {:.1f} MB)".format(written, lines, os.path.getsize(path) / 1e6))
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# Times looking up commands by index (getAt and getIndex) and inserting
+# and deleting commands at random places in a long chain, with the chain
+# indexed by gml.sequence.CommandSequence.
+# usage: python benchmarks/bench_sequence.py [commands] [operations]
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gml import GrblCommand
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    ops = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    rng = random.Random(0)
+    first = c = GrblCommand("G01 X0 Y0")
+    for k in range(1, n):
+        c = c.appendObject(GrblCommand("G01 X{} Y0".format(k)))
+    start = time.perf_counter()
+    length = first.getLength()
+    indexed = time.perf_counter() - start
+    start = time.perf_counter()
+    for k in range(ops):
+        i = rng.randrange(length)
+        if first.getAt(i).getIndex() != i:
+            raise ValueError("getAt and getIndex disagree at {}".format(i))
+    lookups = time.perf_counter() - start
+    start = time.perf_counter()
+    for k in range(ops):
+        c = first.getAt(rng.randrange(1, first.getLength() - 1))
+        if k % 2:
+            c.delete()
+        else:
+            c.insertObjectAfter(GrblCommand("G01 X0 Y1"))
+        first.getIndex()
+    edits = time.perf_counter() - start
+    print("{} commands, {} operations".format(n, ops))
+    print("index         : {:8.2f} ms".format(indexed * 1000))
+    print("getAt+getIndex: {:8.2f} ms".format(lookups * 1000))
+    print("insert/delete : {:8.2f} ms".format(edits * 1000))
+
+
+if __name__ == "__main__":
+    main()
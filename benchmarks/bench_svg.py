@@ -0,0 +1,57 @@
+# Times reading a dense SVG (many small shapes of béziers, arcs and lines)
+# straight into a columnar program, and the old route through svg-to-gcode
+# and GCODE text when that library is installed.
+# usage: python benchmarks/bench_svg.py [file.svg | shapes]
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gml.command import GrblCommand, GrblConfig
+from gml.svgread import GrblSvgReader
+
+
+# writes an svg of shapes on a grid, each a closed path of cubic and
+# quadratic béziers, an arc and lines
+def makeSvg(path: str, shapes: int):
+    rng = np.random.default_rng(0)
+    side = int(np.ceil(np.sqrt(shapes)))
+    with open(path, "w") as f:
+        f.write('<svg xmlns="http://www.w3.org/2000/svg" width="{0}mm" height="{0}mm" viewBox="0 0 {0} {0}">\n'.format(side * 10))
+        for k in range(shapes):
+            x, y = (k % side) * 10 + 1, (k // side) * 10 + 1
+            a = rng.random(6) * 3
+            f.write('<path d="M{:.3f} {:.3f} c{:.3f} -2 {:.3f} 4 6 0 q2 {:.3f} 2 4 a2 2 0 0 1 -3 3 l-3 {:.3f} z"/>\n'.format(x, y + 1, a[0], a[1], a[2], -a[3]))
+        f.write('</svg>\n')
+
+
+def main():
+    arg = sys.argv[1] if len(sys.argv) > 1 else "20000"
+    path = arg
+    if arg.isdigit():
+        path = os.path.join(tempfile.mkdtemp(), "dense.svg")
+        makeSvg(path, int(arg))
+    config = GrblConfig.current()
+    start = time.perf_counter()
+    program = GrblSvgReader.read(path, config)
+    read = time.perf_counter() - start
+    print("svg        : {:.1f} MB".format(os.path.getsize(path) / 1e6))
+    print("read       : {:8.2f} s ({} rows, {} blocks)".format(read, program.getLength(), len(program.blocks)))
+    try:
+        from svg_to_gcode.svg_parser import parse_file
+        from svg_to_gcode.compiler import Compiler, interfaces
+    except ImportError:
+        print("svg-to-gcode is not installed, skipping the old route")
+        return
+    start = time.perf_counter()
+    compiler = Compiler(interfaces.Gcode, movement_speed=config.fast_travel_speed, cutting_speed=config.cut_speed, pass_depth=config.depth_step * -1)
+    compiler.append_curves(parse_file(path))
+    commands = GrblCommand.slurp(compiler.compile(passes=1), config)
+    old = time.perf_counter() - start
+    print("old route  : {:8.2f} s ({} commands)".format(old, commands.getLength()))
+
+
+if __name__ == "__main__":
+    main()
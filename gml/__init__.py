@@ -0,0 +1,8 @@
+"""
+    GML - GCode Markup Language
+    Importing this package is cheap and has no side effects, the svg backend
+    and batch processing (gml.batch) are only loaded when they are used.
+"""
+from gml.command import GrblConfig, GrblCommand, Processor
+
+__all__ = ["GrblConfig", "GrblCommand", "Processor"]
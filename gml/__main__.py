@@ -0,0 +1,5 @@
+# python -m gml "jobs/*.nc" -s cut_speed=150 -t pointify
+import sys
+from gml.batch import main
+
+sys.exit(main())
@@ -0,0 +1,230 @@
+# pylint: disable = line-too-long, broad-except
+
+from typing import List
+import re
+import dataclasses
+import os
+import sys
+import glob
+import time
+import argparse
+import concurrent.futures
+from gml.command import GrblConfig, GrblCommand, Processor
+from gml.cache import GrblCache
+from gml.pipeline import GrblPipeline
+
+
+class Batch():
+    """
+        Processes many .nc (GCodeTools) and .svg files across a pool of processes.
+        Each file is processed (processGrbl or Processor.processSvg) and then
+        has a chain of transforms applied to it (see gml.pipeline.GrblPipeline)
+        before being written out.
+        Failures are isolated per file and every file is timed.
+    """
+    # the GrblCommand methods which may be used as transforms
+    transforms = ["translate", "rotate", "scale", "dilate", "offset", "compensate", "hatch", "pocket", "level", "merge", "pointify", "despeckle", "extrude", "reverseBlocks",
+                  "setCutSpeed", "setFastTravelSpeed", "setEvacuateHeight", "setPenetrateSpeed", "setPenetrateDepth"]
+    # the file extensions which are picked up when a directory is given
+    extensions = [".nc", ".svg"]
+    # appended to the name of each input file to form the output file name
+    suffix = "_"
+
+    # parses a single command line value into a bool, int, float or string
+    @staticmethod
+    def parseValue(s: str) -> any:
+        if s.lower() in ["true", "false"]:
+            return s.lower() == "true"
+        try:
+            return int(s)
+        except ValueError:
+            pass
+        try:
+            return float(s)
+        except ValueError:
+            return s
+
+    # parses "rotate 45 0 0" (or "rotate:45,0,0") into ("rotate", [45, 0, 0])
+    @staticmethod
+    def parseTransform(spec: str) -> tuple:
+        if not spec or not spec.strip():
+            raise ValueError("must supply a transform")
+        parts = re.split("[\\s:,]+", spec.strip())
+        name = parts[0]
+        if name not in Batch.transforms:
+            raise ValueError("unknown transform '" + name + "' (must be one of " + ", ".join(Batch.transforms) + ")")
+        return (name, [Batch.parseValue(p) for p in parts[1:] if p])
+
+    # parses "cut_speed=150" into ("cut_speed", 150)
+    # only GrblConfig settings may be set
+    @staticmethod
+    def parseSetting(spec: str) -> tuple:
+        if not spec or "=" not in spec:
+            raise ValueError("settings must be given as name=value")
+        name, value = spec.split("=", 1)
+        name = name.strip()
+        if name not in GrblConfig.getSettingNames():
+            raise ValueError("unknown setting '" + name + "'")
+        current = getattr(GrblConfig(), name)
+        if isinstance(current, tuple) or {f.name: f.type for f in dataclasses.fields(GrblConfig)}[name] in (tuple, "tuple"):
+            # ie. machine_envelope=0,0,-5,300,200,10
+            return (name, tuple(float(v) for v in re.split("[\\s,]+", value.strip()) if v))
+        value = Batch.parseValue(value.strip())
+        if isinstance(current, bool):
+            if not isinstance(value, bool): raise ValueError(name + " must be true or false")
+        elif isinstance(current, float) and isinstance(value, int):
+            value = float(value)
+        return (name, value)
+
+    # expands files, directories and glob patterns into a sorted list of input files
+    @staticmethod
+    def expand(patterns) -> List[str]:
+        ret = []
+        for p in patterns:
+            if os.path.isdir(p):
+                for e in Batch.extensions:
+                    ret.extend(glob.glob(os.path.join(p, "*" + e)))
+            else:
+                ret.extend(glob.glob(p, recursive=True))
+        ret = [f for f in ret if os.path.splitext(f)[1].lower() in Batch.extensions]
+        return sorted(set(ret))
+
+    # a.nc is written to a_.nc and a.svg to a_.gcode
+    @staticmethod
+    def getOutfile(infile: str, outdir: str = None) -> str:
+        d, n = os.path.split(infile)
+        if outdir: d = outdir
+        n, e = os.path.splitext(n)
+        if e.lower() == ".svg":
+            e = ".gcode"
+        return os.path.join(d, n + Batch.suffix + e)
+
+    # processes a single file. This runs in a worker process and
+    # never raises, returning a dictionary describing the outcome instead
+    # cachedir (if given) is the directory of a GrblCache holding the
+    # results of previous runs
+    @staticmethod
+    def processFile(infile: str, outfile: str, config: GrblConfig = None, transforms=None, cachedir: str = None) -> dict:
+        ret = {"infile": infile, "outfile": outfile, "ok": False, "cached": False, "seconds": 0.0, "lines": 0, "error": None}
+        start = time.perf_counter()
+        try:
+            if not config: config = GrblConfig.current()
+            svg = infile.lower().endswith(".svg")
+            cache = key = commands = None
+            if cachedir:
+                cache = GrblCache(cachedir)
+                key = cache.getKey(infile, config, "svg" if svg else "grbl", transforms)
+                commands = cache.get(key, config, outfile)
+            if commands:
+                ret["cached"] = True
+                ret.update(commands.getFirst().getMeta() or {})
+            else:
+                # with transforms only the final program is checked (see
+                # validateEnvelope) and written
+                written = None if transforms else outfile
+                if svg:
+                    commands = Processor.processSvg(infile, written, config)
+                else:
+                    commands = GrblCommand.processGrbl(infile, written, config)
+                # kept with the cache entry so a hit reports the same
+                meta = dict(commands.getFirst().getMeta() or {})
+                if transforms:
+                    # (merge reports the moves it removed)
+                    commands = GrblPipeline(transforms).run(commands, meta)
+                    commands.burp(outfile)
+                ret.update(meta)
+                if cache: cache.put(key, commands, outfile, meta)
+            ret["lines"] = commands.getFirst().getLength()
+            ret["ok"] = True
+        except Exception as e:
+            ret["error"] = type(e).__name__ + ": " + str(e)
+        ret["seconds"] = time.perf_counter() - start
+        return ret
+
+    # processes every file matching the given patterns using a pool
+    # of workers (defaults to one per cpu), returning a list of results
+    # (see processFile) in the same order as the input files
+    @staticmethod
+    def run(patterns, outdir: str = None, config: GrblConfig = None, transforms=None, workers: int = None, cachedir: str = None) -> List[dict]:
+        files = Batch.expand(patterns)
+        if not files: return []
+        if outdir: os.makedirs(outdir, exist_ok=True)
+        ret = {}
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {}
+            for f in files:
+                futures[pool.submit(Batch.processFile, f, Batch.getOutfile(f, outdir), config, transforms, cachedir)] = f
+            for future in concurrent.futures.as_completed(futures):
+                f = futures[future]
+                try:
+                    ret[f] = future.result()
+                except Exception as e:
+                    # the worker itself died (out of memory etc.)
+                    ret[f] = {"infile": f, "outfile": Batch.getOutfile(f, outdir), "ok": False, "cached": False, "seconds": 0.0, "lines": 0, "error": type(e).__name__ + ": " + str(e)}
+        return [ret[f] for f in files]
+
+    @staticmethod
+    def report(results: List[dict], wall: float = None) -> str:
+        ret = ""
+        failed = 0
+        cached = 0
+        total = 0.0
+        for r in results:
+            total += r["seconds"]
+            if r["ok"]:
+                if r.get("cached"): cached += 1
+                extra = ", cached" if r.get("cached") else ""
+                if r.get("duplicates"):
+                    extra += ", {} duplicate blocks ({:.1f}mm of cut) removed".format(r["duplicates"], r["duplicate_length"])
+                if r.get("segments_before"):
+                    extra += ", {} of {} moves merged (est. {:.1f}s saved)".format(r["segments_before"] - r["segments_after"], r["segments_before"], r["time_before"] - r["time_after"])
+                ret += "OK   {:8.3f}s  {} -> {} ({} lines{})\n".format(r["seconds"], r["infile"], r["outfile"], r["lines"], extra)
+            else:
+                failed += 1
+                ret += "FAIL {:8.3f}s  {} : {}\n".format(r["seconds"], r["infile"], r["error"])
+        ret += "{} files, {} ok ({} cached), {} failed, {:.3f}s processing".format(len(results), len(results) - failed, cached, failed, total)
+        if not GrblCommand.isNone(wall):
+            ret += ", {:.3f}s elapsed".format(wall)
+        return ret + "\n"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Batch process .nc and .svg files into sanitised GRBL")
+    parser.add_argument("inputs", nargs="+", help="files, directories or glob patterns")
+    parser.add_argument("-o", "--outdir", help="write output files here (default is alongside each input)")
+    parser.add_argument("-s", "--set", action="append", default=[], metavar="NAME=VALUE", help="set a GrblCommand setting ie. cut_speed=150")
+    parser.add_argument("-t", "--transform", action="append", default=[], metavar="SPEC", help="apply a transform in order ie. \"rotate 45 0 0\"")
+    parser.add_argument("-p", "--pipeline", metavar="FILE", help="apply the transforms listed in this file (one to a line) before any given with -t")
+    parser.add_argument("-c", "--cache", metavar="DIR", help="reuse previously processed output cached in this directory")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (default one per cpu)")
+    parser.add_argument("--watch", action="store_true", help="keep reprocessing the files (only the blocks which changed) whenever they change")
+    args = parser.parse_args(argv)
+    try:
+        config = GrblConfig.current().replace(**dict(Batch.parseSetting(s) for s in args.set))
+        transforms = [Batch.parseTransform(t) for t in args.transform]
+        if args.pipeline: transforms = GrblPipeline.load(args.pipeline).passes + transforms
+        # checks the args of each transform before any file is processed
+        transforms = GrblPipeline(transforms).passes
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
+    if args.watch:
+        from gml.watch import GrblWatch
+        files = Batch.expand(args.inputs)
+        if not files:
+            print("no .nc or .svg files found")
+            return 1
+        if args.outdir: os.makedirs(args.outdir, exist_ok=True)
+        print("watching {} files (ctrl-c to stop)".format(len(files)), flush=True)
+        GrblWatch.run([GrblWatch(f, Batch.getOutfile(f, args.outdir), config, transforms) for f in files])
+        return 0
+    start = time.perf_counter()
+    results = Batch.run(args.inputs, args.outdir, config, transforms, args.workers, args.cache)
+    if not results:
+        print("no .nc or .svg files found")
+        return 1
+    print(Batch.report(results, time.perf_counter() - start), end="")
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+# pylint: disable = line-too-long
+
+from typing import List
+import os
+import zlib
+import marshal
+import hashlib
+import dataclasses
+from gml.command import GrblConfig, GrblCommand
+
+
+class GrblCache():
+    """
+        A content addressed disk cache of processed programs.
+        Entries are keyed on a hash of the input file contents, every setting
+        in the GrblConfig and the chain of transforms applied, so the same
+        artwork processed with the same settings is only ever processed once.
+        Programs are stored as compressed binary records (not GCODE text)
+        alongside the GCODE output file they produced (so a hit only has
+        to copy it) and the meta reported when they were made (see
+        GrblCommand.getMeta, ie. the duplicate blocks removed, which a hit
+        returns on the first command) and the least recently used entries are evicted once
+        the cache grows beyond max_bytes.
+        Entries are written atomically so a cache directory may be shared
+        by several processes (see Batch).
+    """
+    # bump this whenever a change to the code alters processed output
+    version = 5
+    extension = ".gmlc"
+    # a hash of the source of the gml package (see getCodeVersion)
+    code_version = None
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        if not directory:
+            raise ValueError("must supply a cache directory")
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be positive")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    # kind distinguishes the same file processed in different ways (ie. grbl or svg)
+    # transforms is a list of (name, [args]) as used by Batch
+    def getKey(self, infile: str, config: GrblConfig, kind: str = "grbl", transforms=None) -> str:
+        if not config:
+            raise ValueError("must supply a config")
+        h = hashlib.sha256()
+        with open(infile, "rb") as f:
+            for b in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(b)
+        h.update(repr((GrblCache.version, GrblCache.getCodeVersion(), kind, sorted(dataclasses.asdict(config).items()), transforms or [])).encode("utf-8"))
+        return h.hexdigest()
+
+    # a hash of the source of every module in the gml package, so that
+    # entries made by other code are never used even if version wasn't bumped
+    @staticmethod
+    def getCodeVersion() -> str:
+        if not GrblCache.code_version:
+            h = hashlib.sha256()
+            d = os.path.dirname(os.path.abspath(__file__))
+            for n in sorted(os.listdir(d)):
+                if not n.endswith(".py"): continue
+                h.update(n.encode("utf-8"))
+                with open(os.path.join(d, n), "rb") as f:
+                    h.update(f.read())
+            GrblCache.code_version = h.hexdigest()
+        return GrblCache.code_version
+
+    def getPath(self, key: str) -> str:
+        return os.path.join(self.directory, key + GrblCache.extension)
+
+    # returns the cached program (with the given config) or None
+    # if outfile is given the cached output is (re)written to it
+    def get(self, key: str, config: GrblConfig = None, outfile: str = None) -> GrblCommand:
+        path = self.getPath(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            ret, output = GrblCache.loads(data, config)
+        except (OSError, ValueError, EOFError, TypeError, zlib.error):
+            # missing, evicted by another process or corrupt
+            self.misses += 1
+            return None
+        if outfile:
+            if GrblCommand.isNone(output):
+                ret.burp(outfile)
+            else:
+                with open(outfile, "wb") as f:
+                    f.write(output)
+        # mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return ret
+
+    # outfile (if given) is the output file written from the commands, meta
+    # (defaults to that of the commands) is returned with them by get
+    def put(self, key: str, commands: GrblCommand, outfile: str = None, meta: dict = None):
+        if not commands:
+            raise ValueError("must supply some commands")
+        output = None
+        if outfile:
+            with open(outfile, "rb") as f:
+                output = f.read()
+        path = self.getPath(key)
+        tmp = path + "." + str(os.getpid()) + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(GrblCache.dumps(commands, output, meta))
+        os.replace(tmp, path)
+        self.evict()
+
+    # removes least recently used entries until the cache fits in max_bytes
+    def evict(self):
+        entries = []
+        total = 0
+        for e in self.getEntries():
+            try:
+                st = os.stat(e)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, e))
+            total += st.st_size
+        entries.sort()
+        for _, size, e in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(e)
+            except OSError:
+                pass
+            total -= size
+
+    def getEntries(self) -> List[str]:
+        return [os.path.join(self.directory, n) for n in os.listdir(self.directory) if n.endswith(GrblCache.extension)]
+
+    def getSize(self) -> int:
+        ret = 0
+        for e in self.getEntries():
+            try:
+                ret += os.path.getsize(e)
+            except OSError:
+                pass
+        return ret
+
+    def clear(self):
+        for e in self.getEntries():
+            try:
+                os.remove(e)
+            except OSError:
+                pass
+
+    # serialises a chain of commands (and optionally the output written
+    # from them and their meta) into compressed binary records (see toRecords)
+    @staticmethod
+    def dumps(commands: GrblCommand, output: bytes = None, meta: dict = None) -> bytes:
+        if meta is None: meta = commands.getFirst().getMeta()
+        return zlib.compress(marshal.dumps((GrblCache.version, commands.toRecords(), output, meta)), 1)
+
+    # returns a tuple of the commands (with the meta on the first) and the output (or None)
+    @staticmethod
+    def loads(data: bytes, config: GrblConfig = None) -> tuple:
+        version, records, output, meta = marshal.loads(zlib.decompress(data))
+        if version != GrblCache.version:
+            raise ValueError("cache entry is from a different version")
+        if not records:
+            raise ValueError("cache entry is empty")
+        ret = GrblCommand.fromRecords(records, config)
+        if meta: ret.getFirst().setMeta(dict(meta))
+        return (ret, output)
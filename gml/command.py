@@ -0,0 +1,1881 @@
+# pylint: disable = line-too-long, too-many-lines, no-name-in-module, import-error, multiple-imports, pointless-string-statement, wrong-import-order
+
+# Importing this module must stay cheap and free of side effects (it is imported
+# by every batch worker process). The svg reader (gml/svgread.py) is only
+# imported when an svg is actually processed (see fromSvg)
+from typing import TypeVar, List
+import io
+import re
+import os
+import math
+import dataclasses
+from gml.sequence import CommandSequence
+from gml.journal import GrblJournal
+
+
+@dataclasses.dataclass(frozen=True)
+class GrblConfig:
+    """
+        Immutable settings for processing a single program (job).
+        Every command in a program holds a reference to its program's config
+        so that jobs with different settings can be processed concurrently
+        (threads, async servers etc.) without clobbering each other.
+        Commands without a config fall back to the GrblCommand class
+        attributes of the same name (see current())
+    """
+    # Enable O02 style line numbering of blocks of commands
+    auto_number_blocks: bool = False
+    # Enable N02 style line numbering
+    auto_number_lines: bool = False
+    # automatically sanitise GCODE into blocks
+    auto_sanitise: bool = True
+    auto_decurve: bool = False
+    # return to zero and dwell after every path
+    dwell_after_block: bool = False
+    tool_diameter: float = 1.0
+    min_point_distance: float = 0.1
+    depth_step: float = -0.25
+    evacuation_height: float = 1
+    cut_speed: int = 50
+    spindle_rpm: int = 1000
+    fast_travel_speed: int = 800
+    showIndices: bool = False
+    autoBlockSort: bool = True
+    penetrate_speed: int = 50
+    max_dp: int = 4
+    # number of lines held in memory at once by processGrblChunked
+    chunk_lines: int = 20000
+    # sanitise (and pass) blocks across this many processes (0 or 1 is serial)
+    block_workers: int = 0
+    # the working area in work coordinates as (min x, min y, min z, max x,
+    # max y, max z), programs going outside it are not written (None is no limit)
+    machine_envelope: tuple = None
+    # drop blocks which cut the same path as an earlier block (see removeDuplicateBlocks)
+    remove_duplicates: bool = True
+    # blocks whose coordinates agree to within this (mm) cut the same path
+    duplicate_tolerance: float = 0.001
+
+    # a snapshot of the (legacy) GrblCommand class attribute settings
+    @staticmethod
+    def current() -> 'GrblConfig':
+        return GrblConfig(**{f.name: getattr(GrblCommand, f.name) for f in dataclasses.fields(GrblConfig)})
+
+    # returns a copy of this config with the given settings changed
+    # ie. config.replace(cut_speed=150, depth_step=-0.35)
+    def replace(self, **changes) -> 'GrblConfig':
+        return dataclasses.replace(self, **changes)
+
+    @staticmethod
+    def getSettingNames() -> List[str]:
+        return [f.name for f in dataclasses.fields(GrblConfig)]
+
+
+class GrblCommand:
+    """
+        Class holding information about GCODE commands.
+        Functionality:
+            * Parsing, validation and rendering of string representation of GCODE commands
+              such as G00 X12.5 Y15.2 F200 etc.
+            * The formation of linked lists of commands (previous and next methods)
+            * Allowing sections of linked lists to be declared as
+              'blocks' of commands based on various rules
+            * Sanitising, sorting and other manipulations of blocks of commands
+    """
+    order = ["O", "N", "G", "M", "X", "Y", "Z", "H", "I", "J", "K", "L", "A", "B", "C", "D", "E", "P", "Q", "R", "S", "T", "U", "V", "W", "F"]
+    # Enable O02 style line numbering of blocks of commands
+    auto_number_blocks: bool = False
+    # Enable N02 style line numbering
+    auto_number_lines: bool = False
+    # automatically sanitise GCODE into blocks
+    auto_sanitise: bool = True
+    auto_decurve: bool = False
+    # return to zero and dwell after every path
+    dwell_after_block: bool = False
+    tool_diameter: float = 1.0
+    min_point_distance = 0.1
+    depth_step: float = -0.25
+    evacuation_height: float = 1
+    cut_speed: int = 50
+    spindle_rpm: int = 1000
+    fast_travel_speed: int = 800
+    showIndices = False
+    autoBlockSort = True
+    penetrate_speed: int = 50
+    max_dp = 4
+    # number of lines held in memory at once by processGrblChunked
+    chunk_lines: int = 20000
+    # parameters whose last value is carried from one chunk into the next
+    modal_params = ["Z", "F", "S"]
+    # sanitise (and pass) blocks across this many processes (0 or 1 is serial)
+    block_workers: int = 0
+    # see GrblConfig.machine_envelope
+    machine_envelope: tuple = None
+    # see GrblConfig.remove_duplicates
+    remove_duplicates: bool = True
+    duplicate_tolerance: float = 0.001
+    # the methods which may be applied to each block by getBlocks and sanitise
+    # (not compensate, which needs the whole program to tell the holes apart)
+    block_passes = ["pointify", "despeckle", "offset", "dilate", "scale", "translate", "rotate"]
+    # see compensate
+    compensation_modes = ["profile", "pocket"]
+    vals = None
+    next = previous = None
+    line = None
+    inComment = False
+    visible = True
+    meta = None
+    block = 0
+    blockIndex = -1
+    # the GrblConfig of the program this command belongs to
+    config = None
+    # the gml.geometry.SegmentGeometry holding this command's row (see getGeometry)
+    geometry = None
+    geometryRow = -1
+    # the gml.sequence.CommandSequence indexing the chain this command is in
+    # and the chunk and row within it holding this command (see getIndex)
+    sequence = None
+    sequenceChunk = None
+    sequenceRow = -1
+    # the gml.journal.GrblJournal generation this command was made in (see touch)
+    generation = 0
+
+    def __init__(self, line: str, config: GrblConfig = None):
+        self.line = line
+        self.config = config
+        self.generation = GrblJournal.generation
+        self.vals = GrblCommand.getBlankValuesDictionary(None)
+
+        if not line:
+            # permit blank objects
+            return
+
+        if line.strip().startswith("("):
+            self.vals["COMMENT"] = line
+            return
+
+        if line.strip().startswith("%"):
+            self.comment = "percent? Why in gods name?"
+            return
+
+        if "(" in line:
+            line = GrblCommand.removeBracketedText(line)
+
+        foo = line.strip().split()
+        for c in foo:
+            if not c:
+                continue
+
+            first_char = c.strip()[0].upper()
+            last_char = c.strip()[-1:].upper()
+
+            if last_char == ")":
+                self.inComment = False
+                continue
+
+            if self.inComment:
+                continue
+
+            if first_char == "(":
+                self.inComment = True
+            else:
+                self.vals[first_char] = GrblCommand.parseParameter(c)
+
+    @staticmethod
+    def getBlankValuesDictionary(i: any) -> dict:
+        return {
+            "A": i, "B": i, "C": i, "D": i, "E": i,
+            "F": i, "G": i, "H": i, "I": i, "J": i,
+            "K": i, "L": i, "M": i, "N": i, "O": i,
+            "P": i, "Q": i, "R": i, "S": i, "T": i,
+            "U": i, "V": i, "W": i, "X": i, "Y": i,
+            "Z": i, "COMMENT": None
+        }
+
+    def getRawLine(self) -> str:
+        return self.line
+
+    # returns the settings which apply to this command
+    # commands not belonging to a configured program use the
+    # GrblCommand class attributes
+    def getConfig(self) -> GrblConfig:
+        if self.config: return self.config
+        return GrblConfig.current()
+
+    def setConfig(self, config: GrblConfig):
+        self.touch()
+        self.config = config
+
+    # the geometry of the move to this command from the previous coordinates
+    # (chord, direction, slope and for arcs centre, radius, start angle,
+    # sweep and arc length) as a dict (see gml.geometry.SegmentGeometry)
+    # or None if it doesn't move in X and Y. The geometry of the whole
+    # chain from here on is worked out at once when first needed and kept
+    # until this move changes
+    def getGeometry(self) -> dict:
+        if self.geometry is None:
+            from gml.geometry import SegmentGeometry
+            SegmentGeometry.calculate(self)
+        return self.geometry.getRow(self.geometryRow)
+
+    # forgets the geometry of this command and of the next move (which
+    # starts where this one ends)
+    def invalidateGeometry(self):
+        self.geometry = None
+        c = self.next
+        while c:
+            c.geometry = None
+            if c.nn("X"): return
+            c = c.next
+
+    # records this command in the open journal (if any) before it is
+    # changed, so the change can be rolled back (see gml.journal.GrblJournal)
+    def touch(self):
+        j = GrblJournal.getCurrent()
+        if j: j.touch(self)
+
+    # opens a journal, the edits made until it is committed can be rolled
+    # back (see gml.journal.GrblJournal)
+    def edit(self) -> GrblJournal:
+        return GrblJournal.begin()
+
+    def setParameter(self, param: str, value: any):
+        self.touch()
+        self.vals[param] = value
+
+    # sets a parameter which moves either end of a move (see getGeometry)
+    def setMoveParameter(self, param: str, value: float):
+        self.setParameter(param, value)
+        self.invalidateGeometry()
+
+    def prependObject(self, obj) -> 'GrblCommand':
+        if not obj:
+            raise ValueError("must pass valid object")
+        if self.getPrevious():
+            obj.setPrevious(self.getPrevious())
+        self.setPrevious(obj)
+        return obj
+
+    def prepend(self, line: str) -> 'GrblCommand':
+        c = GrblCommand(line, self.config)
+        return self.prependObject(c)
+
+    def replaceSelfWithObjects(self, obj: 'GrblCommand') -> 'GrblCommand':
+        if not obj: return self
+        if self.getPrevious():
+            obj.getFirst().setPrevious(self.getPrevious())
+        if self.getNext():
+            self.getNext().setPrevious(obj.getLast())
+        return obj.getLast()
+
+    def insertObjectBefore(self, obj: 'GrblCommand') -> 'GrblCommand':
+        if not obj: return self
+        if obj.isMultiple(): raise ValueError("inserting chains of objects before, not currently supported")
+        obj.setNext(self)
+        if self.getPrevious():
+            self.getPrevious().setNext(obj)
+            obj.setPrevious(self.getPrevious())
+        self.setPrevious(obj)
+        return self
+
+    def insertObjectAfter(self, obj) -> 'GrblCommand':
+        if not obj: return self
+        n = self.getNext()
+        obj.setPrevious(self)
+        if n:
+            n.setPrevious(obj)
+        return obj
+
+    # add a single command, or a list of commands
+    def appendObjects(self, obj) -> 'GrblCommand':
+        if not obj: return None
+        if not isinstance(obj, list): return self.appendObject(obj)
+        lo = None
+        for o in obj:
+            if not lo: 
+                lo = self.appendObject(o)
+            else:
+                lo = lo.appendObject(o)
+        return lo
+
+    def appendObject(self, obj) -> 'GrblCommand':
+        if not obj: return self
+        obj.setPrevious(self)
+        return obj
+
+    def append(self, line: str) -> 'GrblCommand':
+        c = GrblCommand(line, self.config)
+        return self.appendObject(c)
+
+    def delete(self) -> 'GrblCommand':
+        if self.getPrevious():
+            self.getPrevious().setNext(self.getNext())
+        if self.getNext():
+            self.getNext().setPrevious(self.getPrevious())
+        if self.getPrevious():
+            return self.getPrevious()
+        elif self.getNext():
+            return self.getNext()
+        return None
+
+    def isInBlock(self) -> bool:
+        return self.blockIndex > -1
+
+    def isBlockStart(self) -> bool:
+        c = self.getCommand()
+        x = self.getX()
+        y = self.getY()
+        if not self.getX() or not self.getY():
+            return False
+        if self.isCommand("G00"):
+            return True
+        if not self.getPrevious():
+            return True
+        if self.getPrevious().isInBlock():
+            return False
+        return True
+
+    def isBlockEnd(self):
+        if self.isBlockStart():
+            return False
+        if self.isInBlock():
+            # start of new fast travel indicates block end
+            if self.isCommand("G00"):
+                return True
+            # stop spindle indicates block end (mainly lasers)
+            if self.isCommand("M05"):
+                return True
+            # lifting the cutter indicates block end
+            if self.isEvacuation():
+                return True
+            # pcob = self.getPrevious() and (self.getPrevious().isComment() or self.getPrevious().isBlank())
+            # cob = self.isBlank() or self.isComment()
+            # consecutive blank lines indicates block end
+            # if pcob and cob:
+            #    return True
+            # other stuff here
+        else:
+            pass
+        return False
+
+    # setCutSpeed, setFastTravelSpeed, setEvacuateHeight, setPenetrateSpeed,
+    # setPenetrateDepth, translate and scale are each applied as a
+    # pipeline of one pass (see gml.pipeline.GrblPipeline), use a
+    # pipeline to apply several of them in a single walk of the chain
+    def pipeline(self, passes) -> 'GrblCommand':
+        from gml.pipeline import GrblPipeline
+        if isinstance(passes, str):
+            passes = GrblPipeline.load(passes)
+        elif not isinstance(passes, GrblPipeline):
+            passes = GrblPipeline(passes)
+        return passes.run(self)
+
+    # sets the feed rate of all commands which operate at a
+    # depth less than or equal zero
+    def setCutSpeed(self, speed):
+        self.pipeline([("setCutSpeed", [speed])])
+
+    # sets the feed rate of all commands which operate at a
+    # depth greater than or equal zero
+    def setFastTravelSpeed(self, speed):
+        self.pipeline([("setFastTravelSpeed", [speed])])
+
+    # should probaby pass a positive value here since
+    # zero will be where you start the job
+    def setEvacuateHeight(self,height):
+        self.pipeline([("setEvacuateHeight", [height])])
+
+    def setPenetrateSpeed(self,speed):
+        self.pipeline([("setPenetrateSpeed", [speed])])
+
+    # should pass a negative number here
+    # since zero will be where you start the job
+    def setPenetrateDepth(self, depth):
+        self.pipeline([("setPenetrateDepth", [depth])])
+
+    def isCutCommand(self):
+        return self.isCommand("G01") or self.isCommand("G02") or self.isCommand("G03")
+
+    # z (if known) is the estimated Z (see getEstimatedZ) so it needn't be walked back for
+    def isPenetrate(self, z: float = None) -> bool:
+        if self.line and "Penetrate" in self.line:
+            return True
+        if self.vals["COMMENT"] and "Penetrate" in self.vals["COMMENT"]:
+            return True
+        if not self.getZ() and 0 != self.getZ():
+            return False
+        # moving across as well (ie. a levelled cut) is not a plunge
+        if self.nn("X") or self.nn("Y"):
+            return False
+        ez = self.getEstimatedZ() if GrblCommand.isNone(z) else z
+        if self.getZ() > ez:
+            return False
+        if self.getZ() < 0:
+            return True
+        return False
+    
+    def isEvacuation(self, z: float = None) -> bool:
+        if self.isPenetrate(z):
+            return False
+        # a levelled cut may be above zero where the work surface is
+        if self.isLevelledCut():
+            return False
+        if not self.getZ():
+            return False
+        # only moving up out of the work (not a levelled cut below it)
+        if self.getZ() < 0:
+            return False
+        # TODO get estimated z and make sure this is higher
+        return True
+
+    # a cut (G01, G02 or G03) moved up or down to follow the work surface
+    # (see level) which, whatever its Z, is neither a plunge nor a lift
+    def isLevelledCut(self) -> bool:
+        return bool(self.line and "Levelled cut" in self.line)
+
+    # getFirst, getLast, getLength, getIndex and getAt use the index of the
+    # chain (see gml.sequence.CommandSequence) rather than walking it, only
+    # a command which has been deleted (but still links into the chain)
+    # is walked from
+    def getFirst(self) -> 'GrblCommand':
+        s = CommandSequence.get(self)
+        if s: return s.getFirst()
+        c = self
+        while c.getPrevious():
+            c = c.getPrevious()
+        return c
+
+    def getLast(self) -> 'GrblCommand':
+        s = CommandSequence.get(self)
+        if s: return s.getLast()
+        c = self
+        while c.getNext():
+            c = c.getNext()
+        return c
+
+    # the number of commands from this one to the end of the chain
+    def getLength(self) -> int:
+        s = CommandSequence.get(self)
+        if s: return s.getLength() - s.getIndex(self)
+        ret = 0
+        c = self
+        while c:
+            ret += 1
+            c = c.getNext()
+        return ret
+
+    def getIndex(self):
+        s = CommandSequence.get(self)
+        if s: return s.getIndex(self)
+        ret = 0
+        c = self.getPrevious()
+        while c:
+            ret += 1
+            c = c.getPrevious()
+        return ret
+
+    # the modal state of the machine just before this command runs
+    # walks backwards so that the nearest previous value of each
+    # parameter wins
+    def getEstimated(self) -> 'GrblCommand':
+        try:
+            ret = GrblCommand("")
+            c = self.getPrevious()
+            while c:
+                for l in c.vals:
+                    if not ret.nn(l) and c.nn(l):
+                        ret.vals[l] = c.vals[l]
+                c = c.getPrevious()
+            return ret
+        except:
+            return None
+
+    # the nearest previous value of a single parameter (or None)
+    # stops walking as soon as it is found
+    def getEstimatedParameter(self, param: str) -> any:
+        c = self.getPrevious()
+        while c:
+            if c.nn(param): return c.vals[param]
+            c = c.getPrevious()
+        return None
+
+    def getEstimatedZ(self):
+        z = self.getEstimatedParameter("Z")
+        if GrblCommand.isNone(z): return 0.0
+        return z
+
+    def getEstimatedX(self):
+        foo = self.getEstimated()
+        if GrblCommand.isNone(foo) or (not foo.nn('Z')): return 0.0
+        return foo.getX()
+
+    def getEstimatedY(self):
+        foo = self.getEstimated()
+        if GrblCommand.isNone(foo) or (not foo.nn('Z')): return 0.0
+        return foo.getY()
+
+    def getEstimatedF(self):
+        foo = self.getEstimated()
+        if GrblCommand.isNone(foo) or (not foo.nn('Z')): return self.getConfig().cut_speed
+        return foo.getF()
+
+    def getAverage(self) -> 'GrblCommand':
+        # TODO this
+        count = GrblCommand.getBlankValuesDictionary(0)
+        sum = GrblCommand.getBlankValuesDictionary(0.0)
+        sumn = GrblCommand.getBlankValuesDictionary(0.0)
+        ret = GrblCommand.getBlankValuesDictionary(None)
+        c = self.getFirst()
+        while c:
+            for l in c.vals:
+                if c.nn(l):
+                    v = c.vals[l]
+                    count[l] = count[l] + 1
+                    if v < 0:
+                        sumn[l] = sumn[l] + v
+                    else:
+                        sum[l] = sum[l] + v
+            c = c.getNext()
+
+        for l in count:
+            if not GrblCommand.isNone(count[l]) and count[l] > 0:
+                sum[l] = sum[l] - sumn[l]
+                ret[l] = sum[l] / count[l]
+        return ret
+
+    # the extent of every move in the whole chain (including arcs) as
+    # {"min_x", "min_y", "min_z", "max_x", "max_y", "max_z"} (None where unknown)
+    # see gml.program.GrblProgram.getBounds (requires numpy)
+    def getBounds(self) -> dict:
+        b = self.toProgram().getBounds().tolist()
+        keys = ["min_x", "min_y", "min_z", "max_x", "max_y", "max_z"]
+        return {k: (None if v != v else v) for k, v in zip(keys, b)}
+
+    def getMaxX(self) -> float:
+        return self.getBounds()["max_x"]
+    def getMaxY(self) -> float:
+        return self.getBounds()["max_y"]
+    def getMaxZ(self) -> float:
+        return self.getBounds()["max_z"]
+
+    # raises a ValueError if any move goes outside the envelope
+    # (defaults to the config's machine_envelope)
+    def validateEnvelope(self, envelope=None):
+        cfg = self.getConfig()
+        if envelope is None and cfg.machine_envelope is None: return
+        self.toProgram().validateEnvelope(envelope, cfg)
+
+    def sanitiseBlock(self, block) -> 'GrblCommand':
+        if not block:
+            raise ValueError("must supply block")
+        ret = None
+        cfg = block.getConfig()
+        c = block.getFirst()
+        cutSpeedSet = False
+        while c:
+            # remove blank lines and comments
+            if c.isBlank() or c.isComment():
+                c = c.delete()
+                continue
+            if c.getIndex() == 0:
+                if not c.getX() and not c.getY():
+                    raise ValueError("first command of a block must specify x and y? Is this a bug?")
+                c.setCommand("G00")
+                c.setF(cfg.fast_travel_speed)
+                ret = c
+                c = c.getNext()
+                continue
+            elif c.getIndex() == 1:
+                if not c.isPenetrate():
+                    o = GrblCommand("G01 Z-0.0 F50", cfg)
+                    o.setZ(cfg.depth_step)
+                    o.setF(cfg.penetrate_speed)
+                    c = c.prependObject(o)
+                    continue
+                else:
+                    c.setZ(cfg.depth_step)
+            else:
+                # remove all subsequent penetrate or evacuate commands 
+                if c.getZ() and not c.getY() and not c.getX():
+                    c = c.delete()
+                    continue
+                # remove all depth parameters following penetrate
+                c.setZ(None)
+
+                if c.isCutCommand():
+                    if not cutSpeedSet:
+                        c.setF(cfg.cut_speed)
+                        cutSpeedSet = True
+                    else:
+                        c.setF(None)
+
+                if c.nn("I") and c.nn("J") and cfg.auto_decurve:
+                    c.pointifySelf()
+
+            c = c.getNext()
+        return ret
+
+    def isMultiple(self) -> bool:
+        return self.getPrevious() or self.getNext()
+
+    def isBlock(self):
+        c = self.getFirst()
+        while c:
+            if not c.isInBlock():
+                return False
+            c = c.getNext()
+        return True
+
+    def generateHeader(self) -> 'GrblCommand':
+        cfg = self.getConfig()
+        ret = GrblCommand("M03 S1000", cfg)
+        ret.setS(cfg.spindle_rpm)
+        ret = ret.append("")
+        ret = ret.append("G21")
+        return ret
+
+    def generateFooter(self) -> 'GrblCommand':
+        ret: GrblCommand = GrblCommand("", self.getConfig())
+        ret = ret.append("M5")
+        ret = ret.append("G00 X0.0000 Y0.0000 F600")
+        ret = ret.append("G00 Z0.0")
+        ret = ret.append("M2")
+        return ret.getFirst()
+
+    def generateEvacuationCommand(self):
+        ret = []
+        cfg = self.getConfig()
+        if cfg.dwell_after_block:
+            c = GrblCommand("G00 X0 Y0", cfg)
+            c.f = cfg.fast_travel_speed
+            ret.append(c)
+            ret.append(GrblCommand("G00 Z0", cfg))
+            ret.append(GrblCommand("G04 P10000", cfg))
+        else:
+            c = GrblCommand("G00 Z1.0 F100", cfg)
+            c.setZ(cfg.evacuation_height)
+            c.setF(cfg.fast_travel_speed)
+            return c
+        return ret
+
+    # appends a copy of the block, or with copy False the block itself
+    # (for blocks which aren't needed elsewhere, see getBlocks)
+    def appendBlock(self, block, copy: bool = True) -> 'GrblCommand':
+        if not block or not block.isBlock():
+            return self
+        bl = block.__deepcopy__() if copy else block
+        ret = self.append(" ")
+        c = bl.getFirst()
+        while c:
+            ret = ret.appendObject(c)
+            c = c.getNext()
+        return ret
+
+    # returns true if the given block represents a closed path
+    # that is, it's start and end point are the same (within tolerance)
+    def isBlockAClosedPath(self, blocknum: int) -> bool:
+        b = self.getBlock(blocknum)
+        if not b: return False
+        c = b.getFirst()
+        fx = fy = lx = ly = None
+        while c:
+            if c.nn("X"):
+                if GrblCommand.isNone(fx):
+                    fx = c.getX()
+                    fy = c.getY()
+                else:
+                    lx = c.getX()
+                    ly = c.getY()
+            c = c.getNext()
+        if GrblCommand.isNone(lx): return False
+        return (abs(lx - fx) < 0.05) and (abs(ly - fy) < 0.05)
+
+    def getBlock(self, blockNum):
+        if blockNum < 0:
+            raise ValueError("blocks are a zero based array")
+        blocks = self.getBlocks()
+        bn = 0
+        for b in blocks:
+            if bn == blockNum:
+                return b
+            bn = bn + 1
+        return None
+
+    # gets just the block data without any homing etc.
+    # (copies of the commands in blocks, each block after a blank line)
+    def getRawBlocks(self) -> 'GrblCommand':
+        ret = None
+        c = self.getFirst()
+        while c:
+            if c.isInBlock():
+                o = c.__copy__()
+                if c.blockIndex == 0:
+                    ret = ret.append("") if ret else GrblCommand("", self.config)
+                ret = ret.appendObject(o) if ret else o
+            c = c.getNext()
+        return ret.getFirst() if ret else None
+
+    # returns all blocks as an array of command objects
+    # passes is a list of (name, [args]) (see block_passes) applied in
+    # order to each block after it is sanitised. With block_workers the
+    # blocks are sanitised and passed across a pool of processes
+    # cache (if given) is a dict of the blocks of a previous call (see
+    # getCachedBlocks) so only blocks which have changed are sanitised
+    def getBlocks(self, passes=None, cache: dict = None) -> List['GrblCommand']:
+        c = self.getFirst()
+        ret = []
+        curr = None
+        while c:
+            if c.blockIndex > -1:
+                o = c.__copy__()
+                if curr:
+                    curr = curr.appendObject(o)
+                else:
+                    curr = o
+                    curr.block = len(ret)
+                    curr.blockIndex = 0
+                    ret.append(curr)
+            else:
+                curr = None
+            c = c.getNext()
+        if cache is not None:
+            return self.getCachedBlocks(ret, passes, cache)
+        return self.sanitiseBlocks(ret, passes)
+
+    # sanitises (and applies the passes to) each of the raw blocks
+    def sanitiseBlocks(self, blocks, passes=None) -> List['GrblCommand']:
+        cfg = self.getConfig()
+        if cfg.block_workers > 1 and len(blocks) > 1:
+            from gml.parallel import BlockParallel
+            return BlockParallel.sanitiseBlocks(blocks, cfg, passes)
+        ret = []
+        for b in blocks:
+            foo = self.sanitiseBlock(b)
+            ret.append(GrblCommand.applyPasses(foo, passes))
+        return ret
+
+    # sanitises (and passes) only the raw blocks whose key (see getBlockKey)
+    # isn't in cache, reusing copies of the others. cache is left holding
+    # ({key: block}) just the blocks given, ready for the next call
+    def getCachedBlocks(self, blocks, passes, cache: dict) -> List['GrblCommand']:
+        keys = [b.getBlockKey() for b in blocks]
+        todo = [k for k in range(len(blocks)) if keys[k] not in cache]
+        done = self.sanitiseBlocks([blocks[k] for k in todo], passes)
+        found = {k: cache[k] for k in keys if k in cache}
+        for k, b in zip(todo, done):
+            found[keys[k]] = b
+        cache.clear()
+        cache.update(found)
+        # the cached blocks are left alone, copies are linked into the program
+        return [cache[k].__deepcopy__().getFirst() for k in keys]
+
+    # applies each of the (name, [args]) passes to the given block
+    @staticmethod
+    def applyPasses(block: 'GrblCommand', passes) -> 'GrblCommand':
+        if not passes: return block
+        for name, args in passes:
+            if name not in GrblCommand.block_passes:
+                raise ValueError("unknown block pass '" + name + "'")
+            foo = getattr(block, name)(*args)
+            # some passes work in place and return nothing
+            if foo: block = foo.getFirst()
+        return block
+
+    # passes (if given) are applied to each block and cache (if given)
+    # holds the blocks of a previous call (see getBlocks)
+    def sanitise(self, passes=None, cache: dict = None) -> 'GrblCommand':
+        ret: GrblCommand = self.generateHeader()
+        blocks = self.getBlocks(passes, cache)
+        count, length = 0, 0.0
+        if self.getConfig().remove_duplicates:
+            blocks, count, length = self.removeDuplicateBlocks(blocks)
+        if self.getConfig().autoBlockSort:
+            blocks = self.sortBlocks(blocks)
+        for b in blocks:
+            # ret = ret.append("")
+            ret = ret.appendObjects(self.generateEvacuationCommand())
+            ret = ret.appendBlock(b, False)
+        ret = ret.append("")
+        ret = ret.appendObjects(self.generateEvacuationCommand())
+        ret = ret.appendObject(self.generateFooter())
+        ret = ret.getFirst()
+        ret.setMeta({"duplicates": count, "duplicate_length": length})
+        return ret
+
+    #removes every command which is not in a 'block'
+    def deleteAllNonBlock(self):
+        c = self.getFirst()
+        while c:
+            if not c.isInBlock():
+                c = c.delete()
+                continue
+            if c.isBlockStart():
+                c.prepend("")
+            c = c.getNext()
+
+    # the command at index (counting from the first in the chain) or None
+    def getAt(self, index):
+        return CommandSequence.get(self.getFirst()).getAt(index)
+
+    def removeAt(self, index):
+        c = self.getAt(index)
+        if not c:
+            return
+        # is this the last element in the list?
+        if not c.getNext():
+            if c.getPrevious():
+                c.getPrevious().setNext(None)
+            return
+        # is it the first element?
+        if not c.getPrevious():
+            if c.getNext():
+                c.getNext().setPrevious(None)
+            return
+        c.getPrevious().setNext(c.getNext())
+        c.getNext().setPrevious(c.getPrevious())
+
+    @staticmethod
+    def removeBracketedText(text, brackets="()[]") -> str:
+        count = [0] * (len(brackets) // 2)  # count open/close brackets
+        saved_chars = []
+        for character in text:
+            for i, b in enumerate(brackets):
+                if character == b:  # found bracket
+                    kind, is_close = divmod(i, 2)
+                    count[kind] += (-1) ** is_close  # `+1`: open, `-1`: close
+                    if count[kind] < 0:  # unbalanced bracket
+                        count[kind] = 0  # keep it
+                    else:  # found bracket to remove
+                        break
+            else:  # character is not a [balanced] bracket
+                if not any(count):  # outside brackets
+                    saved_chars.append(character)
+        return "".join(saved_chars)
+
+    def isBlank(self):
+        for l in self.vals:
+            if self.nn(l):
+                return False
+        return True
+
+    def removeArc(self) -> 'GrblCommand':
+        if "G02" != self.getCommand() and "G03" != self.getCommand():
+            return
+        self.setCommand("G01")
+        self.setI(None)
+        self.setJ(None)
+        return self
+
+    def makeBlank(self):
+        self.touch()
+        self.vals = GrblCommand.getBlankValuesDictionary(None)
+        self.visible = True
+
+    def isComment(self):
+        if not self.getCommand() and self.vals["COMMENT"]:
+            return True
+        return False
+
+    # the index of the chain no longer holds for this command nor for the
+    # one it linked to (see gml.sequence.CommandSequence)
+    def breakSequence(self, linked: 'GrblCommand'):
+        if self.sequence: self.sequence.breakChunk(self)
+        if linked and linked.sequence: linked.sequence.breakChunk(linked)
+
+    def setNext(self, n):
+        self.touch()
+        self.breakSequence(self.next)
+        self.next = n
+
+    def setPrevious(self, p):
+        self.touch()
+        self.breakSequence(self.previous)
+        self.previous = p
+        self.invalidateGeometry()
+        if not p:
+            return
+        p.setNext(self)
+        # commands joining a program adopt its settings
+        if not self.config:
+            self.config = p.config
+        self.blockIndex = p.blockIndex
+        self.block = p.block
+
+        # are we in the middle of an ordinary block?
+        if self.isInBlock():
+            self.blockIndex += 1
+        if self.isBlockEnd():
+            self.blockIndex = -1
+        if self.isBlockStart():
+            self.block += 1
+            self.blockIndex = 0
+
+    def getNext(self):
+        return self.next
+
+    def getPreviousCoordinates(self) -> 'GrblCommand':
+        if not self.getPrevious(): return None
+        c = self.getPrevious()
+        while c:
+            if c.nn("X"): return c
+            c = c.getPrevious()
+        return None
+
+    def getPrevious(self):
+        return self.previous
+
+    def setVisibility(self, visibility):
+        self.touch()
+        self.visible = visibility
+
+    def setCommand(self, command):
+        if not command:
+            return
+        first_char = command.strip()[0].upper()
+        if not first_char: return
+        if not first_char in "M G":
+            raise ValueError("commands are M and G only")
+        self.setParameter(first_char, GrblCommand.parseParameter(command))
+        # G02 and G03 are arcs, anything else is a straight move
+        if first_char == "G": self.invalidateGeometry()
+
+    def setMeta(self, meta):
+        self.touch()
+        self.meta = meta
+
+    def getMeta(self):
+        return self.meta
+
+    @staticmethod
+    def stringToDouble(s) -> float:
+        if not s:
+            raise ValueError("must pass a valid string representation of a double")
+        return float(s)
+
+    def floatToStr(f, dp):
+        foo = round(f, dp)
+        float_string = repr(foo)
+        if 'e' in float_string:  # detect scientific notation
+            digits, exp = float_string.split('e')
+            digits = digits.replace('.', '').replace('-', '')
+            exp = int(exp)
+            zero_padding = '0' * (abs(int(exp)) - 1) # minus 1 for decimal point in the sci notation
+            sign = '-' if f < 0 else ''
+            if exp > 0:
+                float_string = '{}{}{}.0'.format(sign, digits, zero_padding)
+            else:
+                float_string = '{}0.{}{}'.format(sign, zero_padding, digits)
+        return float_string
+
+    @staticmethod
+    def doubleToString(d, dp) -> str:
+        if not d and 0.0 != d:
+            return None
+        if not dp and 0 != dp:
+            raise ValueError("must supply a decimal format pattern")
+        return str(round(d, dp))
+
+    def getNearestBlock(self, blocks):
+        if not blocks:
+            raise ValueError("must supply some blocks")
+        x = None
+        y = None
+        if self.isBlock():
+            foo = self.getLast()
+            if foo.getX() and foo.getY():
+                x = foo.getX()
+                y = foo.getY()
+            else:
+                x = foo.getEstimatedX()
+                y = foo.getEstimatedY()
+        if not x or not y:
+            if not self.getX() or not self.getY():
+                if 0.0 != self.getX() and 0.0 != self.getY():
+                    raise ValueError("can't compare self to blocks because I have no x or y coordinates")
+            x = self.getX()
+            y = self.getY()
+        d = 1000000
+        o = None
+        for b in blocks:
+            foo = b.getFirst()
+            if not foo.getX() or not foo.getY():
+                raise ValueError("blocks contains something that doesn't seem to be a block")
+            td = math.sqrt((x - foo.getX()) ** 2 + (y - foo.getY()) ** 2)
+            if td < d:
+                d = td
+                o = foo
+        return o
+
+    def isSameBlock(self, other):
+        if not self.isBlock():
+            return self == other
+        if not other.isBlock():
+            return False
+        return self.getFirst() == other.getFirst()
+
+    # returns this command as an SVG Path fragment
+    # prev x and y tell us where the tool is just before this command
+    def toSvgPathFragment(self, ox, oy) -> str:
+        # good path editor!
+        # https://yqnn.github.io/svg-path-editor/
+        # dilation: https://github.com/bbecquet/Leaflet.PolylineOffset/blob/master/leaflet.polylineoffset.js
+        r = ""
+        if not self.getCommand(): return r
+        if not self.nn("X") and not self.nn("Y"): return r
+
+        x = self.getX() if self.nn("X") else ox
+        y = self.getY() if self.nn("Y") else oy
+        if self.isCommand("G00"):
+            return "M " + str(x) + " " + str(y) + " "
+        if self.isCommand("G01"):
+            return "L " + str(x) + " " + str(y) + " "
+        if self.isCommand("G02") or self.isCommand("G03"):
+            if not self.nn("I") and not self.nn("J"): raise ValueError(self.getCommand() + " has no i or j")
+            # the centre is relative to the start of the arc (ox, oy)
+            cx = ox + (self.getI() or 0)
+            cy = oy + (self.getJ() or 0)
+            rad = str(math.hypot(ox - cx, oy - cy))
+            a0 = math.atan2(oy - cy, ox - cx)
+            a1 = math.atan2(y - cy, x - cx)
+            sweep = (a1 - a0) % (2 * math.pi) if self.isCommand("G03") else (a0 - a1) % (2 * math.pi)
+            flag = " 1 " if self.isCommand("G03") else " 0 "
+            # an arc can't end where it starts so a full circle is two halves
+            if sweep < 1e-9:
+                mx = 2 * cx - x
+                my = 2 * cy - y
+                return "A " + rad + " " + rad + " 0 0" + flag + str(mx) + " " + str(my) + " A " + rad + " " + rad + " 0 0" + flag + str(x) + " " + str(y) + " "
+            large = " 1" if sweep > math.pi else " 0"
+            return "A " + rad + " " + rad + " 0" + large + flag + str(x) + " " + str(y) + " "
+        return r
+
+    def translateCoordinates(self, ox, oy, angle):
+        if GrblCommand.isNone(ox) or GrblCommand.isNone(oy) or GrblCommand.isNone(angle):
+            return
+        if self.nn('X') and self.nn('Y'):
+            a = math.radians(angle)
+            rx = ox + math.cos(a) * (self.getX() - ox) - math.sin(a) * (self.getY() - oy)
+            ry = oy + math.sin(a) * (self.getX() - ox) + math.cos(a) * (self.getY() - oy)
+            if self.nn("I") and self.nn("J"):
+                ai = self.getX() + self.getI()
+                aj = self.getY() + self.getJ()
+                ax = ox + math.cos(a) * (ai - ox) - math.sin(a) * (aj - oy)
+                ay = oy + math.sin(a) * (ai - ox) + math.cos(a) * (aj - oy)
+                self.setI(ax - rx)
+                self.setJ(ay - ry)
+            self.setX(rx)
+            self.setY(ry)
+
+    # rotates the whole grbl file by the given angle (degrees)
+    # about the given x y coordinates
+    def rotate(self, angle, x, y):
+        if GrblCommand.isNone(x) or GrblCommand.isNone(y) or GrblCommand.isNone(angle):
+            return
+        if self.getPrevious() or self.getNext():
+            c = self.getFirst()
+            while c:
+                c.translateCoordinates(x, y, angle)
+                c = c.getNext()
+        else:
+            self.translateCoordinates(x, y, angle)
+        return self.getFirst()
+
+
+    def getNewDilatePoint(self, units: float, cx: float, cy: float) -> 'GrblCommand':
+        if not self.nn("X") or not self.nn("Y"):
+            return self
+        nx = cx + ((self.getX() - cx) * units)
+        ny = cy + ((self.getY() - cy) * units)
+        chord = math.sqrt(((nx - self.getX()) ** 2) + ((ny - self.getY()) ** 2))
+        if self.nn("I") and self.nn("J"):
+            # make centre points absolute
+            ocx = self.getX() - self.getI()
+            ocy = self.getY() - self.getJ()
+            # calculate new dilated centre points
+            ncx = cx + ((ocx - cx) * units)
+            ncy = cy + ((ocy - cy) * units)
+            # convert back to relative
+            self.setI(nx - ncx)
+            self.setJ(ny - ncy)
+        self.setX(nx)
+        self.setY(ny)
+        return self
+
+    def dilate(self, units: float, centreX: float, centreY: float) -> 'GrblCommand':
+        # dilate algorithm : Tiller and Hanson
+        c = self.getFirst()
+        f = c
+        while c:
+            # getNewDilatePoint can delete itself so make sure we use it in case it returns its previous
+            c = c.getNewDilatePoint(units, centreX, centreY)
+            c = c.getNext()
+        return f
+
+    # converts curves (G02,G03) into a set of points (G01) 
+    # that describe the same curve, based on the min_point_distance
+    def pointifySelf(self):
+        if "G02" != self.getCommand() and "G03" != self.getCommand(): return
+        geo = self.getGeometry()
+        cfg = self.getConfig()
+        # was this arc too fiddly to bother with or in some way incalculable?
+        if not geo or not geo["radius"] or cfg.min_point_distance > geo["radius"]: return self.removeArc()
+        # calculte how many points to replace this arc with
+        pointcount = math.trunc(geo["arclen"] / cfg.min_point_distance)
+        # for arcs with less than 2 points just convert directly to G01
+        if pointcount < 2: return self.removeArc()
+        # if the arc is too big, issue an error
+        if pointcount > 100:
+            raise ValueError("you should increase the min_point_distance or do not auto_decurve. This curve requires too many point iterations.")
+        # what is the angle between each interpolated point on the arc
+        subangle = math.copysign(cfg.min_point_distance / geo["radius"], geo["sweep"])
+        p = self.getPrevious()
+        n = None
+        s = 1
+        f = pointcount + 1
+        for i in range(s, f):
+            n = GrblCommand("G01 X0 Y0", cfg)
+            rads = geo["startangle"] + (subangle * i)
+            n.setX(geo["cx"] + geo["radius"] * math.cos(rads))
+            n.setY(geo["cy"] + geo["radius"] * math.sin(rads))
+            n.setPrevious(p)
+            p.setNext(n)
+            p = n
+        n.setNext(self)
+        self.setPrevious(n)
+        self.removeArc()
+
+    def despeckle(self):
+        c = self.getFirst()
+        if not c: return
+        o = c
+        mpd = c.getConfig().min_point_distance
+        while c:
+            geo = c.getGeometry()
+            if geo and geo["chord"] and mpd > geo["chord"]:
+                # what to do here if prev, self or next is an arc?
+                c.delete()
+            c = c.getNext()
+        return o
+
+    # pointifies (converts curves into short straight lines) 
+    # a whole block or whole grbl file  and removes any points 
+    # which are too close to each other to have any affect on 
+    # the outcome (despeckles the GRBL file)
+    def pointify(self) -> 'GrblCommand':
+        c = self.getFirst()
+        ret = c
+        while c:
+            c.pointifySelf()
+            c = c.getNext()
+        return ret
+
+    # offsets each block outwards (positive) or inwards (negative) by offs
+    # open paths are moved to their left (positive) or right (negative)
+    # join is "round", "miter" or "bevel" (see gml.offset.PathOffset)
+    # returns an offset copy, blocks which vanish are left out and blocks
+    # which split become several blocks (only the largest part is returned
+    # when offsetting a single block)
+    # closedOnly leaves open paths where they are
+    def offset(self, offs: float, join: str = "round", closedOnly: bool = False) -> 'GrblCommand':
+        from gml.offset import PathOffset
+        if self.isBlock():
+            parts = PathOffset.offsetBlock(self, offs, join, closedOnly)
+            if not parts: return None
+            return max(parts, key=lambda b: b.getLength())
+        return PathOffset.offsetProgram(self, offs, join, closedOnly)
+
+    # tool diameter compensation. Offsets each closed block by half the
+    # tool diameter, outwards when cutting around the outside of a shape
+    # ("profile") or inwards when clearing or cutting out its inside ("pocket")
+    # so the finished shape is the size of the artwork. Blocks inside other
+    # blocks (the holes in letters etc.) go the other way. diameter defaults
+    # to tool_diameter. previous is the diameter the program was already
+    # compensated for, so a program can be re-targeted to another tool
+    # (ie. compensate("profile", 3, 2) after changing a 2mm cutter for a 3mm one)
+    def compensate(self, mode: str = "profile", diameter: float = None, previous: float = 0) -> 'GrblCommand':
+        from gml.offset import PathOffset
+        if mode not in GrblCommand.compensation_modes:
+            raise ValueError("mode must be one of " + ", ".join(GrblCommand.compensation_modes))
+        if GrblCommand.isNone(diameter):
+            diameter = self.getConfig().tool_diameter
+        if diameter < 0 or previous < 0:
+            raise ValueError("tool diameters cannot be negative")
+        offs = (diameter - previous) / 2
+        if "pocket" == mode: offs = -offs
+        if self.isBlock():
+            return self.offset(offs, "round", True)
+        return PathOffset.offsetProgram(self, offs, "round", True, True)
+
+    # fills the closed blocks with lines spacing (mm) apart at angle (degrees)
+    # and for a cross hatch, again at the angle cross. Holes (areas inside
+    # an even number of blocks) are left empty. Returns a copy with the fill
+    # added as new blocks after the last block (see gml.fill.PathFill)
+    def hatch(self, spacing: float, angle: float = 0, cross: float = None) -> 'GrblCommand':
+        from gml.fill import PathFill
+        return PathFill.fillProgram(self, spacing, angle, cross)
+
+    # clears the inside of each closed block by cutting rings, each step (mm)
+    # inside the last, until nothing is left. Holes are left uncut. step
+    # defaults to half the tool_diameter. Returns a copy with each closed
+    # block replaced by the blocks which pocket it (see gml.pocket.PathPocket)
+    def pocket(self, step: float = None) -> 'GrblCommand':
+        from gml.pocket import PathPocket
+        if GrblCommand.isNone(step):
+            step = self.getConfig().tool_diameter / 2
+        return PathPocket.pocketProgram(self, step)
+
+    # adjusts the Z of every move by the height of the work surface under it
+    # splitting cuts longer than max_segment (mm) so they follow it. heights
+    # is a gml.level.HeightMap or the path of a probe file (see HeightMap.load)
+    # Best done last as every move then sets Z. Returns a levelled copy
+    def level(self, heights, max_segment: float = None) -> 'GrblCommand':
+        from gml.level import HeightMap
+        if isinstance(heights, str):
+            heights = HeightMap.load(heights)
+        return heights.level(self.toProgram(), max_segment).toCommands(self.getConfig())
+
+    # merges runs of nearly collinear straight cuts into single moves so
+    # GRBL doesn't slow down at every one of their corners (see
+    # gml.merge.PathMerge). The number of cutting moves and the estimated
+    # run time (s) before and after are added to the meta of the result
+    def merge(self, tolerance: float = None, max_angle: float = None) -> 'GrblCommand':
+        from gml.merge import PathMerge
+        m = PathMerge(tolerance, max_angle)
+        ret = m.merge(self.toProgram()).toCommands(self.getConfig())
+        meta = dict(self.getFirst().getMeta() or {})
+        meta.update({"segments_before": m.before, "segments_after": m.after, "time_before": m.time_before, "time_after": m.time_after})
+        ret.setMeta(meta)
+        return ret
+
+    def scale(self, units: float) -> 'GrblCommand':
+        return self.pipeline([("scale", [units])])
+
+    # moves the whole file according to the x y coordinates
+    # ie if x is -1 then the whole grbl file is moved 1 unit
+    # left etc.
+    def translate(self, x, y) -> 'GrblCommand':
+        self.pipeline([("translate", [x, y])])
+        return self
+
+    def reverseBlocks(self) -> 'GrblCommand':
+        blocks = self.getBlocks()
+        if not blocks or len(blocks) == 0:
+            raise ValueError("must supply blocks for sorting")
+        blocks.reverse()
+        ret = self.generateHeader()
+        for b in blocks:
+            ret = ret.appendObjects(self.generateEvacuationCommand())
+            ret = ret.appendBlock(b, False)
+        ret = ret.appendObject(self.generateFooter())
+        ret = ret.getFirst()
+        return ret
+
+    # a hash of the path this block cuts (see PathOffset.getHash) which is
+    # the same for any block cutting the same path, in either direction,
+    # to the same depth. None if the path can't be read (see fromBlock)
+    def getBlockHash(self, tolerance: float = None) -> str:
+        from gml.offset import PathOffset
+        if not tolerance: tolerance = self.getConfig().duplicate_tolerance
+        depth = None
+        c = self.getFirst()
+        while c:
+            if c.nn("Z") and (depth is None or c.getZ() < depth): depth = c.getZ()
+            c = c.getNext()
+        try:
+            return PathOffset.fromBlock(self).getHash(tolerance, depth or 0.0)
+        except ValueError:
+            return None
+
+    # a hash of the values of every command in this block (but not their
+    # line numbers), unlike getBlockHash any change at all (a feed rate,
+    # the direction etc.) gives another key
+    def getBlockKey(self) -> str:
+        import hashlib
+        h = hashlib.blake2b(digest_size=16)
+        c = self.getFirst()
+        while c:
+            h.update(repr([(k, v) for k, v in c.vals.items() if k != "N" and v is not None]).encode("utf-8"))
+            # (penetrates may only be marked in the line, see isPenetrate)
+            if c.line and "Penetrate" in c.line: h.update(b"Penetrate")
+            if c.isLevelledCut(): h.update(b"Levelled cut")
+            c = c.getNext()
+        return h.hexdigest()
+
+    # drops blocks cutting the same path as an earlier block (stacked
+    # copies of the same object in Inkscape etc.) returning (blocks kept,
+    # number removed, length of cut removed (mm)). seen (a set of block
+    # hashes) is added to so that it may be carried from call to call
+    def removeDuplicateBlocks(self, blocks, seen: set = None) -> tuple:
+        from gml.offset import PathOffset
+        if seen is None: seen = set()
+        tolerance = self.getConfig().duplicate_tolerance
+        ret = []
+        count = 0
+        length = 0.0
+        for b in blocks:
+            h = b.getBlockHash(tolerance)
+            # blocks whose path can't be read are always kept
+            if h is None:
+                ret.append(b)
+                continue
+            if h in seen:
+                count += 1
+                length += PathOffset.fromBlock(b).getCutLength()
+                continue
+            seen.add(h)
+            ret.append(b)
+        return (ret, count, length)
+
+    # sorts blocks such that the first block is closest to 0,0 (cartesian coords)
+    # and each subsequent block is closest to the block before it
+    # TODO travelling salesman
+    # origin is where the tool is before the first block (defaults to 0,0)
+    def sortBlocks(self, blocks, origin: 'GrblCommand' = None) -> 'GrblCommand':
+        if not blocks or len(blocks) == 0:
+            raise ValueError("must supply blocks for sorting")
+        ret = []
+        #first element should be closest to zero
+        tb = blocks
+        comp = origin
+        if not comp:
+            comp = GrblCommand("G00 X0.0 Y0.0")
+        for x in range(0, len(tb)):
+            f = comp.getNearestBlock(tb)
+            if not f:
+                raise ValueError("failed to find the nearest block")
+            ret.append(f)
+            tb.remove(f)
+            comp = f
+        return ret
+
+    def extrude(self, iterations, byblock):
+        if not iterations:
+            raise ValueError("must pass iterations number")
+        cfg = self.getConfig()
+        ret = self.generateHeader()
+        blocks = self.getBlocks()
+        if cfg.autoBlockSort:
+            blocks = self.sortBlocks(blocks)
+        
+        depth = 0
+        if not byblock:
+            for x in range(0, iterations):
+                depth = cfg.depth_step + depth
+                for b in blocks:
+                    ret = ret.append("")
+                    ret = ret.appendObjects(self.generateEvacuationCommand())
+                    b.setPenetrateDepth(depth)
+                    ret = ret.appendBlock(b)
+                    ret = ret.append("")
+        else:
+            for b in blocks:
+                depth = 0
+                ret = ret.append("")
+                ret = ret.appendObjects(self.generateEvacuationCommand())
+                for x in range(0, iterations):
+                    depth = cfg.depth_step + depth
+                    b.setPenetrateDepth(depth)
+                    ret = ret.append("")
+                    ret = ret.appendBlock(b)
+                    ret = ret.append("")
+
+        ret = ret.appendObjects(self.generateEvacuationCommand())
+        ret = ret.appendObject(self.generateFooter())
+        ret = ret.getFirst()
+        return ret
+
+    # returns the whole chain as an SVG drawing, each block as a path
+    # (see gml.svg.GrblSvg), or when outpath is given writes it to that
+    # file a chunk at a time (for very large programs) and returns outpath
+    def toSVG(self, outpath: str = None) -> str:
+        # online visualisation
+        # https://www.freecodeformat.com/svg-editor.php
+        from gml.svg import GrblSvg
+        program = self.toProgram()
+        if outpath:
+            GrblSvg.burp(program, outpath, self.getConfig())
+            return outpath
+        f = io.StringIO()
+        GrblSvg.write(program, f, self.getConfig())
+        return f.getvalue()
+
+    # writes a thumbnail of the whole chain to a PNG file, size pixels
+    # across its longest side (see gml.preview.GrblPreview)
+    def toPNG(self, outpath: str, size: int = None) -> str:
+        from gml.preview import GrblPreview
+        GrblPreview(self.toProgram(), size).burp(outpath)
+        return outpath
+
+    def isCommand(self, command: str) -> bool:
+        c = self.getCommand()
+        if not c or not command: return False
+        return command == c
+
+    def getCommand(self):
+        if not self.isNone("G"):
+            return "G" + str(self.vals['G']).zfill(2)
+        if not self.isNone("M"):
+            return 'M' + str(self.vals['M']).zfill(2)
+        return None
+
+    def getLargestXY(self):
+        c = self.getFirst()
+        x = 0
+        y = 0
+        while c:
+            if c.getX() and abs(x) < abs(c.getX()):
+                x = c.getX()
+            if c.getY() and abs(y) < abs(c.getY()):
+                y = c.getY()
+            c = c.getNext()
+        return {"x": x, "y": y}
+
+    def getFirstContactPoint(self) -> 'GrblCommand':
+        c = self.getFirst()
+        while c:
+            if self.isCommand("G00"):
+                return c
+        return None
+
+    def getParameterAsString(self, paramname: str) -> any:
+        ret = self.vals[paramname]
+        if ret is None and (0 != ret): return None
+        if isinstance(ret, float):
+            return GrblCommand.floatToStr(self.vals[paramname], self.getConfig().max_dp)
+        elif isinstance(ret, int):
+            return str(ret).zfill(2)
+        else:
+            return str(ret)
+
+    @staticmethod
+    def isNone(obj: any) -> bool:
+        # Lolz, python :)
+        foo = isinstance(obj, type(None))
+        return foo
+
+    # Return true if the given parameter exists and is not null
+    def nn(self, param: str) -> bool:
+        return self.vals[param] is not None
+
+    def getComment(self): return self.vals["COMMENT"]
+    def setComment(self, comment: str): self.setParameter("COMMENT", comment)
+    def getX(self): return self.vals["X"]
+    def setX(self, x: float): self.setMoveParameter("X", x)
+    def getStrX(self): return self.getParamAsString("X")
+    def getY(self): return self.vals["Y"]
+    def setY(self, y: float): self.setMoveParameter("Y", y)
+    def getStrY(self): return self.getParamAsString("Y")
+    def getZ(self): return self.vals["Z"]
+    def setZ(self, z: float): self.setParameter("Z", z)
+    def getStrZ(self): return self.getParamAsString("Z")
+    def getI(self): return self.vals["I"]
+    def setI(self, i: float): self.setMoveParameter("I", i)
+    def getStrI(self): return self.getParamAsString("I")
+    def getJ(self): return self.vals["J"]
+    def setJ(self, j: float): self.setMoveParameter("J", j)
+    def getStrJ(self): return self.getParamAsString("J")
+    def getF(self): return self.vals["F"]
+    def setF(self, f: float): self.setParameter("F", f)
+    def getStrF(self): return self.getParamAsString("F")
+    def getS(self): return self.vals["S"]
+    def setS(self, s: float): self.setParameter("S", s)
+    def getStrS(self): return self.getParamAsString("S")
+    def getP(self): return self.vals["P"]
+    def setP(self, p: float): self.setParameter("P", p)
+    def getStrP(self): return self.getParamAsString("P")
+
+    @staticmethod
+    def parseParameter(c: str) -> any:
+        if not c:
+            raise ValueError("cannot parse null value")
+        foo = re.sub("[^0-9\\-\\.]", "", c)
+        if foo:
+            if "." in foo:
+                return GrblCommand.stringToDouble(foo)
+            else:
+                return int(foo)
+        else:
+            return c
+
+    @staticmethod
+    def isValidDouble(d):
+        return d or 0.0 == d
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    def __str__(self) -> str:
+        ret = ""
+        if not self.visible:
+            return ret
+
+        if not self.getCommand():
+            if self.getComment():
+                return self.getComment()
+            return ""
+
+        for o in GrblCommand.order:
+            if self.nn(o):
+                p = self.getParameterAsString(o)
+                if len(ret) == 0:
+                    ret = ret + o + p
+                else:
+                    ret = ret + " " + o + p
+        return ret
+
+    # the offsets allow numbering to continue across separately
+    # written chains of commands (see processGrblChunked)
+    def getLine(self, lineOffset: int = 0, blockOffset: int = 0) -> str:
+        # override this if necessary
+        ret = ""
+        cfg = self.getConfig()
+        if cfg.showIndices:
+            ret += str(self.getIndex() + lineOffset)
+            ret += " "
+            ret += str(self.block + blockOffset)
+            ret += " "
+            ret += str(self.blockIndex)
+            ret += " "
+
+        if cfg.auto_number_lines and not self.isBlank():
+            ret += "N" + str(self.getIndex() + lineOffset) + " "
+        
+        if cfg.auto_number_blocks and self.isBlockStart():
+            ret += "O" + str(self.block + blockOffset) + " "
+
+        ret += str(self)
+        
+        if self.isPenetrate():
+            ret += " (Penetrate)"
+        if self.isEvacuation():
+            ret += " (Evacuate)"
+        if self.isLevelledCut():
+            ret += " (Levelled cut)"
+        if self.isBlockStart():
+            ret += " (block start)"
+        if self.isBlockEnd():
+            ret += " (block end)"
+        ret += "\n"
+        return ret
+
+    def dump(self):
+        ret = ""
+        c = self.getFirst()
+        if not c:
+            raise Exception("no start node")
+        while c:
+            if c.visible:
+                ret += self.getLine()
+            c = c.getNext()
+        return ret
+
+    @staticmethod
+    def fromSvg(inpath: str, config: GrblConfig = None):
+        from gml.svgread import GrblSvgReader
+        if not config: config = GrblConfig.current()
+        return GrblSvgReader.read(inpath, config).toCommands(config)
+
+    # config (if not given) is a snapshot of the GrblCommand class attributes
+    # and is shared by every command in the returned chain
+    @staticmethod
+    def slurpFile(inpath: str, config: GrblConfig = None):
+        f = open(inpath, "r")
+        try:
+            lines = f.read().splitlines()
+        finally:
+            f.close()
+        return GrblCommand.slurpLines(lines, None, config)
+
+    @staticmethod
+    def slurp(s: str, config: GrblConfig = None):
+        if not s: raise ValueError("must supply a valid GRBL string in lines delimited by newline character")
+        return GrblCommand.slurpLines(s.splitlines(), None, config)
+
+    # builds a chain of commands from a list of lines
+    # seed (if given) becomes the first command of the chain so that
+    # modal state (current depth, feed rate etc.) is known to the lines
+    @staticmethod
+    def slurpLines(lines, seed: 'GrblCommand' = None, config: GrblConfig = None):
+        if not lines and not seed: raise ValueError("must supply some lines")
+        if not config: config = GrblConfig.current()
+        if seed: seed.setConfig(config)
+        ret = seed
+        for line in lines:
+            c = GrblCommand(line, config)
+            if not ret:
+                ret = c
+                continue
+            ret = ret.appendObject(c)
+        return ret.getFirst()
+
+    # returns True if a chunked read may be split just before this line
+    # blocks always end at fast travel or spindle stop so no block
+    # can straddle such a split
+    @staticmethod
+    def isChunkBoundary(line: str) -> bool:
+        c = GrblCommand(line)
+        return c.isCommand("G00") or c.isCommand("M05")
+
+    # lazily reads a GRBL file yielding lists of (roughly) chunk_lines lines
+    # Lists are only ever split at a chunk boundary (see isChunkBoundary)
+    # so a single block longer than chunk_lines is kept whole
+    @staticmethod
+    def readChunks(inpath: str, chunk_lines: int = None):
+        if not chunk_lines: chunk_lines = GrblConfig.current().chunk_lines
+        if chunk_lines < 1: raise ValueError("chunk_lines must be positive")
+        window = []
+        with open(inpath, "r") as f:
+            for line in f:
+                line = line.rstrip("\r\n")
+                if len(window) >= chunk_lines and GrblCommand.isChunkBoundary(line):
+                    yield window
+                    window = []
+                window.append(line)
+        if window:
+            yield window
+
+    # returns a blank command holding the last value of each of the
+    # modal_params seen in this chain, for seeding the next chunk
+    def getModalSeed(self) -> 'GrblCommand':
+        ret = GrblCommand("", self.config)
+        c = self.getLast()
+        while c:
+            for l in GrblCommand.modal_params:
+                if not ret.nn(l) and c.nn(l):
+                    ret.vals[l] = c.vals[l]
+            c = c.getPrevious()
+        return ret
+
+    # programs outside the config's machine_envelope are not written
+    def burp(self, outpath: str):
+        self.validateEnvelope()
+        try:
+            os.remove(outpath)
+        except OSError:
+            pass
+
+        f = open(outpath, "a")
+        try:
+            self.write(f)
+        finally:
+            f.close()
+
+    # writes the whole chain to an already open file
+    # returns the number of lines written
+    def write(self, f, lineOffset: int = 0, blockOffset: int = 0) -> int:
+        ret = 0
+        c = self.getFirst()
+        while c:
+            f.write(c.getLine(lineOffset, blockOffset))
+            ret += 1
+            c = c.getNext()
+        return ret
+
+    # returns the whole chain as a list of compact (marshal and pickle
+    # friendly) records of the raw line, the parameters which are set,
+    # visibility and block numbering
+    def toRecords(self) -> list:
+        ret = []
+        c = self.getFirst()
+        while c:
+            ret.append((c.line, {k: v for k, v in c.vals.items() if not GrblCommand.isNone(v)}, c.visible, c.block, c.blockIndex))
+            c = c.getNext()
+        return ret
+
+    # rebuilds a chain from toRecords()
+    @staticmethod
+    def fromRecords(records: list, config: GrblConfig = None) -> 'GrblCommand':
+        if not records: raise ValueError("must supply some records")
+        if not config: config = GrblConfig.current()
+        ret = None
+        for line, vals, visible, block, blockIndex in records:
+            c = GrblCommand("", config)
+            c.line = line
+            c.vals.update(vals)
+            c.visible = visible
+            if ret:
+                ret = ret.appendObject(c)
+            else:
+                ret = c
+            c.block = block
+            c.blockIndex = blockIndex
+        return ret.getFirst()
+
+    # returns the whole chain as a columnar gml.program.GrblProgram
+    # (requires numpy)
+    def toProgram(self):
+        from gml.program import GrblProgram
+        return GrblProgram.fromCommands(self)
+
+    # saves the whole chain in the GML binary format (see GrblProgram.save)
+    def save(self, outpath: str):
+        self.toProgram().save(outpath)
+
+    # loads a chain saved with save()
+    @staticmethod
+    def load(inpath: str, config: GrblConfig = None) -> 'GrblCommand':
+        from gml.program import GrblProgram
+        return GrblProgram.load(inpath).toCommands(config)
+
+    def burpBlock(self, blocknum:int, outpath:str):
+        # TODO this
+        pass
+
+    def length(self) -> int:
+        ret = 1
+        if not self.start:
+            return 0
+        c = self.start
+        while c:
+            c = c.getNext()
+            ret += 1
+        return ret
+    
+    def __oc__(self, s, o):
+        if s is None:
+            if o is None:
+                return True
+            else:
+                return False
+        else:
+            if o is None: return False
+        if not isinstance(o, s.__class__):
+            return False
+        return o == s
+
+    def __eq__(self, other):
+        if not other:
+            return False
+
+        if not isinstance(other, self.__class__):
+            return False
+
+        if not self.__oc__(self.vals, other.vals): return False
+        if self.isBlock():
+            if not other.isBlock(): return False
+            if not self.__oc__(self.block, other.block): return False
+            if not self.__oc__(self.blockIndex, other.blockIndex): return False
+        else:
+            if other.isBlock(): return False
+        return True
+
+    def __deepcopy__(self):
+        if self.isMultiple():
+            c = self.getFirst()
+            ret = c.__copy__()
+            while c:
+                c = c.getNext()
+                if c:
+                    foo = c.__copy__()
+                    ret = ret.appendObject(foo)
+            return ret
+        else:
+            return self.__copy__()
+
+    def __copy__(self):
+        n = type(self)("", self.config)
+        n.vals = self.vals.copy()
+        n.line = self.line
+        n.block = self.block
+        n.blockIndex = self.blockIndex
+        return n
+
+    # cache (a gml.cache.GrblCache) if given returns a previously processed
+    # copy of the same file processed with the same config. Nothing is
+    # written without an outfile (ie. when it is to be transformed first)
+    @staticmethod
+    def processGrbl(infile: str, outfile: str, config: GrblConfig = None, cache=None) -> 'GrblCommand':
+        if not config: config = GrblConfig.current()
+        key = None
+        if cache:
+            key = cache.getKey(infile, config, "grbl")
+            commands = cache.get(key, config, outfile)
+            if commands:
+                return commands
+        commands:GrblCommand = GrblCommand.slurpFile(infile, config)
+        if config.auto_sanitise: commands = commands.sanitise()
+        if outfile: commands.burp(outfile)
+        if cache: cache.put(key, commands, outfile)
+        return commands
+
+    # as processGrbl, but reads, sanitises, transforms and writes the file
+    # a window of chunk_lines lines at a time so that memory use does not
+    # grow with the size of the file. Windows are split between blocks
+    # and the modal state (depth, feed etc.) is carried across each split.
+    # transform (if given) is called with each sanitised window and must
+    # return the (possibly new) chain of commands ie. lambda c: c.translate(10, 0)
+    # Note that autoBlockSort only sorts blocks within each window.
+    # Returns the number of blocks written
+    @staticmethod
+    def processGrblChunked(infile: str, outfile: str, transform=None, chunk_lines: int = None, config: GrblConfig = None) -> int:
+        if not config: config = GrblConfig.current()
+        if not chunk_lines: chunk_lines = config.chunk_lines
+        try:
+            os.remove(outfile)
+        except OSError:
+            pass
+
+        blockCount = 0
+        lineCount = 0
+        seed = None
+        last = None
+        # the hashes of the blocks written so far (see removeDuplicateBlocks)
+        seen = set()
+        f = open(outfile, "a")
+        try:
+            lineCount += GrblCommand("", config).generateHeader().write(f)
+            for lines in GrblCommand.readChunks(infile, chunk_lines):
+                commands = GrblCommand.slurpLines(lines, seed, config)
+                seed = commands.getModalSeed()
+                blocks = commands.getBlocks()
+                if config.remove_duplicates:
+                    blocks = commands.removeDuplicateBlocks(blocks, seen)[0]
+                if not blocks:
+                    continue
+                if config.autoBlockSort:
+                    blocks = commands.sortBlocks(blocks, last)
+                last = blocks[-1].getLast()
+                ret = GrblCommand("", config)
+                for b in blocks:
+                    ret = ret.appendObjects(commands.generateEvacuationCommand())
+                    ret = ret.appendBlock(b, False)
+                # drop the blank head of the chain
+                ret = ret.getFirst().delete()
+                if transform:
+                    ret = transform(ret)
+                lineCount += ret.write(f, lineCount, blockCount)
+                blockCount += len(blocks)
+                # release the window before reading the next
+                commands = blocks = ret = None
+            ret = GrblCommand("", config)
+            ret = ret.appendObjects(ret.generateEvacuationCommand())
+            ret = ret.appendObject(ret.generateFooter())
+            ret.write(f, lineCount, blockCount)
+        finally:
+            f.close()
+        return blockCount
+
+class Processor():
+    # as processGrbl, nothing is written without an outfile
+    @staticmethod
+    def processSvg(infile:str, outfile:str, config: GrblConfig = None, cache=None) -> GrblCommand:
+        if not config: config = GrblConfig.current()
+        key = None
+        if cache:
+            key = cache.getKey(infile, config, "svg")
+            commands = cache.get(key, config, outfile)
+            if commands:
+                return commands
+        commands:GrblCommand = GrblCommand.fromSvg(infile, config)
+        if config.auto_sanitise: commands = commands.sanitise()
+        if outfile: commands.burp(outfile)
+        if cache: cache.put(key, commands, outfile)
+        return commands
+
+    # engraves a grayscale image (any file pillow can read, pip3 install pillow)
+    # with a laser, each pixel being pixel_size (mm) square (see gml.raster.GrblRaster)
+    # returns the columnar program (see GrblProgram.toCommands)
+    @staticmethod
+    def processImage(infile: str, outfile: str, pixel_size: float = 0.1, config: GrblConfig = None):
+        from gml.raster import GrblRaster
+        raster = GrblRaster(GrblRaster.loadImage(infile), pixel_size, config)
+        raster.burp(outfile)
+        return raster.toProgram()
@@ -0,0 +1,329 @@
+# pylint: disable = line-too-long
+
+# pip3 install numpy
+from typing import List
+import math
+import numpy as np
+from gml.command import GrblCommand
+from gml.offset import PathOffset
+
+
+class PathFill():
+    """
+        Fills the area inside a set of closed paths with parallel lines
+        (hatching), held as NumPy arrays of the straight edges of the paths.
+
+        The lines are found by rotating the edges so the lines are horizontal
+        and intersecting every edge with every line it spans at once. Points
+        are inside when they are inside an odd number of the paths so the
+        holes in letters etc. are left empty.
+
+        Lines on neighbouring rows which only overlap each other are cut one
+        after the other in alternate directions (boustrophedon) without
+        lifting the tool, as long as the short move between them stays inside
+        the area. Each such run of lines is a strand.
+    """
+    # arcs are split into lines within this distance (mm) of the arc
+    chord_tolerance = 0.01
+    # lines shorter than this (mm) are not cut
+    min_length = 0.01
+    # moves between lines longer than this many times the spacing lift the tool
+    max_link = 2.0
+
+    # every closed path is taken as a boundary, open paths are ignored
+    def __init__(self, paths: List[PathOffset]):
+        ax, ay, bx, by = [], [], [], []
+        for p in paths:
+            if not p.isClosed(): continue
+            x, y = p.linearise(PathFill.chord_tolerance)[:2]
+            # close any small gap exactly
+            x = np.append(x, x[0])
+            y = np.append(y, y[0])
+            ax.append(x[:-1])
+            ay.append(y[:-1])
+            bx.append(x[1:])
+            by.append(y[1:])
+        if not ax:
+            ax = ay = bx = by = [np.zeros(0)]
+        self.ax = np.concatenate(ax)
+        self.ay = np.concatenate(ay)
+        self.bx = np.concatenate(bx)
+        self.by = np.concatenate(by)
+
+    def getLength(self) -> int:
+        return len(self.ax)
+
+    @staticmethod
+    def fromBlocks(blocks: List[GrblCommand]) -> 'PathFill':
+        return PathFill([PathOffset.fromBlock(b) for b in blocks])
+
+    # the edges rotated by -angle (radians) so lines at angle are horizontal
+    def getRotated(self, angle: float) -> tuple:
+        c = math.cos(angle)
+        s = math.sin(angle)
+        return (self.ax * c + self.ay * s, self.ay * c - self.ax * s, self.bx * c + self.by * s, self.by * c - self.bx * s)
+
+    # returns (row, u0, u1) for each line inside the area in the rotated
+    # frame, sorted by row and then u, row r is at (r + 0.5) * spacing so
+    # neighbouring areas filled separately line up
+    def getLines(self, spacing: float, angle: float) -> tuple:
+        ua, va, ub, vb = self.getRotated(angle)
+        lo = np.ceil(np.minimum(va, vb) / spacing - 0.5).astype(np.int64)
+        hi = np.ceil(np.maximum(va, vb) / spacing - 0.5).astype(np.int64)
+        # every edge crosses rows lo to hi - 1 (an edge which ends on a row
+        # counts once for the two edges which meet there)
+        count = np.maximum(hi - lo, 0)
+        e = np.repeat(np.arange(len(count)), count)
+        row = lo[e] + np.arange(len(e)) - np.repeat(np.cumsum(count) - count, count)
+        t = ((row + 0.5) * spacing - va[e]) / (vb[e] - va[e])
+        u = ua[e] + (ub[e] - ua[e]) * t
+        order = np.lexsort((u, row))
+        row = row[order]
+        u = u[order]
+        # every row crosses the boundary an even number of times so pairs
+        # of crossings are the lines inside
+        row, u0, u1 = row[0::2], u[0::2], u[1::2]
+        m = u1 - u0 >= PathFill.min_length
+        return (row[m], u0[m], u1[m])
+
+    # returns the index of the line which follows each line (or -1), the
+    # line on the next row when each is the only line the other overlaps
+    @staticmethod
+    def getFollowers(row, u0, u1):
+        ret = np.full(len(row), -1, dtype=np.int64)
+        if not len(row): return ret
+        # keys which sort by row and then position along the row
+        low = float(np.min(u0))
+        width = float(np.max(u1)) - low
+        width = width * (1 + 1e-9) + PathOffset.eps
+        left = row + (u0 - low) / width
+        right = row + (u1 - low) / width
+        # the lines on row r which end after and start before a line
+        first = np.searchsorted(right, left + 1, "right")
+        count = np.searchsorted(left, right + 1, "left") - first
+        back = np.searchsorted(right, left - 1, "right")
+        backCount = np.searchsorted(left, right - 1, "left") - back
+        a = np.flatnonzero(count == 1)
+        b = first[a]
+        m = (backCount[b] == 1) & (back[b] == a)
+        ret[a[m]] = b[m]
+        return ret
+
+    # returns True for each move from (pu, row) to (qu, row + 1) in the
+    # rotated frame (see getLines) which neither crosses the boundary nor
+    # leaves the area, allowing them to touch it at their ends or run along
+    # it. The middle of each move is shifted by nudge (along the rows)
+    # towards the area before checking it is inside
+    @staticmethod
+    def isInside(edges: tuple, spacing: float, row, pu, qu, nudge) -> np.ndarray:
+        ret = np.ones(len(row), dtype=bool)
+        if not len(row): return ret
+        ua, va, ub, vb = edges
+        # only the edges in the band between the rows can be crossed
+        lo = np.floor(np.minimum(va, vb) / spacing - 0.5).astype(np.int64)
+        count = np.floor(np.maximum(va, vb) / spacing - 0.5).astype(np.int64) - lo + 1
+        e = np.repeat(np.arange(len(count)), count)
+        band = lo[e] + np.arange(len(e)) - np.repeat(np.cumsum(count) - count, count)
+        order = np.argsort(band, kind="stable")
+        band = band[order]
+        e = e[order]
+        starts = np.searchsorted(band, row, "left")
+        counts = np.searchsorted(band, row, "right") - starts
+        rx = ub - ua
+        ry = vb - va
+        chunk = 100000
+        for s in range(0, len(row), chunk):
+            n = counts[s:s + chunk]
+            link = np.repeat(np.arange(len(n)), n)
+            j = e[np.repeat(starts[s:s + chunk], n) + np.arange(len(link)) - np.repeat(np.cumsum(n) - n, n)]
+            l = link + s
+            sx = pu[l]
+            sy = (row[l] + 0.5) * spacing
+            dx = qu[l] - sx
+            dy = spacing
+            den = dx * ry[j] - dy * rx[j]
+            ok = np.abs(den) > PathOffset.eps
+            den = np.where(ok, den, 1)
+            t = ((ua[j] - sx) * ry[j] - (va[j] - sy) * rx[j]) / den
+            u = ((ua[j] - sx) * dy - (va[j] - sy) * dx) / den
+            crosses = ok & (t > 1e-6) & (t < 1 - 1e-6) & (u >= 0) & (u <= 1)
+            # count the edges to the right of the middle, moves which cross
+            # nothing are wholly inside or outside
+            my = sy + dy / 2
+            mx = sx + dx / 2 + nudge[l]
+            spans = (va[j] <= my) != (vb[j] <= my)
+            x = ua[j] + (my - va[j]) * rx[j] / np.where(ry[j] == 0, 1, ry[j])
+            right = spans & (x > mx)
+            inside = np.bincount(link, weights=right, minlength=len(n)) % 2 == 1
+            ret[s:s + chunk] = inside & (np.bincount(link, weights=crosses, minlength=len(n)) == 0)
+        return ret
+
+    # True for the points inside an odd number of the paths
+    def getInside(self, px, py) -> np.ndarray:
+        ret = np.zeros(len(px), dtype=bool)
+        ax, ay, bx, by = self.ax, self.ay, self.bx, self.by
+        chunk = max(1, 4000000 // max(self.getLength(), 1))
+        for s in range(0, len(px), chunk):
+            qx = px[s:s + chunk, None]
+            qy = py[s:s + chunk, None]
+            spans = (ay <= qy) != (by <= qy)
+            x = ax + (qy - ay) * (bx - ax) / np.where(by == ay, 1, by - ay)
+            ret[s:s + chunk] = np.count_nonzero(spans & (x > qx), axis=1) % 2 == 1
+        return ret
+
+    # returns a list of (x, y) arrays, one per strand, of the points to cut
+    # in order when filling with lines spacing (mm) apart at angle (degrees)
+    def hatch(self, spacing: float, angle: float = 0) -> List[tuple]:
+        if not spacing or spacing <= 0:
+            raise ValueError("spacing must be positive")
+        if not self.getLength(): return []
+        a = math.radians(angle)
+        row, u0, u1 = self.getLines(spacing, a)
+        if not len(row): return []
+        follows = PathFill.getFollowers(row, u0, u1)
+        # follow the lines into strands, alternate lines run backwards
+        previous = np.zeros(len(row), dtype=bool)
+        previous[follows[follows >= 0]] = True
+        strands = []
+        backwards = np.zeros(len(row), dtype=bool)
+        for s in np.flatnonzero(~previous).tolist():
+            strand = [s]
+            n = follows[s]
+            while n >= 0:
+                backwards[n] = not backwards[strand[-1]]
+                strand.append(n)
+                n = follows[n]
+            strands.append(strand)
+        su = np.where(backwards, u1, u0)
+        eu = np.where(backwards, u0, u1)
+        v = (row + 0.5) * spacing
+        # check the moves between lines, strands are cut where they leave the area
+        f = np.flatnonzero(follows >= 0)
+        g = follows[f]
+        ok = np.hypot(su[g] - eu[f], v[g] - v[f]) <= PathFill.max_link * spacing
+        f = f[ok]
+        g = g[ok]
+        # the area is back along the line which was just cut
+        nudge = np.where(backwards[f], 1e-6, -1e-6) * spacing
+        ok[ok] = PathFill.isInside(self.getRotated(a), spacing, row[f], eu[f], su[g], nudge)
+        broken = np.zeros(len(row), dtype=bool)
+        broken[follows[follows >= 0][~ok]] = True
+        c = math.cos(a)
+        s = math.sin(a)
+        ret = []
+        for strand in strands:
+            strand = np.asarray(strand)
+            for p in np.split(strand, np.flatnonzero(broken[strand[1:]]) + 1):
+                u = np.column_stack((su[p], eu[p])).ravel()
+                w = np.repeat(v[p], 2)
+                ret.append((u * c - w * s, u * s + w * c))
+        return ret
+
+    # orders the strands (reversing some) so each starts near where the
+    # last ended, starting from (x, y). The ends of the strands are kept in
+    # a grid so the nearest is usually found by looking in a few cells
+    @staticmethod
+    def sortStrands(strands: List[tuple], x: float = 0, y: float = 0) -> List[tuple]:
+        n = len(strands)
+        if not n: return []
+        # ends p < n are the start of strand p, the rest are the ends
+        px = np.array([s[0][0] for s in strands] + [s[0][-1] for s in strands])
+        py = np.array([s[1][0] for s in strands] + [s[1][-1] for s in strands])
+        size = math.sqrt(max(float(np.ptp(px)) * float(np.ptp(py)), PathOffset.eps) / n)
+        size = max(size, float(max(np.ptp(px), np.ptp(py))) / n, PathOffset.eps)
+        cells = {}
+        for p, cell in enumerate(zip(np.floor(px / size).astype(np.int64).tolist(), np.floor(py / size).astype(np.int64).tolist())):
+            cells.setdefault(cell, []).append(p)
+        xs = px.tolist()
+        ys = py.tolist()
+        used = np.zeros(n, dtype=bool)
+        ret = []
+        for _ in range(n):
+            gx = math.floor(x / size)
+            gy = math.floor(y / size)
+            best = None
+            dist = math.inf
+            for k in range(3):
+                for i in range(gx - k, gx + k + 1):
+                    for j in range(gy - k, gy + k + 1):
+                        if max(abs(i - gx), abs(j - gy)) != k: continue
+                        for p in cells.get((i, j), ()):
+                            if used[p % n]: continue
+                            d = math.hypot(xs[p] - x, ys[p] - y)
+                            if d < dist:
+                                best = p
+                                dist = d
+                # anything in the next ring is further than this
+                if best is not None and dist <= k * size: break
+            else:
+                # too far from the rest to search the grid
+                d = np.where(np.concatenate((used, used)), np.inf, np.hypot(px - x, py - y))
+                best = int(np.argmin(d))
+            s = best % n
+            used[s] = True
+            if best < n:
+                ret.append(strands[s])
+                x, y = xs[s + n], ys[s + n]
+            else:
+                ret.append((strands[s][0][::-1], strands[s][1][::-1]))
+                x, y = xs[s], ys[s]
+        return ret
+
+    # builds a block which cuts along the points
+    @staticmethod
+    def toBlock(x, y, cfg) -> GrblCommand:
+        x = np.asarray(x).tolist()
+        y = np.asarray(y).tolist()
+        ret = GrblCommand("G00", cfg)
+        ret.vals["X"] = x[0]
+        ret.vals["Y"] = y[0]
+        ret.vals["F"] = cfg.fast_travel_speed
+        ret.blockIndex = 0
+        ret = ret.appendObject(GrblCommand("G01 Z0 F0 (Penetrate)", cfg))
+        ret.vals["Z"] = cfg.depth_step
+        ret.vals["F"] = cfg.penetrate_speed
+        for k in range(1, len(x)):
+            o = GrblCommand("", cfg)
+            o.vals["G"] = 1
+            o.vals["X"] = x[k]
+            o.vals["Y"] = y[k]
+            if k == 1: o.vals["F"] = cfg.cut_speed
+            # link directly (see PathOffset.toBlock)
+            o.previous = ret
+            ret.next = o
+            o.block = ret.block
+            o.blockIndex = ret.blockIndex + 1
+            ret = o
+        return ret.getFirst()
+
+    # returns a copy of the program with the closed blocks filled with
+    # lines spacing (mm) apart at angle (degrees) and, if cross is given,
+    # again at the angle cross. The fill is added as new blocks after the
+    # last block
+    @staticmethod
+    def fillProgram(commands: GrblCommand, spacing: float, angle: float = 0, cross: float = None) -> GrblCommand:
+        cfg = commands.getConfig()
+        parts = PathOffset.splitProgram(commands)
+        blocks = [p[0] for p in parts if isinstance(p, list)]
+        fill = PathFill.fromBlocks(blocks)
+        strands = fill.hatch(spacing, angle)
+        if not GrblCommand.isNone(cross):
+            strands += fill.hatch(spacing, cross)
+        x = y = 0
+        if blocks:
+            path = PathOffset.fromBlock(blocks[-1])
+            if path.getLength(): x, y = float(path.x[-1]), float(path.y[-1])
+        strands = PathFill.sortStrands(strands, x, y)
+        last = max([n for n in range(len(parts)) if isinstance(parts[n], list)], default=len(parts) - 1)
+        ret = None
+        for n in range(len(parts)):
+            p = parts[n]
+            if isinstance(p, list):
+                ret = PathOffset.appendBlock(ret, p[0])
+            else:
+                ret = ret.appendObject(p) if ret else p
+            if n != last: continue
+            for s in strands:
+                ret = ret.appendObjects(commands.generateEvacuationCommand())
+                ret = PathOffset.appendBlock(ret, PathFill.toBlock(s[0], s[1], cfg))
+        return ret.getFirst() if ret else None
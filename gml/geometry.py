@@ -0,0 +1,106 @@
+# pylint: disable = line-too-long
+
+# pip3 install numpy
+import math
+import numpy as np
+from gml.command import GrblCommand
+
+
+class SegmentGeometry():
+    """
+        The geometry of the moves of a chain of commands, each from the
+        previous coordinates to its own X and Y: the chord (length and unit
+        direction), slope and midpoint and, for G02 and G03 arcs given by I
+        and J (relative to the start of the arc, as GRBL does), the centre,
+        radius, start angle, sweep (radians, anticlockwise positive) and
+        arc length.
+
+        Every command from the first without geometry up to the next which
+        still has it is worked out at once with NumPy and held as columns.
+        Each command keeps its row (see GrblCommand.getGeometry) until
+        either end of its move changes (see GrblCommand.invalidateGeometry)
+        so a whole program is worked out in a single pass and after an edit
+        only the moves touching it are worked out again.
+    """
+    columns = ["px", "py", "chord", "dx", "dy", "slope", "Xm", "Ym", "cx", "cy", "radius", "startangle", "sweep", "arclen"]
+
+    def __init__(self, values: dict):
+        # {column: array} (NaN where a command has no such geometry)
+        self.values = values
+        # whether each row is a move with both ends known
+        self.known = ~np.isnan(values["chord"])
+
+    # the geometry of a row as a dict (None for commands which don't move
+    # in X and Y or whose start isn't known)
+    def getRow(self, row: int) -> dict:
+        if not self.known[row]: return None
+        ret = {}
+        for k in SegmentGeometry.columns:
+            v = float(self.values[k][row])
+            ret[k] = None if math.isnan(v) else v
+        return ret
+
+    # works out the geometry of command and of the commands after it up to
+    # the first whose geometry is still known (or the end of the chain)
+    @staticmethod
+    def calculate(command: GrblCommand) -> 'SegmentGeometry':
+        p = command.getPreviousCoordinates()
+        rows = []
+        x, y, i, j, g = [], [], [], [], []
+        nan = float("nan")
+        value = lambda v: nan if GrblCommand.isNone(v) else float(v)
+        c = command
+        while c and (c is command or c.geometry is None):
+            rows.append(c)
+            vals = c.vals
+            x.append(value(vals["X"]))
+            y.append(value(vals["Y"]))
+            i.append(value(vals["I"]))
+            j.append(value(vals["J"]))
+            g.append(value(vals["G"]))
+            c = c.getNext()
+        x, y, i, j, g = [np.array(a, dtype=np.float64) for a in [x, y, i, j, g]]
+        # the previous coordinates are those of the last command setting X
+        # (the one before the first row if none of the rows do)
+        n = len(rows)
+        last = np.where(np.isnan(x), -1, np.arange(n))
+        last = np.maximum.accumulate(last)
+        prev = np.concatenate(([-1], last[:-1]))
+        px = np.where(prev > -1, x[np.maximum(prev, 0)], value(p.getX()) if p else nan)
+        py = np.where(prev > -1, y[np.maximum(prev, 0)], value(p.getY()) if p else nan)
+        ret = SegmentGeometry.getColumns(px, py, x, y, i, j, g)
+        geometry = SegmentGeometry(ret)
+        for k, r in enumerate(rows):
+            r.geometry = geometry
+            r.geometryRow = k
+        return geometry
+
+    # the geometry columns of moves from (px, py) to (x, y) with the G code and I and J of each
+    @staticmethod
+    def getColumns(px, py, x, y, i, j, g) -> dict:
+        dx, dy = x - px, y - py
+        chord = np.hypot(dx, dy)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ux = np.where(chord > 0, dx / chord, 0.0)
+            uy = np.where(chord > 0, dy / chord, 0.0)
+            slope = np.where(dx != 0, dy / np.where(dx != 0, dx, 1), np.nan)
+        ux[np.isnan(chord)] = np.nan
+        uy[np.isnan(chord)] = np.nan
+        arcs = ~np.isnan(chord) & ((g == 2) | (g == 3)) & ~np.isnan(i) & ~np.isnan(j)
+        cx = np.where(arcs, px + i, np.nan)
+        cy = np.where(arcs, py + j, np.nan)
+        radius = np.hypot(i, j)
+        radius[~arcs] = np.nan
+        a0 = np.arctan2(py - cy, px - cx)
+        a1 = np.arctan2(y - cy, x - cx)
+        ccw = np.mod(a1 - a0, 2 * math.pi)
+        cw = np.mod(a0 - a1, 2 * math.pi)
+        # start and end in the same place is a full circle
+        ccw[ccw < 1e-9] = 2 * math.pi
+        cw[cw < 1e-9] = 2 * math.pi
+        sweep = np.where(arcs, np.where(g == 3, ccw, -cw), np.nan)
+        return {
+            "px": px, "py": py, "chord": chord, "dx": ux, "dy": uy, "slope": slope,
+            "Xm": (px + x) / 2, "Ym": (py + y) / 2, "cx": cx, "cy": cy, "radius": radius,
+            "startangle": np.where(arcs, a0, np.nan), "sweep": sweep, "arclen": np.abs(sweep) * radius
+        }
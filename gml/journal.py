@@ -0,0 +1,117 @@
+# pylint: disable = line-too-long
+
+import threading
+
+class GrblJournal():
+    """
+        Records edits made to GrblCommands so they can be rolled back,
+        rather than working on a __deepcopy__ of a whole program in case
+        the original is still needed. While a journal is open each command
+        is copied (its values, links, block numbering etc.) the first time
+        it is changed (see GrblCommand.touch) so an edit only costs the
+        commands it changes. Commands made since the journal was opened are
+        never copied, rolling back unlinks them along with everything else.
+
+        Journals nest: one opened while another is open records only what
+        happens until it is committed (when what it recorded is handed to
+        the outer journal) or rolled back, so a single step can be tried and
+        undone within a longer edit. As a context manager a journal is
+        committed at the end of the with block or rolled back if it raises:
+
+            with commands.edit():
+                commands.translate(10, 0)
+                commands.scale(2)
+
+        Each thread has its own journals, so edits made by other threads
+        (ie. to other jobs) are never recorded or rolled back.
+    """
+    # the innermost open journal of each thread (see getCurrent)
+    local = threading.local()
+    # incremented as each journal opens, every command holds the
+    # generation it was made in so newer commands aren't recorded
+    generation = 0
+    lock = threading.Lock()
+
+    def __init__(self):
+        self.outer = GrblJournal.getCurrent()
+        with GrblJournal.lock:
+            GrblJournal.generation += 1
+            self.generation = GrblJournal.generation
+        # {id(command): (command, state)} as each was when first changed
+        self.saved = {}
+        self.open = True
+        GrblJournal.local.current = self
+
+    # the innermost journal open in this thread (see GrblCommand.touch)
+    @staticmethod
+    def getCurrent() -> 'GrblJournal':
+        return getattr(GrblJournal.local, "current", None)
+
+    # opens a journal (within the current one if there is one)
+    @staticmethod
+    def begin() -> 'GrblJournal':
+        return GrblJournal()
+
+    # records command as it is, if it isn't already recorded and was made before this journal opened
+    def touch(self, command):
+        if command.generation >= self.generation: return
+        if id(command) in self.saved: return
+        self.saved[id(command)] = (command, GrblJournal.getState(command))
+
+    @staticmethod
+    def getState(command) -> tuple:
+        return (command.vals.copy(), command.next, command.previous, command.block, command.blockIndex,
+                command.line, command.visible, command.config, command.meta)
+
+    # the number of commands changed since this journal opened
+    def getLength(self) -> int:
+        return len(self.saved)
+
+    def checkOpen(self):
+        if not self.open:
+            raise ValueError("journal has already been committed or rolled back")
+        # journals opened within this one are rolled back with it
+        while GrblJournal.getCurrent() is not self:
+            GrblJournal.getCurrent().rollback()
+
+    # keeps the edits. The outer journal (if any) takes what was recorded
+    # so it can still roll them back
+    def commit(self):
+        self.checkOpen()
+        if self.outer:
+            for k, v in self.saved.items():
+                if k not in self.outer.saved and v[0].generation < self.outer.generation:
+                    self.outer.saved[k] = v
+        self.close()
+
+    # puts every command changed back as it was when the journal opened
+    def rollback(self):
+        self.checkOpen()
+        restored = [v[0] for v in self.saved.values()]
+        for c in restored:
+            # the chunks of the chain index both sides of each link which moves back
+            c.breakSequence(c.next)
+            c.breakSequence(c.previous)
+        for c, state in self.saved.values():
+            c.vals, c.next, c.previous, c.block, c.blockIndex, c.line, c.visible, c.config, c.meta = state
+        for c in restored:
+            c.breakSequence(c.next)
+            c.breakSequence(c.previous)
+            c.invalidateGeometry()
+        self.close()
+
+    def close(self):
+        self.saved = {}
+        self.open = False
+        GrblJournal.local.current = self.outer
+
+    def __enter__(self) -> 'GrblJournal':
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        if not self.open: return False
+        if kind:
+            self.rollback()
+        else:
+            self.commit()
+        return False
@@ -0,0 +1,188 @@
+# pylint: disable = line-too-long
+
+# pip3 install numpy
+import numpy as np
+from gml.program import GrblProgram
+
+
+class HeightMap():
+    """
+        The height of the work surface probed at the points of a grid, used
+        to level (autolevel) programs so that cuts follow a bed or sheet
+        which is not flat.
+
+        Heights are relative to wherever Z was zeroed and are interpolated
+        bilinearly between the probed points (and held at the edge value
+        outside the grid). The grid lines need not be evenly spaced.
+    """
+    # the longest (mm) a levelled move may be before it is split up
+    max_segment = 1.0
+
+    # xs (nx) and ys (ny) are the grid lines, z is (ny, nx) heights
+    def __init__(self, xs, ys, z):
+        self.xs = np.asarray(xs, dtype=np.float64)
+        self.ys = np.asarray(ys, dtype=np.float64)
+        self.z = np.asarray(z, dtype=np.float64)
+        if self.xs.ndim != 1 or self.ys.ndim != 1 or not len(self.xs) or not len(self.ys):
+            raise ValueError("must supply the x and y grid lines")
+        if self.z.shape != (len(self.ys), len(self.xs)):
+            raise ValueError("z must have a row for each y and a column for each x")
+        if np.any(np.diff(self.xs) <= 0) or np.any(np.diff(self.ys) <= 0):
+            raise ValueError("grid lines must be in increasing order")
+        if not np.all(np.isfinite(self.z)):
+            raise ValueError("every grid point must have a height")
+
+    # makes a height map from probed (x, y, z) points in any order,
+    # which must include a point at every crossing of the grid lines
+    @staticmethod
+    def fromPoints(x, y, z, tolerance: float = 1e-3) -> 'HeightMap':
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        z = np.asarray(z, dtype=np.float64)
+        if not len(x) or len(x) != len(y) or len(x) != len(z):
+            raise ValueError("must supply an x, y and z for every point")
+        # probe positions are rounded to tolerance to find the grid lines
+        qx = np.rint(x / tolerance).astype(np.int64)
+        qy = np.rint(y / tolerance).astype(np.int64)
+        ux, ix = np.unique(qx, return_inverse=True)
+        uy, iy = np.unique(qy, return_inverse=True)
+        grid = np.full((len(uy), len(ux)), np.nan)
+        grid[iy, ix] = z
+        if np.isnan(grid).any() or len(x) != grid.size:
+            raise ValueError("points must be one at every crossing of the grid lines")
+        return HeightMap(ux * tolerance, uy * tolerance, grid)
+
+    # reads a probe file, a line of "x y z" (spaces or commas) for each
+    # point, ignoring blank lines and comments (starting ; # or ()
+    @staticmethod
+    def load(inpath: str) -> 'HeightMap':
+        pts = []
+        with open(inpath, "r") as f:
+            for n, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line[0] in ";#(": continue
+                v = line.replace(",", " ").split()
+                try:
+                    pts.append([float(s) for s in v[:3]])
+                except ValueError as e:
+                    raise ValueError(inpath + " line " + str(n) + " is not x y z") from e
+                if len(v) < 3:
+                    raise ValueError(inpath + " line " + str(n) + " is not x y z")
+        if not pts:
+            raise ValueError(inpath + " has no points")
+        p = np.array(pts)
+        return HeightMap.fromPoints(p[:, 0], p[:, 1], p[:, 2])
+
+    # the interpolated height at each (x, y)
+    def getHeights(self, x, y) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        ix, tx = HeightMap.getCells(self.xs, x)
+        iy, ty = HeightMap.getCells(self.ys, y)
+        z = self.z
+        ix1 = np.minimum(ix + 1, len(self.xs) - 1)
+        iy1 = np.minimum(iy + 1, len(self.ys) - 1)
+        bottom = z[iy, ix] * (1 - tx) + z[iy, ix1] * tx
+        top = z[iy1, ix] * (1 - tx) + z[iy1, ix1] * tx
+        return bottom * (1 - ty) + top * ty
+
+    # the cell (grid line below) each value is in and how far across it
+    # (0 to 1), values off the grid are held at its edge
+    @staticmethod
+    def getCells(lines, v) -> tuple:
+        if len(lines) == 1:
+            return (np.zeros(v.shape, dtype=np.int64), np.zeros(v.shape))
+        i = np.clip(np.searchsorted(lines, v, side="right") - 1, 0, len(lines) - 2)
+        t = np.clip((v - lines[i]) / (lines[i + 1] - lines[i]), 0, 1)
+        return (i, t)
+
+    # returns a levelled copy of the program. Every move has the height of
+    # the surface under its end added to its Z, and cutting moves (G01, G02
+    # and G03) longer than max_segment (mm) are first split into equal
+    # pieces (arcs into arcs about the same centre) so the cut follows the
+    # surface along its length. Moves must be absolute (G90) in the XY
+    # plane and arcs must use I and J (relative to the start of the arc)
+    # Cuts keep being cuts (see GrblCommand.isLevelledCut) even where the
+    # surface lifts them above zero
+    def level(self, program: GrblProgram, max_segment: float = None) -> GrblProgram:
+        if max_segment is None: max_segment = HeightMap.max_segment
+        if not max_segment or max_segment <= 0:
+            raise ValueError("max_segment must be positive")
+        params = GrblProgram.params
+        n = program.getLength()
+        G, M, X, Y, Z, I, J, F, S, P = [params.index(p) for p in params]
+        vals = program.vals
+        m = program.getMoves()
+        motion, x, y, z, px, py, pz = [m[k] for k in ["motion", "x", "y", "z", "px", "py", "pz"]]
+        moves = m["moves"] & ~np.isnan(x) & ~np.isnan(y) & ~np.isnan(z)
+        cuts = moves & (motion > 0) & ~np.isnan(px) & ~np.isnan(py) & ~np.isnan(pz)
+        arcs = cuts & m["arcs"]
+        cx, cy, a0, r0, r1, sweep = [m[k] for k in ["cx", "cy", "a0", "r0", "r1", "sweep"]]
+        # the length of each cutting move in the XY plane
+        length = np.where(arcs, np.abs(sweep) * (r0 + r1) / 2, np.hypot(x - px, y - py))
+        # (arcs given by R rather than I and J are left whole)
+        cuts &= (motion == 1) | arcs
+        count = np.ones(n, dtype=np.int64)
+        count[cuts] = np.maximum(np.ceil(np.nan_to_num(length[cuts]) / max_segment - 1e-9), 1).astype(np.int64)
+        # each row repeated once for every piece it is split into
+        src = np.repeat(np.arange(n), count)
+        total = len(src)
+        first = np.cumsum(count) - count
+        piece = np.arange(total) - first[src] + 1
+        f = piece / count[src]
+        split = count[src] > 1
+        out = vals[:, src]
+        nx, ny, nz = x[src], y[src], z[src]
+        line = split & ~arcs[src]
+        nx[line] = (px[src] + (x[src] - px[src]) * f)[line]
+        ny[line] = (py[src] + (y[src] - py[src]) * f)[line]
+        arc = split & arcs[src]
+        a = a0[src] + sweep[src] * f
+        r = r0[src] + (r1[src] - r0[src]) * f
+        nx[arc] = (cx[src] + r * np.cos(a))[arc]
+        ny[arc] = (cy[src] + r * np.sin(a))[arc]
+        # the last piece ends exactly where the move did
+        end = split & (piece == count[src])
+        nx[end] = x[src][end]
+        ny[end] = y[src][end]
+        nz[split] = (pz[src] + (z[src] - pz[src]) * f)[split]
+        out[X, split] = nx[split]
+        out[Y, split] = ny[split]
+        # each piece of an arc is relative to where the last piece ended
+        if arc.any():
+            sx = np.concatenate(([np.nan], nx[:-1]))
+            sy = np.concatenate(([np.nan], ny[:-1]))
+            out[I, arc] = (cx[src] - sx)[arc]
+            out[J, arc] = (cy[src] - sy)[arc]
+        level = moves[src]
+        out[Z, level] = nz[level] + self.getHeights(nx[level], ny[level])
+        # everything else (feed rate, comments...) stays with the first piece
+        later = piece > 1
+        for k in [M, F, S, P]:
+            out[k, later] = np.nan
+        intmask = program.intmask[src].copy()
+        changed = np.zeros(total, dtype=np.uint16)
+        changed[split] = (1 << X) | (1 << Y) | (1 << Z)
+        changed[arc] |= (1 << I) | (1 << J)
+        changed[level] |= 1 << Z
+        intmask &= ~changed
+        intmask[later] &= np.uint16(~((1 << M) | (1 << F) | (1 << S) | (1 << P)) & 0xFFFF)
+        extras = {int(first[r]): e for r, e in program.extras.items()}
+        flags = program.flags[src].copy()
+        flags[later] &= np.uint8(~GrblProgram.FLAG_PENETRATE & 0xFF)
+        # cuts are marked as such (rather than told apart by their Z, which
+        # may now be above zero) where they cut into the surface before.
+        # Moves with no X or Y (plunges) only change the depth so aren't cuts
+        across = (~np.isnan(vals[X]) | ~np.isnan(vals[Y]))[src]
+        cut = level & across & (motion[src] > 0) & (z[src] <= 0) & ((flags & GrblProgram.FLAG_PENETRATE) == 0)
+        flags[cut] |= GrblProgram.FLAG_LEVELLED
+        block = program.block[src].copy()
+        # pieces carry on counting through their block
+        blockIndex = program.blockIndex[src].copy()
+        isStart = np.zeros(n, dtype=bool)
+        isStart[program.blocks[:, 0]] = True
+        runStart = np.maximum.accumulate(np.where(isStart, np.arange(n), 0)) if n else isStart
+        added = np.arange(total) - src
+        inblock = blockIndex > -1
+        blockIndex[inblock] += (added - added[first[runStart[src]]])[inblock].astype(np.int32)
+        return GrblProgram(out, intmask, flags, block, blockIndex, extras)
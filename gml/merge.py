@@ -0,0 +1,192 @@
+# pylint: disable = line-too-long
+
+# pip3 install numpy
+import numpy as np
+from gml.program import GrblProgram
+
+
+class PathMerge():
+    """
+        Merges runs of (nearly) collinear straight cuts into single moves.
+        pointify and SVG import leave long runs of short G01 moves which are
+        almost in line, and GRBL's planner slows down at every one of their
+        corners. A corner is removed when the path turns through no more
+        than max_angle (degrees) there and the single move replacing its
+        two neighbours passes within tolerance (mm) of every point removed
+        so far between them (so gentle curves are not straightened out).
+
+        Runs are merged with NumPy, every other corner at a time, until
+        nothing more can be removed. Only G01 moves at a constant depth
+        which set nothing but their end point (and within a block) are
+        removed. estimateTime gives the time a program takes (with GRBL's
+        acceleration and junction deviation) so the saving can be seen.
+    """
+    # the furthest (mm) a merged move may pass from the points it replaces
+    tolerance = 0.01
+    # the sharpest turn (degrees) which may be merged
+    max_angle = 10.0
+    # GRBL's acceleration ($120, mm/s^2) and junction deviation ($11, mm)
+    acceleration = 500.0
+    junction_deviation = 0.01
+    # give up after this many rounds
+    max_passes = 200
+
+    def __init__(self, tolerance: float = None, max_angle: float = None):
+        if tolerance is None: tolerance = PathMerge.tolerance
+        if max_angle is None: max_angle = PathMerge.max_angle
+        if tolerance < 0:
+            raise ValueError("tolerance cannot be negative")
+        if max_angle < 0 or max_angle > 180:
+            raise ValueError("max_angle must be between 0 and 180 degrees")
+        self.tolerance = tolerance
+        self.max_angle = max_angle
+        # the cutting moves before and after and the estimated times (s) (see merge)
+        self.before = self.after = 0
+        self.time_before = self.time_after = 0.0
+
+    # the rows whose move may be merged into the next
+    @staticmethod
+    def getCandidates(program: GrblProgram, moves: dict) -> np.ndarray:
+        params = GrblProgram.params
+        vals = program.vals
+        n = program.getLength()
+        x, y, z, px, py, pz = [moves[p] for p in ["x", "y", "z", "px", "py", "pz"]]
+        line = moves["moves"] & (moves["motion"] == 1) & ~moves["arcs"] & ~np.isnan(px) & ~np.isnan(py) & ~np.isnan(x) & ~np.isnan(y)
+        # moves along at the same depth
+        flat = line & ((z == pz) | (np.isnan(z) & np.isnan(pz)))
+        plain = flat & (program.blockIndex > -1) & ((program.flags & GrblProgram.FLAG_PENETRATE) == 0)
+        for p in ["M", "I", "J", "F", "S", "P"]:
+            plain &= np.isnan(vals[params.index(p)])
+        if program.extras:
+            plain[np.fromiter(program.extras.keys(), dtype=np.int64)] = False
+        # and the next move carries on from it in the same block
+        ret = np.zeros(n, dtype=bool)
+        ret[:-1] = plain[:-1] & flat[1:] & (program.block[1:] == program.block[:-1]) & (program.blockIndex[1:] > -1)
+        return ret
+
+    # returns a copy of the program with its collinear runs merged, the
+    # number of cutting moves and estimated times are kept (see before and after)
+    def merge(self, program: GrblProgram) -> GrblProgram:
+        moves = program.getMoves()
+        n = program.getLength()
+        x, y = moves["x"], moves["y"]
+        candidate = PathMerge.getCandidates(program, moves)
+        alive = np.arange(n)
+        pending = candidate.copy()
+        tol = self.tolerance
+        cosMax = np.cos(np.radians(self.max_angle))
+        for p in range(PathMerge.max_passes):
+            live = pending[alive]
+            if not live.any(): break
+            pos = np.arange(len(alive))
+            # every other corner so no two removed corners are neighbours
+            j = np.flatnonzero(live & (pos % 2 == p % 2) & (pos > 0) & (pos < len(alive) - 1))
+            if not len(j): continue
+            a, b, c = alive[j - 1], alive[j], alive[j + 1]
+            ux, uy = x[b] - x[a], y[b] - y[a]
+            vx, vy = x[c] - x[b], y[c] - y[b]
+            lu, lv = np.hypot(ux, uy), np.hypot(vx, vy)
+            # (a zero length move makes no corner)
+            turn = (ux * vx + uy * vy) >= cosMax * lu * lv
+            # how far every point between a and c is from the move replacing them
+            count = c - a - 1
+            owner = np.repeat(np.arange(len(j)), count)
+            k = np.repeat(a, count) + np.arange(len(owner)) - np.repeat(np.cumsum(count) - count, count) + 1
+            sx, sy = x[a][owner], y[a][owner]
+            dx, dy = x[c][owner] - sx, y[c][owner] - sy
+            d2 = dx * dx + dy * dy
+            t = np.clip(((x[k] - sx) * dx + (y[k] - sy) * dy) / np.where(d2 > 0, d2, 1), 0, 1)
+            dist = np.hypot(x[k] - sx - t * dx, y[k] - sy - t * dy)
+            deviation = np.maximum.reduceat(dist, np.cumsum(count) - count)
+            ok = turn & (deviation <= tol)
+            # corners which can't be removed now only get worse as the moves either side grow
+            pending[b] = False
+            keep = np.ones(len(alive), dtype=bool)
+            keep[j[ok]] = False
+            alive = alive[keep]
+        removed = np.ones(n, dtype=bool)
+        removed[alive] = False
+        ret = PathMerge.removeRows(program, removed)
+        self.before = int(np.count_nonzero(moves["moves"] & (moves["motion"] > 0)))
+        self.after = self.before - int(removed.sum())
+        self.time_before = PathMerge.estimateTime(program, moves)
+        self.time_after = PathMerge.estimateTime(ret)
+        return ret
+
+    # returns a copy of the program without the removed rows (moves which
+    # lead straight on into the next)
+    @staticmethod
+    def removeRows(program: GrblProgram, removed) -> GrblProgram:
+        params = GrblProgram.params
+        G = params.index("G")
+        keep = ~removed
+        n = program.getLength()
+        vals = program.vals[:, keep].copy()
+        intmask = program.intmask[keep].copy()
+        # a move after removed ones gives its own G01 (the removed move may have)
+        after = np.zeros(n, dtype=bool)
+        after[1:] = removed[:-1]
+        after = after[keep] & np.isnan(vals[G])
+        vals[G, after] = 1
+        intmask[after] |= 1 << G
+        gone = np.cumsum(removed)
+        extras = {int(r - gone[r]): e for r, e in program.extras.items()}
+        # the moves left in each block are numbered from its start (which is never removed)
+        isStart = np.zeros(n, dtype=bool)
+        isStart[program.blocks[:, 0]] = True
+        isStart = isStart[keep]
+        at = np.arange(len(isStart))
+        runStart = np.maximum.accumulate(np.where(isStart, at, 0)) if len(at) else at
+        blockIndex = program.blockIndex[keep].copy()
+        inblock = blockIndex > -1
+        blockIndex[inblock] = (at - runStart)[inblock].astype(np.int32)
+        return GrblProgram(vals, intmask, program.flags[keep].copy(), program.block[keep].copy(), blockIndex, extras)
+
+    # the time (s) the program takes to run, planned as GRBL does. Each
+    # corner is taken at the speed allowed by the junction deviation and
+    # the angle turned, moves speed up and slow down at the acceleration
+    # and reach at most their feed rate (F, mm/min, also used for G00)
+    @staticmethod
+    def estimateTime(program: GrblProgram, moves: dict = None, acceleration: float = None, junction_deviation: float = None) -> float:
+        if acceleration is None: acceleration = PathMerge.acceleration
+        if junction_deviation is None: junction_deviation = PathMerge.junction_deviation
+        m = moves or program.getMoves()
+        feed = GrblProgram.getModal(program.vals[GrblProgram.params.index("F")]) / 60.0
+        x, y, z, px, py, pz = [m[p] for p in ["x", "y", "z", "px", "py", "pz"]]
+        arcs = m["arcs"]
+        dz = np.nan_to_num(z - pz)
+        chord = np.sqrt(np.nan_to_num(x - px) ** 2 + np.nan_to_num(y - py) ** 2 + dz ** 2)
+        length = np.where(arcs, np.hypot(np.abs(m["sweep"]) * (m["r0"] + m["r1"]) / 2, dz), chord)
+        rows = np.flatnonzero(m["moves"] & (length > 1e-9) & (feed > 0))
+        if not len(rows): return 0.0
+        length = length[rows]
+        v = feed[rows]
+        a = acceleration
+        # the direction at the start and end of each move
+        safe = np.where(chord[rows] > 0, chord[rows], 1)
+        d = np.stack([np.nan_to_num(x - px)[rows], np.nan_to_num(y - py)[rows], dz[rows]]) / safe
+        start, end = d.copy(), d.copy()
+        arc = arcs[rows]
+        if arc.any():
+            r = rows[arc]
+            s = np.sign(m["sweep"][r])
+            for t, ang in ((start, m["a0"][r]), (end, m["a0"][r] + m["sweep"][r])):
+                t[0, arc] = -np.sin(ang) * s
+                t[1, arc] = np.cos(ang) * s
+                t[2, arc] = 0
+        # the fastest each corner may be taken (squared), stopping at either end
+        cos = -np.sum(end[:, :-1] * start[:, 1:], axis=0)
+        sin = np.sqrt(np.clip(0.5 * (1 - cos), 0, 1))
+        corner = np.where(sin < 1 - 1e-9, a * junction_deviation * sin / np.maximum(1 - sin, 1e-9), np.inf)
+        corner = np.minimum(corner, np.minimum(v[:-1], v[1:]) ** 2)
+        w = np.concatenate(([0.0], corner, [0.0]))
+        # slowing down for every corner ahead then speeding up from every
+        # corner behind, both as running minimums over the distance travelled
+        dist = 2 * a * np.concatenate(([0.0], np.cumsum(length)))
+        w = np.minimum.accumulate((w + dist)[::-1])[::-1] - dist
+        w = np.minimum.accumulate(w - dist) + dist
+        v0 = np.sqrt(np.maximum(w[:-1], 0))
+        v1 = np.sqrt(np.maximum(w[1:], 0))
+        peak = np.minimum(v, np.sqrt(np.maximum(a * length + (v0 * v0 + v1 * v1) / 2, 0)))
+        cruise = np.maximum(length - (2 * peak * peak - v0 * v0 - v1 * v1) / (2 * a), 0)
+        return float(np.sum((2 * peak - v0 - v1) / a + cruise / peak))
@@ -0,0 +1,721 @@
+# pylint: disable = line-too-long
+
+# pip3 install numpy
+from typing import List
+import math
+import hashlib
+import numpy as np
+from gml.command import GrblCommand
+
+
+class PathOffset():
+    """
+        The XY path of a single block held as NumPy coordinate arrays, used
+        to offset (grow, shrink or shift sideways) the path by a distance.
+
+        A path of n segments has n + 1 vertices (x, y), segment k runs from
+        vertex k to vertex k + 1 and is either a straight line or an arc
+        (kind) about the centre (cx, cy). I and J are read and written
+        relative to the start of an arc, as GRBL does.
+
+        Offsetting moves every segment sideways by the distance (arcs keep
+        their centre and change their radius so arcs remain arcs), joins the
+        gaps at convex corners with a round, miter or bevel join and then
+        removes the loops which form at concave corners and wherever the
+        distance is larger than the features of the path.
+    """
+    # kinds are the G command number less one
+    LINE = 0
+    # G02
+    CW = 1
+    # G03
+    CCW = 2
+    joins = ["round", "miter", "bevel"]
+    # miter joins longer than this many times the distance are bevelled
+    miter_limit = 2.0
+    # arcs are split into pieces of at most this angle (radians) when looking for loops
+    arc_step = math.pi / 16
+    # lengths shorter than this are treated as zero
+    eps = 1e-9
+    # pieces shorter than this are too short to matter (coordinates are
+    # written to far fewer decimal places)
+    tolerance = 1e-5
+    # corners with gaps smaller than this are not joined
+    gap_tolerance = 1e-6
+    # concave corners with gaps smaller than this many times the distance
+    # are joined directly rather than by way of the original corner
+    detour_ratio = 0.01
+    # closed paths enclosing less area than this vanish
+    min_area = 1e-8
+    # paths which end this close to where they started are closed (see isBlockAClosedPath)
+    closed_tolerance = 0.05
+
+    def __init__(self, x, y, kind, cx, cy):
+        if len(x) != len(y) or len(kind) + 1 != len(x):
+            raise ValueError("a path of n segments must have n + 1 vertices")
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.kind = np.asarray(kind, dtype=np.int8)
+        self.cx = np.asarray(cx, dtype=np.float64)
+        self.cy = np.asarray(cy, dtype=np.float64)
+
+    def getLength(self) -> int:
+        return len(self.kind)
+
+    def isClosed(self) -> bool:
+        if not self.getLength(): return False
+        return math.hypot(self.x[-1] - self.x[0], self.y[-1] - self.y[0]) < PathOffset.closed_tolerance
+
+    # reads the XY moves of a block (or any chain of commands) into a path
+    # moves without a G command carry on in the last motion mode (G00 to
+    # G03), a missing I or J is 0 and R arcs are given their centre. Moves
+    # of any other kind (ie. G28) can't be read
+    @staticmethod
+    def fromBlock(block: GrblCommand) -> 'PathOffset':
+        if not block:
+            raise ValueError("must supply a block")
+        x = []
+        y = []
+        kind = []
+        cx = []
+        cy = []
+        mode = 1
+        c = block.getFirst()
+        while c:
+            if c.nn("G") and int(c.vals["G"]) in [0, 1, 2, 3]:
+                mode = int(c.vals["G"])
+            if not c.nn("X") and not c.nn("Y"):
+                c = c.getNext()
+                continue
+            if c.nn("G") and int(c.vals["G"]) not in [0, 1, 2, 3]:
+                raise ValueError("can't read the path of a " + c.getCommand() + " move")
+            if not x:
+                if not c.nn("X") or not c.nn("Y"):
+                    raise ValueError("the first move of a block must specify x and y")
+                x.append(c.getX())
+                y.append(c.getY())
+                c = c.getNext()
+                continue
+            px = x[-1]
+            py = y[-1]
+            nx = c.getX() if c.nn("X") else px
+            ny = c.getY() if c.nn("Y") else py
+            k = PathOffset.LINE
+            ci = cj = np.nan
+            if mode > 1:
+                k = PathOffset.CW if mode == 2 else PathOffset.CCW
+                if c.nn("R") and not c.nn("I") and not c.nn("J"):
+                    ci, cj = PathOffset.getRadiusCentre(nx - px, ny - py, c.vals["R"], k)
+                elif c.nn("I") or c.nn("J"):
+                    ci = c.getI() if c.nn("I") else 0.0
+                    cj = c.getJ() if c.nn("J") else 0.0
+                else:
+                    raise ValueError("an arc must give its centre (I and J) or radius (R)")
+            # drop zero length moves (but not full circles)
+            if k == PathOffset.LINE and math.hypot(nx - px, ny - py) < PathOffset.eps:
+                c = c.getNext()
+                continue
+            x.append(nx)
+            y.append(ny)
+            kind.append(k)
+            cx.append(px + ci if k else np.nan)
+            cy.append(py + cj if k else np.nan)
+            c = c.getNext()
+        if not x:
+            raise ValueError("block has no moves")
+        ret = PathOffset(x, y, kind, cx, cy)
+        # close small gaps exactly
+        if ret.isClosed() and math.hypot(x[-1] - x[0], y[-1] - y[0]) > PathOffset.eps:
+            ret = PathOffset(x + [x[0]], y + [y[0]], kind + [PathOffset.LINE], cx + [np.nan], cy + [np.nan])
+        return ret
+
+    # the centre (relative to the start, as I and J) of an arc of radius r
+    # moving (dx, dy), as GRBL works it out. A negative r is the arc of
+    # more than half a circle
+    @staticmethod
+    def getRadiusCentre(dx: float, dy: float, r: float, kind: int) -> tuple:
+        d = math.hypot(dx, dy)
+        if d < PathOffset.eps:
+            raise ValueError("an R arc can't be a full circle")
+        h = 4 * r * r - d * d
+        if h < -PathOffset.tolerance:
+            raise ValueError("arc radius " + str(r) + " is too small for its end points")
+        h = -math.sqrt(max(h, 0.0)) / d
+        if kind == PathOffset.CCW: h = -h
+        if r < 0: h = -h
+        return (0.5 * (dx - dy * h), 0.5 * (dy + dx * h))
+
+    # the signed sweep of each segment (radians, anticlockwise positive, 0 for lines)
+    @staticmethod
+    def getSweeps(sx, sy, ex, ey, kind, cx, cy):
+        ret = np.zeros(len(kind))
+        arc = kind != PathOffset.LINE
+        if not arc.any(): return ret
+        a0 = np.arctan2(sy[arc] - cy[arc], sx[arc] - cx[arc])
+        a1 = np.arctan2(ey[arc] - cy[arc], ex[arc] - cx[arc])
+        ccw = np.mod(a1 - a0, 2 * math.pi)
+        cw = np.mod(a0 - a1, 2 * math.pi)
+        # start and end in the same place is a full circle
+        ccw[ccw < PathOffset.eps] = 2 * math.pi
+        cw[cw < PathOffset.eps] = 2 * math.pi
+        ret[arc] = np.where(kind[arc] == PathOffset.CCW, ccw, -cw)
+        return ret
+
+    # the unit tangents (direction of travel) at the start and end of each segment
+    def getTangents(self) -> tuple:
+        sx, sy, ex, ey = self.x[:-1], self.y[:-1], self.x[1:], self.y[1:]
+        dx = ex - sx
+        dy = ey - sy
+        length = np.hypot(dx, dy)
+        length[length < PathOffset.eps] = 1
+        st = np.stack([dx / length, dy / length])
+        et = st.copy()
+        arc = self.kind != PathOffset.LINE
+        if arc.any():
+            d = np.where(self.kind[arc] == PathOffset.CCW, 1.0, -1.0)
+            for t, px, py in ((st, sx, sy), (et, ex, ey)):
+                rx = px[arc] - self.cx[arc]
+                ry = py[arc] - self.cy[arc]
+                r = np.hypot(rx, ry)
+                r[r < PathOffset.eps] = 1
+                t[0, arc] = -ry / r * d
+                t[1, arc] = rx / r * d
+        return (st, et)
+
+    # the signed area (anticlockwise positive) enclosed by the path and
+    # the line from its end back to its start
+    def getArea(self) -> float:
+        x = self.x
+        y = self.y
+        ret = 0.5 * float(np.sum(x[:-1] * y[1:] - x[1:] * y[:-1]) + x[-1] * y[0] - x[0] * y[-1])
+        arc = self.kind != PathOffset.LINE
+        if arc.any():
+            sweep = PathOffset.getSweeps(x[:-1], y[:-1], x[1:], y[1:], self.kind, self.cx, self.cy)[arc]
+            r2 = (x[:-1][arc] - self.cx[arc]) ** 2 + (y[:-1][arc] - self.cy[arc]) ** 2
+            # the area between each arc and its chord
+            ret += float(np.sum(0.5 * r2 * (sweep - np.sin(sweep))))
+        return ret
+
+    # the length of the path (lines and arcs)
+    def getCutLength(self) -> float:
+        sx, sy, ex, ey = self.x[:-1], self.y[:-1], self.x[1:], self.y[1:]
+        ret = np.hypot(ex - sx, ey - sy)
+        arc = self.kind != PathOffset.LINE
+        if arc.any():
+            sweep = PathOffset.getSweeps(sx, sy, ex, ey, self.kind, self.cx, self.cy)[arc]
+            ret[arc] = np.abs(sweep) * np.hypot(sx[arc] - self.cx[arc], sy[arc] - self.cy[arc])
+        return float(np.sum(ret))
+
+    # a hash of the shape of the path which is the same whichever way round
+    # it is cut (and, for closed paths, wherever it starts). Coordinates are
+    # rounded to tolerance first so paths differing by less usually match
+    # (values either side of a rounding boundary won't). depth is included
+    # so the same path cut at different depths differs
+    def getHash(self, tolerance: float, depth: float = 0.0) -> str:
+        if not tolerance or tolerance <= 0:
+            raise ValueError("tolerance must be positive")
+        q = lambda v: np.rint(np.nan_to_num(v) / tolerance).astype(np.int64)
+        x, y, kind, cx, cy = q(self.x), q(self.y), self.kind.astype(np.int64), q(self.cx), q(self.cy)
+        # reversed, arcs turn the other way about the same centre
+        rkind = np.where(kind == PathOffset.LINE, kind, PathOffset.CW + PathOffset.CCW - kind)[::-1]
+        ways = [(x, y, kind, cx, cy), (x[::-1], y[::-1], rkind, cx[::-1], cy[::-1])]
+        closed = len(x) > 2 and x[0] == x[-1] and y[0] == y[-1]
+        keys = []
+        for vx, vy, k, ax, ay in ways:
+            if closed:
+                # start from the lowest (then leftmost) vertex
+                s = int(np.lexsort((vx[:-1], vy[:-1]))[0])
+                vx = np.concatenate((vx[s:-1], vx[:s + 1]))
+                vy = np.concatenate((vy[s:-1], vy[:s + 1]))
+                k, ax, ay = np.roll(k, -s), np.roll(ax, -s), np.roll(ay, -s)
+            keys.append(np.concatenate(([q(depth)], vx, vy, k, ax, ay)).tobytes())
+        return hashlib.blake2b(min(keys), digest_size=16).hexdigest()
+
+    # returns a list of the offset paths, a closed path may split into
+    # several paths or vanish entirely (an empty list)
+    # positive distances grow closed paths and move open paths to their left
+    # join is one of PathOffset.joins
+    def offset(self, distance: float, join: str = "round") -> list:
+        if join not in PathOffset.joins:
+            raise ValueError("join must be one of " + ", ".join(PathOffset.joins))
+        n = self.getLength()
+        if not n or abs(distance) < PathOffset.eps:
+            return [self]
+        closed = self.isClosed()
+        winding = 1 if self.getArea() > 0 else -1
+        # d is the distance to the left of the direction of travel
+        d = distance
+        if closed:
+            d = -distance * winding
+        sx, sy, ex, ey = self.x[:-1], self.y[:-1], self.x[1:], self.y[1:]
+        st, et = self.getTangents()
+        kind = self.kind.copy()
+        cx = self.cx.copy()
+        cy = self.cy.copy()
+        # lines move along their left normal
+        osx = sx - st[1] * d
+        osy = sy + st[0] * d
+        oex = ex - et[1] * d
+        oey = ey + et[0] * d
+        # arcs keep their centre and change radius
+        arc = kind != PathOffset.LINE
+        shrunk = np.zeros(n, dtype=bool)
+        if arc.any():
+            r = np.hypot(sx[arc] - cx[arc], sy[arc] - cy[arc])
+            nr = np.where(kind[arc] == PathOffset.CCW, r - d, r + d)
+            collapsed = nr < PathOffset.eps
+            f = np.where(collapsed, 0, nr / np.where(r < PathOffset.eps, 1, r))
+            osx[arc] = cx[arc] + (sx[arc] - cx[arc]) * f
+            osy[arc] = cy[arc] + (sy[arc] - cy[arc]) * f
+            oex[arc] = cx[arc] + (ex[arc] - cx[arc]) * f
+            oey[arc] = cy[arc] + (ey[arc] - cy[arc]) * f
+            # arcs whose radius would be negative shrink to their centre
+            idx = np.flatnonzero(arc)[collapsed]
+            kind[idx] = PathOffset.LINE
+            shrunk[idx] = True
+
+        # the corner after each segment (and from the last back to the first if closed)
+        a = np.arange(n if closed else n - 1)
+        b = (a + 1) % n
+        gx = oex[a]
+        gy = oey[a]
+        hx = osx[b]
+        hy = osy[b]
+        ta = et[:, a]
+        tb = st[:, b]
+        cross = ta[0] * tb[1] - ta[1] * tb[0]
+        gap = np.hypot(hx - gx, hy - gy) > PathOffset.gap_tolerance
+        # corners next to an arc which shrank away are not |d| from the
+        # corner so are treated as concave
+        convex = gap & (cross * d < 0) & ~shrunk[a] & ~shrunk[b]
+
+        # up to 3 pieces per segment: the segment itself and two for its join
+        slots = 3
+        px = np.full((n, slots), np.nan)
+        py = np.full((n, slots), np.nan)
+        pk = np.zeros((n, slots), dtype=np.int8)
+        pcx = np.full((n, slots), np.nan)
+        pcy = np.full((n, slots), np.nan)
+        px[:, 0] = oex
+        py[:, 0] = oey
+        pk[:, 0] = kind
+        pcx[:, 0] = cx
+        pcy[:, 0] = cy
+        # bevels are a straight line, concave corners go by way of the
+        # original corner so the loops they make wind the right way
+        # (these loops are removed below)
+        px[a[gap], 1] = hx[gap]
+        py[a[gap], 1] = hy[gap]
+        # (unless the gap is too small for that to matter)
+        concave = gap & ~convex & (np.hypot(hx - gx, hy - gy) > PathOffset.detour_ratio * abs(d))
+        px[a[concave], 1] = ex[a][concave]
+        py[a[concave], 1] = ey[a][concave]
+        px[a[concave], 2] = hx[concave]
+        py[a[concave], 2] = hy[concave]
+        if join == "round":
+            pk[a[convex], 1] = PathOffset.CW if d > 0 else PathOffset.CCW
+            pcx[a[convex], 1] = ex[a][convex]
+            pcy[a[convex], 1] = ey[a][convex]
+        elif join == "miter":
+            den = np.where(np.abs(cross) < PathOffset.eps, np.nan, cross)
+            u = ((hx - gx) * tb[1] - (hy - gy) * tb[0]) / den
+            mx = gx + ta[0] * u
+            my = gy + ta[1] * u
+            within = np.hypot(mx - ex[a], my - ey[a]) <= PathOffset.miter_limit * abs(d)
+            m = convex & within
+            px[a[m], 1] = mx[m]
+            py[a[m], 1] = my[m]
+            px[a[m], 2] = hx[m]
+            py[a[m], 2] = hy[m]
+
+        valid = ~np.isnan(px)
+        pieces = PathOffset(np.concatenate(([osx[0]], px[valid])), np.concatenate(([osy[0]], py[valid])), pk[valid], pcx[valid], pcy[valid])
+        return pieces.removeLoops(closed, -1 if d > 0 else 1, winding)
+
+    # splits arcs into short lines, returning the vertices, the piece each
+    # line came from and whether it is the last line of its piece
+    # arcs are split into pieces of arc_step unless a tolerance is given, in
+    # which case the lines stay within tolerance (mm) of the arc
+    def linearise(self, tolerance: float = None) -> tuple:
+        sx, sy, ex, ey = self.x[:-1], self.y[:-1], self.x[1:], self.y[1:]
+        sweep = PathOffset.getSweeps(sx, sy, ex, ey, self.kind, self.cx, self.cy)
+        step = PathOffset.arc_step
+        if tolerance:
+            r = np.hypot(sx - self.cx, sy - self.cy)
+            step = 2 * np.arccos(np.clip(1 - tolerance / np.where(r > PathOffset.eps, r, 1), -1, 1))
+            step = np.where(self.kind == PathOffset.LINE, PathOffset.arc_step, np.clip(step, PathOffset.eps, PathOffset.arc_step))
+        m = np.maximum(1, np.ceil(np.abs(sweep) / step)).astype(np.int64)
+        src = np.repeat(np.arange(len(m)), m)
+        k = np.arange(len(src)) - np.repeat(np.cumsum(m) - m, m) + 1
+        last = k == m[src]
+        x = ex[src].copy()
+        y = ey[src].copy()
+        arc = (self.kind[src] != PathOffset.LINE) & ~last
+        if arc.any():
+            p = src[arc]
+            r = np.hypot(sx[p] - self.cx[p], sy[p] - self.cy[p])
+            angle = np.arctan2(sy[p] - self.cy[p], sx[p] - self.cx[p]) + sweep[p] * k[arc] / m[p]
+            x[arc] = self.cx[p] + r * np.cos(angle)
+            y[arc] = self.cy[p] + r * np.sin(angle)
+        return (np.concatenate(([self.x[0]], x)), np.concatenate(([self.y[0]], y)), src, last)
+
+    # returns (i, j, t, u) for each crossing of line i (at t along it) and
+    # a later line j (at u) which is not its neighbour
+    @staticmethod
+    def getIntersections(x, y, closed: bool) -> tuple:
+        n = len(x) - 1
+        ax, ay, bx, by = x[:-1], y[:-1], x[1:], y[1:]
+        minx, maxx = np.minimum(ax, bx), np.maximum(ax, bx)
+        miny, maxy = np.minimum(ay, by), np.maximum(ay, by)
+        rx = bx - ax
+        ry = by - ay
+        found = []
+        # compare a chunk of rows against every line at a time to bound memory
+        chunk = max(1, 4000000 // max(n, 1))
+        for start in range(0, n, chunk):
+            i = np.arange(start, min(start + chunk, n))
+            j = np.arange(n)
+            m = (j[None, :] > i[:, None] + 1)
+            m &= (minx[None, :] <= maxx[i, None]) & (maxx[None, :] >= minx[i, None])
+            m &= (miny[None, :] <= maxy[i, None]) & (maxy[None, :] >= miny[i, None])
+            if closed:
+                m &= ~((i[:, None] == 0) & (j[None, :] == n - 1))
+            ii, jj = np.nonzero(m)
+            if not len(ii): continue
+            ii = i[ii]
+            den = rx[ii] * ry[jj] - ry[ii] * rx[jj]
+            ok = np.abs(den) > PathOffset.eps * PathOffset.eps
+            den = np.where(ok, den, 1)
+            qx = ax[jj] - ax[ii]
+            qy = ay[jj] - ay[ii]
+            t = (qx * ry[jj] - qy * rx[jj]) / den
+            u = (qx * ry[ii] - qy * rx[ii]) / den
+            ok &= (t >= 0) & (t < 1) & (u >= 0) & (u < 1)
+            found.append((ii[ok], jj[ok], t[ok], u[ok]))
+        if not found:
+            return (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0))
+        return tuple(np.concatenate(f) for f in zip(*found))
+
+    # returns the winding number of the polygon about each of the points
+    @staticmethod
+    def getWindings(px, py, x, y):
+        px = np.asarray(px, dtype=np.float64)
+        py = np.asarray(py, dtype=np.float64)
+        x2 = np.roll(x, -1)
+        y2 = np.roll(y, -1)
+        ret = np.zeros(len(px), dtype=np.int64)
+        if not len(px): return ret
+        # only the edges crossing the horizontal through a point count, so
+        # pair each edge with the points (sorted by y) in its span of y
+        order = np.argsort(py, kind="stable")
+        start = np.searchsorted(py[order], np.minimum(y, y2), "left")
+        count = np.searchsorted(py[order], np.maximum(y, y2), "left") - start
+        total = np.cumsum(count)
+        first = 0
+        while first < len(x):
+            # bound the number of pairs handled at once
+            last = max(first + 1, int(np.searchsorted(total, total[first] - count[first] + 4000000, "right")))
+            n = count[first:last]
+            e = np.repeat(np.arange(first, last), n)
+            p = order[np.repeat(start[first:last], n) + np.arange(len(e)) - np.repeat(np.cumsum(n) - n, n)]
+            # counted (up or down) when the point is on the left of the edge
+            side = (x2[e] - x[e]) * (py[p] - y[e]) - (px[p] - x[e]) * (y2[e] - y[e])
+            up = (y2[e] > y[e]) & (side > 0)
+            down = (y2[e] < y[e]) & (side < 0)
+            ret += np.bincount(p[up], minlength=len(px)) - np.bincount(p[down], minlength=len(px))
+            first = last
+        return ret
+
+    # removes the loops which are not part of the offset and returns the
+    # remaining paths (a closed path may split into several or vanish)
+    # open paths lose every loop wound in the junk direction, closed paths
+    # (wound in the direction given by winding) are cut wherever they cross
+    # and only the boundary of the region they wind about is kept
+    def removeLoops(self, closed: bool, junk: int, winding: int = 1) -> list:
+        x, y, src, last = self.linearise()
+        n = len(src)
+        ii, jj, tt, uu = PathOffset.getIntersections(x, y, closed)
+        if not closed:
+            return [self.removeOpenLoops(x, y, src, last, ii, jj, tt, uu, junk)]
+        # split every line where it is crossed
+        k = np.concatenate((np.arange(n), np.arange(n), ii, jj))
+        t = np.concatenate((np.zeros(n), np.ones(n), tt, uu))
+        order = np.lexsort((t, k))
+        k = k[order]
+        t = t[order]
+        same = k[1:] == k[:-1]
+        k, ts, te = k[:-1][same], t[:-1][same], t[1:][same]
+        # pieces too short to matter are dropped (see getChains)
+        length = np.hypot(x[k + 1] - x[k], y[k + 1] - y[k])
+        m = (te - ts) * length > PathOffset.tolerance
+        k, ts, te, length = k[m], ts[m], te[m], length[m]
+        if not len(k): return []
+        # probe the winding either side of the middle of each piece
+        dx = x[k + 1] - x[k]
+        dy = y[k + 1] - y[k]
+        scale = max(1.0, float(np.max(np.abs(x))), float(np.max(np.abs(y))))
+        delta = 1e-9 * scale / np.where(length < PathOffset.eps, 1, length)
+        mx = x[k] + dx * (ts + te) / 2
+        my = y[k] + dy * (ts + te) / 2
+        w = PathOffset.getWindings(np.concatenate((mx - dy * delta, mx + dy * delta)),
+                                   np.concatenate((my + dx * delta, my - dx * delta)), x, y) * winding >= 1
+        left, right = w[:len(k)], w[len(k):]
+        # keep the pieces with the region on one side only, pieces with
+        # the region on the wrong side are reversed
+        keep = left != right
+        flip = right if winding > 0 else left
+        k, ts, te, flip = k[keep], ts[keep], te[keep], flip[keep]
+        ts, te = np.where(flip, te, ts), np.where(flip, ts, te)
+        ret = []
+        for c in PathOffset.getChains(x, y, k, ts, te):
+            cx = x[k[c]] + (x[k[c] + 1] - x[k[c]]) * ts[c]
+            cy = y[k[c]] + (y[k[c] + 1] - y[k[c]]) * ts[c]
+            area = 0.5 * float(np.sum(cx * np.roll(cy, -1) - np.roll(cx, -1) * cy))
+            if area * winding > PathOffset.min_area:
+                ret.append(self.rebuild(x, y, src, last, k[c], ts[c], te[c]))
+        return ret
+
+    # links pieces (lines k from ts to te) end to start into closed chains
+    # returning the indices of the pieces in each chain
+    @staticmethod
+    def getChains(x, y, k, ts, te) -> list:
+        if not len(k): return []
+        sx = x[k] + (x[k + 1] - x[k]) * ts
+        sy = y[k] + (y[k + 1] - y[k]) * ts
+        ex = x[k] + (x[k + 1] - x[k]) * te
+        ey = y[k] + (y[k + 1] - y[k]) * te
+        # bridges the gaps left by dropped pieces
+        tolerance = 10 * PathOffset.tolerance
+        # pieces mostly follow on from the one before, so link those runs
+        # first and then join up the runs
+        follows = np.hypot(sx[1:] - ex[:-1], sy[1:] - ey[:-1]) < tolerance
+        cuts = np.flatnonzero(~follows) + 1
+        runs = np.split(np.arange(len(k)), cuts)
+        rx = np.array([sx[r[0]] for r in runs])
+        ry = np.array([sy[r[0]] for r in runs])
+        used = np.zeros(len(runs), dtype=bool)
+        ret = []
+        for first in range(len(runs)):
+            if used[first]: continue
+            chain = []
+            r = first
+            while r is not None and not used[r]:
+                used[r] = True
+                chain.append(runs[r])
+                # the nearest unused run starting where this one ends
+                p = runs[r][-1]
+                gap = np.where(used, np.inf, np.hypot(rx - ex[p], ry - ey[p]))
+                r = int(np.argmin(gap))
+                if gap[r] > tolerance: r = None
+            chain = np.concatenate(chain)
+            if len(chain) > 1:
+                ret.append(chain)
+        return ret
+
+    # removes the loops of an open path which are wound in the junk direction
+    def removeOpenLoops(self, x, y, src, last, ii, jj, tt, uu, junk: int) -> 'PathOffset':
+        n = len(src)
+        alive = np.ones(n, dtype=bool)
+        ts = np.zeros(n)
+        te = np.ones(n)
+        # tightest loops first so nested loops are removed from the inside out
+        for p in np.argsort(jj - ii, kind="stable"):
+            i, j, t, u = int(ii[p]), int(jj[p]), tt[p], uu[p]
+            if not alive[i] or not alive[j]: continue
+            if t < ts[i] or t > te[i] or u < ts[j] or u > te[j]: continue
+            k = np.arange(i + 1, j + 1)
+            k = k[alive[k]]
+            lx = np.concatenate(([x[i] + (x[i + 1] - x[i]) * t], x[k] + (x[k + 1] - x[k]) * ts[k]))
+            ly = np.concatenate(([y[i] + (y[i + 1] - y[i]) * t], y[k] + (y[k + 1] - y[k]) * ts[k]))
+            area = 0.5 * float(np.sum(lx * np.roll(ly, -1) - np.roll(lx, -1) * ly))
+            if area * junk >= 0:
+                alive[i + 1:j] = False
+                te[i] = t
+                ts[j] = u
+        k = np.flatnonzero(alive)
+        return self.rebuild(x, y, src, last, k, ts[k], te[k])
+
+    # builds a path from the (linearised) lines k of this path which
+    # remain after loop removal, trimmed to start at ts and end at te
+    def rebuild(self, x, y, src, last, k, ts, te) -> 'PathOffset':
+        sx = x[k] + (x[k + 1] - x[k]) * ts
+        sy = y[k] + (y[k + 1] - y[k]) * ts
+        ex = x[k] + (x[k + 1] - x[k]) * te
+        ey = y[k] + (y[k + 1] - y[k]) * te
+        # arcs which survived whole remain arcs, the rest become their lines
+        # (every one of their lines is present, whole and in order)
+        piece = src[k]
+        pieces = self.getLength()
+        lines = np.bincount(src, minlength=pieces)
+        full = np.bincount(piece[(ts == 0) & (te == 1)], minlength=pieces)
+        ordered = np.bincount(piece[1:][(k[1:] == k[:-1] + 1) & (piece[1:] == piece[:-1])], minlength=pieces)
+        count = np.bincount(piece, minlength=pieces)
+        whole = ((count == lines) & (full == lines) & (ordered == lines - 1))[piece]
+        arc = (self.kind[piece] != PathOffset.LINE) & whole
+        keep = ~arc | last[k]
+        kind = np.where(arc, self.kind[piece], PathOffset.LINE)[keep]
+        return PathOffset(np.concatenate(([sx[0]], ex[keep])), np.concatenate(([sy[0]], ey[keep])), kind,
+                          np.where(arc, self.cx[piece], np.nan)[keep], np.where(arc, self.cy[piece], np.nan)[keep])
+
+    # returns a copy of the given block which follows this path, keeping
+    # the block's first (G00) command, penetrate commands and feed rate
+    def toBlock(self, block: GrblCommand) -> GrblCommand:
+        cfg = block.getConfig()
+        c = block.getFirst()
+        ret = None
+        cut = None
+        while c:
+            if c.nn("X") or c.nn("Y"):
+                if not ret:
+                    ret = c.__copy__()
+                    ret.setX(float(self.x[0]))
+                    ret.setY(float(self.y[0]))
+                elif not cut:
+                    cut = c
+            elif ret and not cut:
+                ret = ret.appendObject(c.__copy__())
+            c = c.getNext()
+        if not ret:
+            raise ValueError("block has no moves")
+        # moves too short to be written are skipped (an arc which starts
+        # and ends in the same place would be a full circle)
+        resolution = 0.5 * 10 ** -cfg.max_dp
+        sweep = PathOffset.getSweeps(self.x[:-1], self.y[:-1], self.x[1:], self.y[1:], self.kind, self.cx, self.cy)
+        x = self.x.tolist()
+        y = self.y.tolist()
+        cx = self.cx.tolist()
+        cy = self.cy.tolist()
+        kind = self.kind.tolist()
+        tiny = (np.abs(sweep) < math.pi).tolist()
+        lx = x[0]
+        ly = y[0]
+        first = True
+        for k in range(self.getLength()):
+            if tiny[k] and math.hypot(x[k + 1] - lx, y[k + 1] - ly) < resolution:
+                continue
+            o = GrblCommand("", cfg)
+            o.vals["G"] = kind[k] + 1
+            if kind[k] != PathOffset.LINE:
+                o.vals["I"] = cx[k] - lx
+                o.vals["J"] = cy[k] - ly
+            lx = x[k + 1]
+            ly = y[k + 1]
+            o.vals["X"] = lx
+            o.vals["Y"] = ly
+            if first and cut:
+                first = False
+                # carry the modal values of the first cut
+                for p in ["Z", "F", "S"]:
+                    if cut.nn(p): o.vals[p] = cut.vals[p]
+            # every move is within the block so link it directly rather
+            # than working out where blocks start and end (see setPrevious)
+            o.previous = ret
+            ret.next = o
+            o.block = ret.block
+            o.blockIndex = ret.blockIndex + 1
+            ret = o
+        return ret.getFirst()
+
+    # returns a list of offset copies of the block (see offset)
+    # closedOnly returns open paths unchanged
+    @staticmethod
+    def offsetBlock(block: GrblCommand, distance: float, join: str = "round", closedOnly: bool = False) -> List[GrblCommand]:
+        path = PathOffset.fromBlock(block)
+        if not path.getLength() or (closedOnly and not path.isClosed()):
+            return [block.__deepcopy__().getFirst()]
+        return [p.toBlock(block) for p in path.offset(distance, join)]
+
+    # the number of other closed paths each closed path is inside
+    # (odd for holes), open paths are given -1
+    @staticmethod
+    def getDepths(paths: List['PathOffset']) -> List[int]:
+        closed = [p for p in range(len(paths)) if paths[p].isClosed()]
+        ret = [-1] * len(paths)
+        if not closed: return ret
+        lines = [paths[p].linearise()[:2] for p in closed]
+        box = np.array([[x.min(), y.min(), x.max(), y.max()] for x, y in lines])
+        # a point just along the first line of each path
+        px = np.array([x[0] + (x[1] - x[0]) * 0.5 for x, y in lines])
+        py = np.array([y[0] + (y[1] - y[0]) * 0.5 for x, y in lines])
+        inside = (box[None, :, 0] <= px[:, None]) & (box[None, :, 2] >= px[:, None])
+        inside &= (box[None, :, 1] <= py[:, None]) & (box[None, :, 3] >= py[:, None])
+        np.fill_diagonal(inside, False)
+        for a, b in zip(*np.nonzero(inside)):
+            x, y = lines[b]
+            inside[a, b] = PathOffset.getWindings(px[a:a + 1], py[a:a + 1], x, y)[0] != 0
+        for a in range(len(closed)):
+            ret[closed[a]] = int(inside[a].sum())
+        return ret
+
+    # offsets every block of a program (see GrblCommand.offset), leaving
+    # the commands between blocks alone. holes reverses the distance for
+    # closed blocks which are inside an odd number of others
+    @staticmethod
+    def offsetProgram(commands: GrblCommand, distance: float, join: str = "round", closedOnly: bool = False, holes: bool = False) -> GrblCommand:
+        parts = PathOffset.splitProgram(commands)
+        blocks = [p[0] for p in parts if isinstance(p, list)]
+        paths = [PathOffset.fromBlock(b) for b in blocks]
+        distances = [distance] * len(blocks)
+        if holes:
+            depths = PathOffset.getDepths(paths)
+            distances = [-distance if d % 2 else distance for d in depths]
+        ret = None
+        n = 0
+        for p in parts:
+            if not isinstance(p, list):
+                ret = ret.appendObject(p) if ret else p
+                continue
+            block = p[0]
+            path = paths[n]
+            offs = distances[n]
+            n += 1
+            if not path.getLength() or (closedOnly and not path.isClosed()):
+                offset = [block]
+            else:
+                offset = [o.toBlock(block) for o in path.offset(offs, join)]
+            for x in range(0, len(offset)):
+                if x > 0:
+                    ret = ret.appendObjects(commands.generateEvacuationCommand())
+                ret = PathOffset.appendBlock(ret, offset[x])
+        return ret.getFirst() if ret else None
+
+    # splits a program into copies of the commands between blocks and
+    # lists holding a copy of each block
+    @staticmethod
+    def splitProgram(commands: GrblCommand) -> list:
+        parts = []
+        b = None
+        c = commands.getFirst()
+        while c:
+            o = c.__copy__()
+            if not c.isInBlock():
+                parts.append(o)
+                b = None
+            else:
+                if b and c.blockIndex > 0:
+                    # link directly, the block numbering is already known
+                    o.previous = b
+                    b.next = o
+                else:
+                    parts.append([o])
+                b = o
+            c = c.getNext()
+        return parts
+
+    # appends a block (built by toBlock) to ret (which may be None)
+    # returning the last command
+    @staticmethod
+    def appendBlock(ret: GrblCommand, block: GrblCommand) -> GrblCommand:
+        ret = ret.appendObject(block) if ret else block
+        if ret.blockIndex != 0:
+            # a block starting at X0 or Y0 is not recognised (see isBlockStart)
+            ret.block = ret.previous.block + 1 if ret.previous else 0
+            ret.blockIndex = 0
+        # the rest of the block follows its first command
+        foo = ret.getNext()
+        while foo:
+            foo.block = ret.block
+            foo.blockIndex = foo.previous.blockIndex + 1
+            ret = foo
+            foo = foo.getNext()
+        return ret
@@ -0,0 +1,52 @@
+# pylint: disable = line-too-long
+
+from typing import List
+import os
+import concurrent.futures
+from gml.command import GrblConfig, GrblCommand
+
+
+class BlockParallel():
+    """
+        Sanitises blocks (and applies per block passes such as pointify,
+        despeckle, offset and dilate) across a pool of processes.
+        Blocks are independent of each other so they are sent to the
+        workers in groups as compact records (see GrblCommand.toRecords),
+        never as linked chains, and are reassembled in their original order.
+        Used by GrblCommand.getBlocks when GrblConfig.block_workers > 1
+    """
+    # groups of blocks sent to each worker per process
+    groups_per_worker = 4
+
+    # runs in a worker: sanitises and passes a group of blocks
+    @staticmethod
+    def runGroup(group: List[list], config: GrblConfig, passes) -> List[list]:
+        ret = []
+        for records in group:
+            b = GrblCommand.fromRecords(records, config)
+            b = b.sanitiseBlock(b)
+            b = GrblCommand.applyPasses(b, passes)
+            ret.append(b.toRecords())
+        return ret
+
+    # splits items into about parts lists of consecutive items
+    @staticmethod
+    def split(items: list, parts: int) -> List[list]:
+        parts = max(1, min(parts, len(items)))
+        size = -(-len(items) // parts)
+        return [items[i:i + size] for i in range(0, len(items), size)]
+
+    # the equivalent of sanitiseBlock followed by applyPasses for each
+    # of the (unsanitised) blocks, returned in the same order
+    @staticmethod
+    def sanitiseBlocks(blocks: List[GrblCommand], config: GrblConfig, passes=None) -> List[GrblCommand]:
+        if not blocks: return []
+        if not config: config = GrblConfig.current()
+        workers = config.block_workers or os.cpu_count() or 1
+        groups = BlockParallel.split([b.toRecords() for b in blocks], workers * BlockParallel.groups_per_worker)
+        ret = []
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            for group in pool.map(BlockParallel.runGroup, groups, [config] * len(groups), [passes] * len(groups)):
+                for records in group:
+                    ret.append(GrblCommand.fromRecords(records, config))
+        return ret
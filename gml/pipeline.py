@@ -0,0 +1,174 @@
+# pylint: disable = line-too-long
+
+from gml.command import GrblCommand
+
+
+class GrblPipeline():
+    """
+        Applies a list of passes (name, [args]) to a program in order, as
+        Batch does with its transforms, but with each run of passes which
+        work a line at a time (see line_passes) fused into a single walk
+        of the chain rather than one walk for each.
+
+        Each line pass declares the state of the machine it needs before
+        each line (ie. the estimated Z, see GrblCommand.getEstimatedZ)
+        which is carried along the walk for it rather than walked back for
+        at every line. Every pass keeps its own copy of the state, taken
+        from each line just after that pass has seen it, so the result is
+        exactly as if the passes had been applied one after the other.
+        Other passes (any GrblCommand method taking the program, ie.
+        pointify or offset) are applied to the whole program between walks.
+
+        A pipeline can be loaded from a file of passes, one to a line in
+        the same form as the batch command line's -t, ie.
+
+            # pipeline.txt
+            pointify
+            setCutSpeed 150
+            setPenetrateDepth 0.35
+            translate 10 10
+    """
+    # the passes which work a line at a time and the parameters of
+    # the line before which they need (see estimates)
+    line_passes = {
+        "setCutSpeed": ["Z"],
+        "setFastTravelSpeed": ["Z"],
+        "setEvacuateHeight": ["Z"],
+        "setPenetrateSpeed": ["Z"],
+        "setPenetrateDepth": ["Z"],
+        "translate": [],
+        "scale": [],
+    }
+    # the value of each parameter before the first line (see getEstimatedZ)
+    estimates = {"Z": 0.0}
+    # the line passes which move the ends of moves. As every line is walked
+    # the geometry of each is forgotten as it is reached (rather than as
+    # each of its parameters is set, see GrblCommand.setMoveParameter)
+    moves = ["translate", "scale"]
+
+    def __init__(self, passes=None):
+        self.passes = [(name, GrblPipeline.getArgs(name, list(args))) for name, args in (passes or [])]
+        self.stages = self.schedule()
+
+    # loads a pipeline from a file (see above)
+    @staticmethod
+    def load(filename: str) -> 'GrblPipeline':
+        from gml.batch import Batch
+        passes = []
+        with open(filename, "r") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line: passes.append(Batch.parseTransform(line))
+        return GrblPipeline(passes)
+
+    # checks the args of a pass, returning them as the pass uses them
+    @staticmethod
+    def getArgs(name: str, args: list) -> list:
+        if name not in GrblPipeline.line_passes:
+            if not callable(getattr(GrblCommand, name, None)):
+                raise ValueError("unknown pass '" + name + "'")
+            return args
+        if name in ["translate", "scale"]:
+            if len(args) != (2 if name == "translate" else 1):
+                raise ValueError(name + " takes " + ("x and y" if name == "translate" else "a factor"))
+            return args
+        if len(args) != 1 or not args[0]:
+            raise ValueError("must pass a valid " + ("depth" if name == "setPenetrateDepth" else "height" if name == "setEvacuateHeight" else "speed"))
+        # zero is where the job starts, so penetrate below it
+        if name == "setPenetrateDepth" and args[0] >= 0:
+            return [args[0] * -1]
+        return args
+
+    # groups the passes into stages, each either a list of line passes
+    # applied in a single walk or a single pass applied to the whole program
+    def schedule(self) -> list:
+        ret = []
+        for p in self.passes:
+            if p[0] in GrblPipeline.line_passes:
+                if ret and isinstance(ret[-1], list):
+                    ret[-1].append(p)
+                else:
+                    ret.append([p])
+            else:
+                ret.append(p)
+        return ret
+
+    # the number of walks of the chain the line passes are fused into
+    def getWalks(self) -> int:
+        return len([s for s in self.stages if isinstance(s, list)])
+
+    # applies the pipeline, returning the first command of the result.
+    # meta (if given) is updated with the meta of the program after each
+    # stage (ie. merge reports the moves it removed)
+    def run(self, commands: GrblCommand, meta: dict = None) -> GrblCommand:
+        commands = commands.getFirst()
+        for s in self.stages:
+            if isinstance(s, list):
+                self.walk(commands, s)
+            else:
+                foo = getattr(commands, s[0])(*s[1])
+                # some passes work in place and return nothing
+                if foo: commands = foo.getFirst()
+            if meta is not None: meta.update(commands.getMeta() or {})
+        return commands
+
+    # applies each of passes to every line in turn
+    @staticmethod
+    def walk(commands: GrblCommand, passes: list):
+        steps = []
+        for name, args in passes:
+            needs = GrblPipeline.line_passes[name]
+            steps.append((getattr(GrblPipeline, name), args, {p: GrblPipeline.estimates.get(p) for p in needs}, needs))
+        moves = any(name in GrblPipeline.moves for name, args in passes)
+        c = commands.getFirst()
+        while c:
+            vals = c.vals
+            for func, args, state, needs in steps:
+                func(c, state, *args)
+                for p in needs:
+                    if vals[p] is not None: state[p] = vals[p]
+            if moves: c.geometry = None
+            c = c.next
+
+    # the line passes, each given a command and the state before it
+
+    @staticmethod
+    def setCutSpeed(c: GrblCommand, state: dict, speed):
+        if c.isPenetrate(state["Z"]): return
+        z = c.getZ() if c.nn("Z") else state["Z"]
+        if 0 >= z: c.setF(speed)
+
+    @staticmethod
+    def setFastTravelSpeed(c: GrblCommand, state: dict, speed):
+        z = c.getZ() if c.nn("Z") else state["Z"]
+        if 0 <= z: c.setF(speed)
+
+    @staticmethod
+    def setEvacuateHeight(c: GrblCommand, state: dict, height):
+        if c.isEvacuation(state["Z"]): c.setZ(height)
+
+    @staticmethod
+    def setPenetrateSpeed(c: GrblCommand, state: dict, speed):
+        if c.isPenetrate(state["Z"]): c.setF(speed)
+
+    @staticmethod
+    def setPenetrateDepth(c: GrblCommand, state: dict, depth):
+        if c.isPenetrate(state["Z"]): c.setZ(depth)
+
+    @staticmethod
+    def translate(c: GrblCommand, state: dict, x, y):
+        if c.nn("X"): c.setParameter("X", c.getX() + x)
+        if c.nn("Y"): c.setParameter("Y", c.getY() + y)
+
+    @staticmethod
+    def scale(c: GrblCommand, state: dict, units):
+        nx = None
+        ny = None
+        if c.nn("X") and c.nn("Y"):
+            nx = (c.getX() * units)
+            ny = (c.getY() * units)
+            if c.nn("I") and c.nn("J"):
+                c.setParameter("I", nx - ((c.getX() - c.getI()) * units))
+                c.setParameter("J", ny - ((c.getY() - c.getJ()) * units))
+        if nx: c.setParameter("X", nx)
+        if ny: c.setParameter("Y", ny)
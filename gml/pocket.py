@@ -0,0 +1,230 @@
+# pylint: disable = line-too-long
+
+# pip3 install numpy
+from typing import List
+import math
+import concurrent.futures
+import numpy as np
+from gml.command import GrblCommand
+from gml.offset import PathOffset
+from gml.fill import PathFill
+
+
+class PathPocket():
+    """
+        Clears the inside of a closed path (a pocket) by cutting rings, each
+        the last offset inwards by the step over, until the path vanishes.
+
+        Rings which split (ie. at the waist of an '8') carry on inwards
+        separately, so the rings form a tree. Each branch is cut from the
+        innermost ring outwards and every ring is joined to the one inside
+        it by a short move (which only ever crosses material being cleared)
+        so the tool is only lifted between branches. Rings are clipped where
+        they cross the holes (islands) inside the path.
+    """
+    # stop after this many rings whatever happens
+    max_rings = 10000
+    # the points along a move between rings checked for being inside a hole
+    link_samples = 16
+
+    # True if the line (px, py) to (qx, qy) crosses any of the edges
+    # (ax, ay) to (bx, by), touching them at its ends does not count
+    @staticmethod
+    def isCrossing(px, py, qx, qy, edges: tuple) -> bool:
+        ax, ay, bx, by = edges
+        dx = qx - px
+        dy = qy - py
+        rx = bx - ax
+        ry = by - ay
+        den = dx * ry - dy * rx
+        ok = np.abs(den) > PathOffset.eps
+        den = np.where(ok, den, 1)
+        t = ((ax - px) * ry - (ay - py) * rx) / den
+        u = ((ax - px) * dy - (ay - py) * dx) / den
+        return bool(np.any(ok & (t > 1e-6) & (t < 1 - 1e-6) & (u >= 0) & (u <= 1)))
+
+    # True if the line (px, py) to (qx, qy) passes through the inside of
+    # any of the holes. A line between two points on the edge of a hole
+    # (ie. across the gap a ring was clipped at) crosses none of its edges
+    # so points along it are checked as well
+    @staticmethod
+    def isThrough(px, py, qx, qy, holes: PathFill) -> bool:
+        t = (np.arange(PathPocket.link_samples) + 0.5) / PathPocket.link_samples
+        return bool(np.any(holes.getInside(px + t * (qx - px), py + t * (qy - py))))
+
+    # returns the parts of the path outside the holes, the path itself
+    # (keeping its arcs) unless it crosses them
+    @staticmethod
+    def clip(path: PathOffset, holes: PathFill) -> List[PathOffset]:
+        if not holes or not holes.getLength(): return [path]
+        x, y = path.linearise(PathFill.chord_tolerance)[:2]
+        n = len(x) - 1
+        # where each line crosses the edges of the holes
+        sx, sy = x[:-1, None], y[:-1, None]
+        dx, dy = x[1:, None] - sx, y[1:, None] - sy
+        rx = holes.bx - holes.ax
+        ry = holes.by - holes.ay
+        den = dx * ry - dy * rx
+        ok = np.abs(den) > PathOffset.eps
+        den = np.where(ok, den, 1)
+        t = ((holes.ax - sx) * ry - (holes.ay - sy) * rx) / den
+        u = ((holes.ax - sx) * dy - (holes.ay - sy) * dx) / den
+        ok &= (t >= 0) & (t < 1) & (u >= 0) & (u <= 1)
+        k, e = np.nonzero(ok)
+        if not len(k):
+            inside = holes.getInside(np.array([(x[0] + x[1]) / 2]), np.array([(y[0] + y[1]) / 2]))
+            return [] if inside[0] else [path]
+        # split the lines where they cross and keep the pieces outside
+        k = np.concatenate((np.arange(n), k, [n - 1]))
+        t = np.concatenate((np.zeros(n), t[ok], [1.0]))
+        order = np.lexsort((t, k))
+        px = x[k[order]] + (x[k[order] + 1] - x[k[order]]) * t[order]
+        py = y[k[order]] + (y[k[order] + 1] - y[k[order]]) * t[order]
+        mx = (px[:-1] + px[1:]) / 2
+        my = (py[:-1] + py[1:]) / 2
+        keep = ~holes.getInside(mx, my)
+        keep &= np.hypot(px[1:] - px[:-1], py[1:] - py[:-1]) > PathOffset.eps
+        ret = []
+        runs = np.split(np.arange(len(keep)), np.flatnonzero(np.diff(keep.astype(np.int8))) + 1)
+        for r in runs:
+            if not keep[r[0]]: continue
+            m = len(r)
+            ret.append(PathOffset(px[r[0]:r[-1] + 2], py[r[0]:r[-1] + 2], np.zeros(m), np.full(m, np.nan), np.full(m, np.nan)))
+        # a piece running through the start of a closed path joins the last
+        if len(ret) > 1 and keep[0] and keep[-1] and path.isClosed():
+            a, b = ret.pop(), ret[0]
+            m = a.getLength() + b.getLength()
+            ret[0] = PathOffset(np.concatenate((a.x, b.x[1:])), np.concatenate((a.y, b.y[1:])), np.zeros(m), np.full(m, np.nan), np.full(m, np.nan))
+        return ret
+
+    # the path starting (and ending) at its vertex nearest (x, y)
+    @staticmethod
+    def rotate(path: PathOffset, x: float, y: float) -> PathOffset:
+        v = int(np.argmin(np.hypot(path.x[:-1] - x, path.y[:-1] - y)))
+        if not v: return path
+        return PathOffset(np.concatenate((path.x[v:-1], path.x[:v + 1])), np.concatenate((path.y[v:-1], path.y[:v + 1])),
+                          np.concatenate((path.kind[v:], path.kind[:v])), np.concatenate((path.cx[v:], path.cx[:v])), np.concatenate((path.cy[v:], path.cy[:v])))
+
+    # joins paths which each start where the last ended into one
+    @staticmethod
+    def join(paths: List[PathOffset]) -> PathOffset:
+        return PathOffset(np.concatenate([paths[0].x] + [p.x[1:] for p in paths[1:]]), np.concatenate([paths[0].y] + [p.y[1:] for p in paths[1:]]),
+                          np.concatenate([p.kind for p in paths]), np.concatenate([p.cx for p in paths]), np.concatenate([p.cy for p in paths]))
+
+    # returns the paths (strands) to cut, in order, to clear the inside of
+    # the closed path with rings step apart. Each strand is cut without
+    # lifting the tool and the last is the path itself (less any holes)
+    @staticmethod
+    def pocket(path: PathOffset, step: float, holes: List[PathOffset] = None) -> List[PathOffset]:
+        if not step or step <= 0:
+            raise ValueError("step must be positive")
+        if not path.isClosed():
+            raise ValueError("only closed paths can be pocketed")
+        islands = PathFill(holes) if holes else None
+        # the rings and the index of the ring each is inside
+        rings = [path]
+        parent = [-1]
+        n = 0
+        while n < len(rings) and len(rings) < PathPocket.max_rings:
+            for r in rings[n].offset(-step):
+                rings.append(r)
+                parent.append(n)
+            n += 1
+        children = [[] for _ in rings]
+        for r in range(1, len(rings)):
+            children[parent[r]].append(r)
+        # cut each ring after the rings inside it (children before parents)
+        order = []
+        stack = [(0, False)]
+        while stack:
+            r, done = stack.pop()
+            if done:
+                order.append(r)
+                continue
+            stack.append((r, True))
+            for c in reversed(children[r]):
+                stack.append((c, False))
+        strands = []
+        last = None
+        for r in order:
+            ring = rings[r]
+            edges = None
+            for piece in PathPocket.clip(ring, islands):
+                # a ring is only joined to the ring just cut inside it (or
+                # the last piece of itself) so the move between them is
+                # through material being cleared
+                joined = bool(strands) and (last == r or parent[last] == r)
+                if joined:
+                    ex, ey = float(strands[-1][-1].x[-1]), float(strands[-1][-1].y[-1])
+                    if piece is ring:
+                        piece = PathPocket.rotate(piece, ex, ey)
+                    sx, sy = float(piece.x[0]), float(piece.y[0])
+                    if not edges:
+                        x, y = ring.linearise(PathFill.chord_tolerance)[:2]
+                        edges = (x[:-1], y[:-1], x[1:], y[1:])
+                    # the move must stay inside the ring and out of the holes
+                    joined = not PathPocket.isCrossing(ex, ey, sx, sy, edges)
+                    if joined and islands:
+                        joined = not PathPocket.isCrossing(ex, ey, sx, sy, (islands.ax, islands.ay, islands.bx, islands.by))
+                        joined = joined and not PathPocket.isThrough(ex, ey, sx, sy, islands)
+                if joined:
+                    if math.hypot(sx - ex, sy - ey) > PathOffset.eps:
+                        strands[-1].append(PathOffset([ex, sx], [ey, sy], [PathOffset.LINE], [np.nan], [np.nan]))
+                    strands[-1].append(piece)
+                else:
+                    strands.append([piece])
+                last = r
+        return [PathPocket.join(s) for s in strands]
+
+    # runs in a worker: pockets a group of (path, holes)
+    @staticmethod
+    def runGroup(group: List[tuple], step: float) -> List[List[PathOffset]]:
+        return [PathPocket.pocket(path, step, holes) for path, holes in group]
+
+    # returns a copy of the program with every closed block (other than the
+    # holes inside other blocks) replaced by the strands which pocket it
+    # rings step (mm) apart, each as a block of its own. The blocks are
+    # pocketed across processes when GrblConfig.block_workers > 1
+    @staticmethod
+    def pocketProgram(commands: GrblCommand, step: float) -> GrblCommand:
+        if not step or step <= 0:
+            raise ValueError("step must be positive")
+        cfg = commands.getConfig()
+        parts = PathOffset.splitProgram(commands)
+        blocks = [p[0] for p in parts if isinstance(p, list)]
+        paths = [PathOffset.fromBlock(b) for b in blocks]
+        depths = PathOffset.getDepths(paths)
+        # the holes directly inside each block which is pocketed
+        work = [n for n in range(len(paths)) if depths[n] >= 0 and depths[n] % 2 == 0 and paths[n].getLength()]
+        holes = {n: [] for n in work}
+        for h in range(len(paths)):
+            if depths[h] < 1 or depths[h] % 2 == 0: continue
+            px = np.array([paths[h].x[0]])
+            py = np.array([paths[h].y[0]])
+            for n in work:
+                if depths[n] == depths[h] - 1 and PathOffset.getWindings(px, py, *paths[n].linearise()[:2])[0] != 0:
+                    holes[n].append(paths[h])
+        items = [(paths[n], holes[n]) for n in work]
+        if cfg.block_workers > 1 and len(items) > 1:
+            from gml.parallel import BlockParallel
+            groups = BlockParallel.split(items, cfg.block_workers * BlockParallel.groups_per_worker)
+            with concurrent.futures.ProcessPoolExecutor(max_workers=cfg.block_workers) as pool:
+                done = [s for g in pool.map(PathPocket.runGroup, groups, [step] * len(groups)) for s in g]
+        else:
+            done = PathPocket.runGroup(items, step)
+        pockets = dict(zip(work, done))
+        ret = None
+        n = 0
+        for p in parts:
+            if not isinstance(p, list):
+                ret = ret.appendObject(p) if ret else p
+                continue
+            strands = [p[0]]
+            if n in pockets:
+                strands = [s.toBlock(p[0]) for s in pockets[n]]
+            n += 1
+            for x in range(0, len(strands)):
+                if x > 0:
+                    ret = ret.appendObjects(commands.generateEvacuationCommand())
+                ret = PathOffset.appendBlock(ret, strands[x])
+        return ret.getFirst() if ret else None
@@ -0,0 +1,194 @@
+# pylint: disable = line-too-long
+
+# pip3 install numpy
+import os
+import zlib
+import struct
+import numpy as np
+from gml.program import GrblProgram
+
+
+class GrblPreview():
+    """
+        Draws a thumbnail of a program into a NumPy image, cuts in black,
+        rapid (G00) moves in red and penetrations (plunges) as small blue
+        circles, and writes it as a PNG (with nothing but zlib, no imaging
+        library is needed).
+
+        Every move is drawn at once with array operations straight from
+        the columns of the program: arcs are split into short lines and
+        each line is sampled every pixel, each sample being shared
+        between the four pixels around it (so lines are anti-aliased).
+    """
+    # the width of the drawing (pixels) when the program is wider than it
+    # is tall, otherwise its height
+    size = 1024
+    # pixels left around the drawing
+    margin = 8
+    background = (255, 255, 255)
+    cut_colour = (0, 0, 0)
+    rapid_colour = (230, 40, 40)
+    penetrate_colour = (40, 80, 230)
+    # the radius (pixels) of the circle drawn for each penetration
+    penetrate_radius = 3.0
+    # the most samples drawn at once
+    chunk_samples = 4000000
+
+    def __init__(self, program: GrblProgram, size: int = None):
+        if not program:
+            raise ValueError("must supply a program")
+        if size is None: size = GrblPreview.size
+        if size < 1:
+            raise ValueError("size must be positive")
+        self.program = program
+        self.moves = program.getMoves()
+        if program.bounds is None: program.calculateBounds(self.moves)
+        b = program.getBounds()
+        if np.isnan(b[[0, 1, 3, 4]]).any():
+            b = np.zeros(6)
+        self.left = b[0]
+        self.top = b[4]
+        w = max(b[3] - b[0], b[4] - b[1], 1e-9)
+        # pixels per mm
+        self.scale = size / w
+        m = GrblPreview.margin
+        self.width = int(np.ceil((b[3] - b[0]) * self.scale)) + 2 * m + 1
+        self.height = int(np.ceil((b[4] - b[1]) * self.scale)) + 2 * m + 1
+
+    # converts mm to pixel columns and rows (Y down)
+    def toPixels(self, x, y) -> tuple:
+        m = GrblPreview.margin
+        return (m + (x - self.left) * self.scale, m + (self.top - y) * self.scale)
+
+    # the lines (x0, y0, x1, y1 in mm) drawn for the rows, arcs being split
+    # into lines about two pixels long
+    def getLines(self, rows) -> tuple:
+        mv = self.moves
+        arcs = mv["arcs"][rows]
+        count = np.ones(len(rows), dtype=np.int64)
+        if arcs.any():
+            a = rows[arcs]
+            length = np.abs(mv["sweep"][a]) * np.maximum(mv["r0"][a], mv["r1"][a]) * self.scale
+            count[arcs] = np.clip(np.ceil(length / 2), 1, 360).astype(np.int64)
+        src = np.repeat(rows, count)
+        first = np.cumsum(count) - count
+        k = np.arange(len(src)) - np.repeat(first, count)
+        c = np.repeat(count, count)
+        x0, y0 = mv["px"][src], mv["py"][src]
+        x1, y1 = mv["x"][src].copy(), mv["y"][src].copy()
+        arc = np.repeat(arcs, count)
+        if arc.any():
+            s = src[arc]
+            f0 = k[arc] / c[arc]
+            f1 = (k[arc] + 1) / c[arc]
+            cx, cy, a0, sweep, r0, r1 = [mv[p][s] for p in ["cx", "cy", "a0", "sweep", "r0", "r1"]]
+            ra = r0 + (r1 - r0) * f0
+            rb = r0 + (r1 - r0) * f1
+            x0[arc] = cx + ra * np.cos(a0 + sweep * f0)
+            y0[arc] = cy + ra * np.sin(a0 + sweep * f0)
+            last = f1 < 1
+            x1[arc] = np.where(last, cx + rb * np.cos(a0 + sweep * f1), x1[arc])
+            y1[arc] = np.where(last, cy + rb * np.sin(a0 + sweep * f1), y1[arc])
+        return (x0, y0, x1, y1)
+
+    # adds the lines (in pixels) to a coverage buffer, a pixel crossed by
+    # a line through its centre gets about 1. Lines are sampled every pixel
+    # (the shares of samples a pixel apart always add up to 1)
+    def drawLines(self, cover, x0, y0, x1, y1):
+        w, h = self.width, self.height
+        length = np.hypot(x1 - x0, y1 - y0)
+        n = np.ceil(length).astype(np.int64) + 1
+        weight = np.where(n > 1, length / np.maximum(n - 1, 1), 1.0).astype(np.float32)
+        total = np.cumsum(n)
+        s = 0
+        while s < len(n):
+            base = total[s - 1] if s else 0
+            e = max(int(np.searchsorted(total, base + GrblPreview.chunk_samples, side="right")), s + 1)
+            m = n[s:e]
+            idx = np.repeat(np.arange(s, e), m)
+            k = np.arange(len(idx)) - np.repeat(np.cumsum(m) - m, m)
+            t = (k / np.repeat(np.maximum(m - 1, 1), m)).astype(np.float32)
+            px = x0[idx].astype(np.float32) + (x1[idx] - x0[idx]).astype(np.float32) * t
+            py = y0[idx].astype(np.float32) + (y1[idx] - y0[idx]).astype(np.float32) * t
+            # (anything off the image is drawn along its edge)
+            px = np.clip(px, 0, w - 1.001)
+            py = np.clip(py, 0, h - 1.001)
+            ix = px.astype(np.int64)
+            iy = py.astype(np.int64)
+            fx = px - ix
+            fy = py - iy
+            wt = weight[idx]
+            at = iy * w + ix
+            cover += np.bincount(np.concatenate((at, at + 1, at + w, at + w + 1)),
+                                 np.concatenate(((1 - fx) * (1 - fy) * wt, fx * (1 - fy) * wt, (1 - fx) * fy * wt, fx * fy * wt)), minlength=w * h)
+            s = e
+
+    # the coverage (0 to 1) of each layer as (height, width) arrays
+    def getLayers(self) -> dict:
+        mv = self.moves
+        x, y, z, px, py, pz = [mv[p] for p in ["x", "y", "z", "px", "py", "pz"]]
+        known = mv["moves"] & ~np.isnan(x) & ~np.isnan(y) & ~np.isnan(px) & ~np.isnan(py)
+        across = (x != px) | (y != py) | mv["arcs"]
+        rapids = np.flatnonzero(known & across & (mv["motion"] == 0))
+        cuts = np.flatnonzero(known & across & (mv["motion"] > 0))
+        # plunging into the work without moving across
+        plunge = known & ~across & (mv["motion"] > 0) & (z < pz) & (z < 0)
+        plunge |= known & ((self.program.flags & GrblProgram.FLAG_PENETRATE) > 0)
+        pens = np.flatnonzero(plunge)
+        ret = {}
+        for name, rows in [("rapids", rapids), ("cuts", cuts)]:
+            cover = np.zeros(self.width * self.height)
+            x0, y0, x1, y1 = self.getLines(rows)
+            a = self.toPixels(x0, y0)
+            b = self.toPixels(x1, y1)
+            self.drawLines(cover, a[0], a[1], b[0], b[1])
+            ret[name] = np.clip(cover, 0, 1).reshape(self.height, self.width)
+        # a small circle (of 12 lines) around each penetration
+        cover = np.zeros(self.width * self.height)
+        if len(pens):
+            cx, cy = self.toPixels(x[pens], y[pens])
+            r = GrblPreview.penetrate_radius
+            a = np.linspace(0, 2 * np.pi, 13)
+            ox, oy = r * np.cos(a), r * np.sin(a)
+            self.drawLines(cover, (cx[:, None] + ox[:-1]).ravel(), (cy[:, None] + oy[:-1]).ravel(), (cx[:, None] + ox[1:]).ravel(), (cy[:, None] + oy[1:]).ravel())
+        ret["penetrations"] = np.clip(cover, 0, 1).reshape(self.height, self.width)
+        return ret
+
+    # returns the drawing as a (height, width, 3) array of uint8 RGB
+    def render(self) -> np.ndarray:
+        img = np.empty((self.height, self.width, 3))
+        img[:] = GrblPreview.background
+        layers = self.getLayers()
+        for name, colour in [("rapids", GrblPreview.rapid_colour), ("cuts", GrblPreview.cut_colour), ("penetrations", GrblPreview.penetrate_colour)]:
+            a = layers[name][:, :, None]
+            img = img * (1 - a) + np.array(colour, dtype=np.float64) * a
+        return np.rint(img).astype(np.uint8)
+
+    # writes a (height, width, 3) RGB (or (height, width) gray) uint8 image
+    # to an open binary file as a PNG
+    @staticmethod
+    def writePng(image, f):
+        a = np.ascontiguousarray(image, dtype=np.uint8)
+        if a.ndim not in (2, 3) or (a.ndim == 3 and a.shape[2] != 3):
+            raise ValueError("image must be (height, width, 3) RGB or (height, width) gray")
+        h, w = a.shape[:2]
+        colour = 2 if a.ndim == 3 else 0
+        # each row is prefixed with its filter type (0, none)
+        raw = np.zeros((h, 1 + w * (3 if colour else 1)), dtype=np.uint8)
+        raw[:, 1:] = a.reshape(h, -1)
+        def chunk(kind: bytes, data: bytes):
+            f.write(struct.pack(">I", len(data)))
+            f.write(kind + data)
+            f.write(struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+        f.write(b"\x89PNG\r\n\x1a\n")
+        chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, colour, 0, 0, 0))
+        chunk(b"IDAT", zlib.compress(raw.tobytes(), 6))
+        chunk(b"IEND", b"")
+
+    # draws the program and writes it to a PNG file
+    def burp(self, outpath: str):
+        image = self.render()
+        tmp = outpath + ".tmp"
+        with open(tmp, "wb") as f:
+            GrblPreview.writePng(image, f)
+        os.replace(tmp, outpath)
@@ -0,0 +1,521 @@
+# pylint: disable = line-too-long
+
+# pip3 install numpy
+from typing import List
+import os
+import json
+import numpy as np
+from gml.command import GrblConfig, GrblCommand
+
+
+class GrblProgram():
+    """
+        A columnar (NumPy) representation of a whole program of GrblCommands.
+        Each of the common parameters is held in its own column (NaN where
+        a command does not set it) alongside the block numbering of every
+        command, an index of where each block starts and ends and a table
+        of the modal state (X, Y, Z, F, S) just before each block starts,
+        so any range of blocks can be worked on without the rest.
+
+        Programs are saved in a versioned binary format (see save) which
+        is memory mapped when loaded, so even a very large program opens
+        in milliseconds and can be shared between processes without copying.
+    """
+    magic = b"GMLB"
+    version = 1
+    # the parameters held as columns (rows of vals)
+    params = ["G", "M", "X", "Y", "Z", "I", "J", "F", "S", "P"]
+    # the modal state recorded for each block
+    modal_params = ["X", "Y", "Z", "F", "S"]
+    # flags
+    FLAG_VISIBLE = 1
+    # the original line was annotated as a penetrate (see isPenetrate)
+    FLAG_PENETRATE = 2
+    # the row cuts into the work whatever its Z (see HeightMap.level and isLevelledCut)
+    FLAG_LEVELLED = 4
+    # arrays are aligned to this many bytes within a saved file
+    alignment = 64
+
+    def __init__(self, vals, intmask, flags, block, blockIndex, extras: dict = None, blocks=None, modal=None):
+        if vals.shape[0] != len(GrblProgram.params):
+            raise ValueError("vals must have a row for each of GrblProgram.params")
+        n = vals.shape[1]
+        for a in [intmask, flags, block, blockIndex]:
+            if len(a) != n: raise ValueError("every column must be the same length")
+        # (params, n) float64, NaN where not set
+        self.vals = vals
+        # bit k is set when params[k] was an integer (ie. G01 or Z1 rather than Z1.0)
+        self.intmask = intmask
+        self.flags = flags
+        self.block = block
+        self.blockIndex = blockIndex
+        # {row: {param: value}} for comments, rarely used parameters and
+        # any non numeric values
+        self.extras = extras or {}
+        if blocks is None: blocks = self.calculateBlocks()
+        self.blocks = blocks
+        if modal is None: modal = self.calculateModal()
+        self.modal = modal
+        # (block bounds, program bounds) worked out when first needed
+        # and forgotten whenever the columns are changed (see setMasked)
+        self.bounds = None
+
+    def getLength(self) -> int:
+        return self.vals.shape[1]
+
+    def getBlockCount(self) -> int:
+        return self.blocks.shape[0]
+
+    def getColumn(self, param: str):
+        return self.vals[GrblProgram.params.index(param)]
+
+    # returns the (start, end) rows (end exclusive) of the given block
+    def getBlockRange(self, blockNum: int) -> tuple:
+        if blockNum < 0 or blockNum >= self.getBlockCount():
+            raise ValueError("no such block " + str(blockNum))
+        return (int(self.blocks[blockNum, 0]), int(self.blocks[blockNum, 1]))
+
+    # the (start, end) rows of each contiguous run of commands which are in a block
+    def calculateBlocks(self):
+        inblock = self.blockIndex > -1
+        if not inblock.any():
+            return np.zeros((0, 2), dtype=np.int64)
+        prev = np.concatenate(([False], inblock[:-1]))
+        starts = np.flatnonzero(inblock & (~prev | (self.blockIndex == 0)))
+        nxt = np.concatenate((inblock[1:], [False]))
+        nextstart = np.zeros(len(inblock), dtype=bool)
+        nextstart[starts[1:] - 1] = True
+        ends = np.flatnonzero(inblock & (~nxt | nextstart)) + 1
+        return np.stack((starts, ends), axis=1).astype(np.int64)
+
+    # for each column returns the row index of the last row (at or before
+    # each row) which sets it, or -1
+    @staticmethod
+    def lastSet(col):
+        idx = np.where(np.isnan(col), -1, np.arange(len(col)))
+        return np.maximum.accumulate(idx) if len(idx) else idx
+
+    # the modal state just before each block starts (NaN if never set)
+    def calculateModal(self):
+        ret = np.full((self.getBlockCount(), len(GrblProgram.modal_params)), np.nan)
+        if not self.getBlockCount():
+            return ret
+        before = self.blocks[:, 0] - 1
+        valid = before >= 0
+        for k, p in enumerate(GrblProgram.modal_params):
+            col = self.getColumn(p)
+            last = GrblProgram.lastSet(col)
+            rows = np.where(valid, last[np.maximum(before, 0)], -1)
+            ret[:, k] = np.where(rows >= 0, col[np.maximum(rows, 0)], np.nan)
+        return ret
+
+    # the value of a column at each row, carried on from the last row
+    # which set it (NaN before any row does)
+    @staticmethod
+    def getModal(col) -> np.ndarray:
+        last = GrblProgram.lastSet(col)
+        return np.where(last >= 0, col[np.maximum(last, 0)], np.nan)
+
+    # the geometry of the move made by each row as a dict of columns
+    #   motion: the modal G00 to G03 (NaN if none yet)
+    #   x, y, z: the position after the row, px, py, pz: before it
+    #   moves: the row sets X, Y or Z (and a motion is in force)
+    #   arcs: G02 or G03 moves which give I and J (from a known start)
+    #   cx, cy, r0, r1, a0: centre, start and end radius and start angle of arcs
+    #   sweep: the signed sweep of arcs (radians, anticlockwise positive)
+    # Moves are assumed to be absolute (G90) in the XY plane
+    def getMoves(self) -> dict:
+        params = GrblProgram.params
+        vals = self.vals
+        g = vals[params.index("G")]
+        sx, sy, sz, si, sj = [vals[params.index(p)] for p in ["X", "Y", "Z", "I", "J"]]
+        shift = lambda a: np.concatenate(([np.nan], a[:-1]))
+        motion = GrblProgram.getModal(np.where(np.isin(g, [0, 1, 2, 3]), g, np.nan))
+        x = GrblProgram.getModal(sx)
+        y = GrblProgram.getModal(sy)
+        z = GrblProgram.getModal(sz)
+        px, py, pz = shift(x), shift(y), shift(z)
+        moves = ~(np.isnan(sx) & np.isnan(sy) & np.isnan(sz)) & ~np.isnan(motion)
+        arcs = moves & (motion > 1) & ~np.isnan(si) & ~np.isnan(sj) & ~np.isnan(px) & ~np.isnan(py)
+        cx = np.where(arcs, px + np.nan_to_num(si), np.nan)
+        cy = np.where(arcs, py + np.nan_to_num(sj), np.nan)
+        a0 = np.arctan2(py - cy, px - cx)
+        a1 = np.arctan2(y - cy, x - cx)
+        ccw = np.mod(a1 - a0, 2 * np.pi)
+        cw = np.mod(a0 - a1, 2 * np.pi)
+        # start and end in the same place is a full circle
+        ccw[ccw < 1e-9] = 2 * np.pi
+        cw[cw < 1e-9] = 2 * np.pi
+        return {
+            "motion": motion, "x": x, "y": y, "z": z, "px": px, "py": py, "pz": pz,
+            "moves": moves, "arcs": arcs, "cx": cx, "cy": cy, "a0": a0,
+            "r0": np.hypot(px - cx, py - cy), "r1": np.hypot(x - cx, y - cy),
+            "sweep": np.where(motion == 3, ccw, -cw)
+        }
+
+    # the extent of the move made by each row as (6, rows) min X, Y, Z
+    # then max X, Y, Z (NaN where unknown). Arcs include the furthest
+    # points of their circle which they pass through. moves is getMoves()
+    # (if already worked out)
+    def getRowBounds(self, moves: dict = None) -> np.ndarray:
+        m = moves or self.getMoves()
+        ret = np.full((6, self.getLength()), np.nan)
+        moves = m["moves"]
+        for k, p in enumerate(["x", "y", "z"]):
+            ret[k, moves] = ret[k + 3, moves] = m[p][moves]
+        arcs = m["arcs"]
+        if arcs.any():
+            a0, sweep = m["a0"][arcs], m["sweep"][arcs]
+            cx, cy, r = m["cx"][arcs], m["cy"][arcs], m["r0"][arcs]
+            lo = ret[:2, arcs]
+            hi = ret[3:5, arcs]
+            for k in range(4):
+                t = k * np.pi / 2
+                passes = np.where(sweep > 0, np.mod(t - a0, 2 * np.pi) <= sweep, np.mod(a0 - t, 2 * np.pi) <= -sweep)
+                ex = np.where(passes, cx + r * round(np.cos(t)), np.nan)
+                ey = np.where(passes, cy + r * round(np.sin(t)), np.nan)
+                lo = np.fmin(lo, [ex, ey])
+                hi = np.fmax(hi, [ex, ey])
+            ret[:2, arcs] = lo
+            ret[3:5, arcs] = hi
+        return ret
+
+    # works out (and caches) the bounds of every block and of the whole
+    # program in one pass over the rows (see getBlockBounds and getBounds)
+    def calculateBounds(self, moves: dict = None) -> tuple:
+        rows = self.getRowBounds(moves)
+        n = self.getLength()
+        whole = np.full(6, np.nan)
+        if n:
+            whole[:3] = np.fmin.reduce(rows[:3], axis=1)
+            whole[3:] = np.fmax.reduce(rows[3:], axis=1)
+        blocks = np.full((self.getBlockCount(), 6), np.nan)
+        if self.getBlockCount():
+            # reduce over [start, end) of each block (and discard the gaps between)
+            padded = np.concatenate((rows, np.full((6, 1), np.nan)), axis=1)
+            edges = self.blocks.reshape(-1)
+            blocks[:, :3] = np.fmin.reduceat(padded[:3], edges, axis=1)[:, ::2].T
+            blocks[:, 3:] = np.fmax.reduceat(padded[3:], edges, axis=1)[:, ::2].T
+        self.bounds = (blocks, whole)
+        return self.bounds
+
+    # (blocks, 6) min X, Y, Z then max X, Y, Z of each block
+    def getBlockBounds(self) -> np.ndarray:
+        return (self.bounds or self.calculateBounds())[0]
+
+    # min X, Y, Z then max X, Y, Z of every move in the program
+    def getBounds(self) -> np.ndarray:
+        return (self.bounds or self.calculateBounds())[1]
+
+    # the numbers of the blocks which go outside the envelope, given as
+    # (min X, min Y, min Z, max X, max Y, max Z)
+    def getBlocksOutside(self, envelope) -> np.ndarray:
+        lo, hi = GrblProgram.checkEnvelope(envelope)
+        b = self.getBlockBounds()
+        return np.flatnonzero(np.any(b[:, :3] < lo, axis=1) | np.any(b[:, 3:] > hi, axis=1))
+
+    # describes where bounds (see getBounds) go outside the envelope, or
+    # returns None if they don't (NaN bounds, ie. no Z, are never outside)
+    @staticmethod
+    def getOutside(bounds, envelope) -> str:
+        lo, hi = GrblProgram.checkEnvelope(envelope)
+        b = np.asarray(bounds, dtype=np.float64)
+        if not (np.any(b[:3] < lo) or np.any(b[3:] > hi)):
+            return None
+        msg = "program goes outside the machine envelope:"
+        for k, p in enumerate(["X", "Y", "Z"]):
+            if b[k] < lo[k] or b[k + 3] > hi[k]:
+                msg += " " + p + " " + GrblCommand.floatToStr(float(b[k]), 4) + " to " + GrblCommand.floatToStr(float(b[k + 3]), 4)
+                msg += " (limit " + GrblCommand.floatToStr(float(lo[k]), 4) + " to " + GrblCommand.floatToStr(float(hi[k]), 4) + ")"
+        return msg
+
+    @staticmethod
+    def checkEnvelope(envelope) -> tuple:
+        e = np.asarray(envelope, dtype=np.float64) if envelope is not None else None
+        if e is None or e.shape != (6,) or np.any(np.isnan(e)):
+            raise ValueError("envelope must be (min x, min y, min z, max x, max y, max z)")
+        if np.any(e[:3] > e[3:]):
+            raise ValueError("envelope minimums must not be more than its maximums")
+        return (e[:3], e[3:])
+
+    # raises a ValueError describing where the program goes outside the
+    # envelope (see getBlocksOutside). The envelope defaults to the
+    # machine_envelope of the config (and there is nothing to check without one)
+    def validateEnvelope(self, envelope=None, config: GrblConfig = None):
+        if envelope is None:
+            if not config: config = GrblConfig.current()
+            envelope = config.machine_envelope
+            if envelope is None: return
+        msg = GrblProgram.getOutside(self.getBounds(), envelope)
+        if not msg: return
+        outside = self.getBlocksOutside(envelope)
+        if len(outside):
+            msg += " in blocks " + ", ".join(str(v) for v in outside[:10].tolist()) + (" ..." if len(outside) > 10 else "")
+        raise ValueError(msg)
+
+    @staticmethod
+    def fromCommands(commands: GrblCommand) -> 'GrblProgram':
+        if not commands:
+            raise ValueError("must supply some commands")
+        params = GrblProgram.params
+        rows = []
+        intmask = []
+        flags = []
+        block = []
+        blockIndex = []
+        extras = {}
+        c = commands.getFirst()
+        r = 0
+        while c:
+            row = [np.nan] * len(params)
+            mask = 0
+            extra = None
+            for l, v in c.vals.items():
+                if GrblCommand.isNone(v): continue
+                if l in params and isinstance(v, (int, float)) and not isinstance(v, bool):
+                    k = params.index(l)
+                    row[k] = v
+                    if isinstance(v, int): mask |= 1 << k
+                else:
+                    if not extra: extra = {}
+                    extra[l] = v
+            if extra: extras[r] = extra
+            f = 0
+            if c.visible: f |= GrblProgram.FLAG_VISIBLE
+            if c.line and "Penetrate" in c.line: f |= GrblProgram.FLAG_PENETRATE
+            if c.isLevelledCut(): f |= GrblProgram.FLAG_LEVELLED
+            rows.append(row)
+            intmask.append(mask)
+            flags.append(f)
+            block.append(c.block)
+            blockIndex.append(c.blockIndex)
+            r += 1
+            c = c.getNext()
+        vals = np.array(rows, dtype=np.float64).T.copy()
+        return GrblProgram(vals, np.array(intmask, dtype=np.uint16), np.array(flags, dtype=np.uint8),
+                           np.array(block, dtype=np.int32), np.array(blockIndex, dtype=np.int32), extras)
+
+    # returns the value of a single parameter of a single row as
+    # GrblCommand would hold it (int, float, str or None)
+    def getValue(self, row: int, param: str) -> any:
+        e = self.extras.get(row)
+        if e and param in e: return e[param]
+        if param not in GrblProgram.params: return None
+        k = GrblProgram.params.index(param)
+        v = self.vals[k, row]
+        if np.isnan(v): return None
+        if self.intmask[row] & (1 << k): return int(v)
+        return float(v)
+
+    # rebuilds a linked chain of GrblCommands from rows start to end
+    def toCommands(self, config: GrblConfig = None, start: int = 0, end: int = None) -> GrblCommand:
+        if end is None: end = self.getLength()
+        if start >= end:
+            raise ValueError("no commands to convert")
+        if not config: config = GrblConfig.current()
+        params = GrblProgram.params
+        # convert to python values a column at a time
+        cols = [self.vals[k, start:end].tolist() for k in range(len(params))]
+        intmask = self.intmask[start:end].tolist()
+        flags = self.flags[start:end].tolist()
+        block = self.block[start:end].tolist()
+        blockIndex = self.blockIndex[start:end].tolist()
+        ret = None
+        for i in range(end - start):
+            c = GrblCommand("", config)
+            v = c.vals
+            m = intmask[i]
+            for k, p in enumerate(params):
+                x = cols[k][i]
+                if x == x:
+                    v[p] = int(x) if m & (1 << k) else x
+            e = self.extras.get(start + i)
+            if e: v.update(e)
+            c.visible = bool(flags[i] & GrblProgram.FLAG_VISIBLE)
+            if flags[i] & GrblProgram.FLAG_PENETRATE: c.line = "(Penetrate)"
+            elif flags[i] & GrblProgram.FLAG_LEVELLED: c.line = "(Levelled cut)"
+            if ret:
+                ret = ret.appendObject(c)
+            else:
+                ret = c
+            c.block = block[i]
+            c.blockIndex = blockIndex[i]
+        return ret.getFirst()
+
+    # the transforms which may be applied to ranges of rows in place
+    # (see gml.shared.SharedProgram)
+    transforms = ["translate", "rotate", "scale", "dilate"]
+
+    # a (view of a) column for rows start to end
+    def getSlice(self, param: str, start: int = 0, end: int = None):
+        return self.vals[GrblProgram.params.index(param), start:end]
+
+    # sets values of a column where mask is True. Values only remain
+    # integers if they were integers and every operand was an integer
+    def setMasked(self, param: str, start: int, end: int, mask, values, operands):
+        k = GrblProgram.params.index(param)
+        col = self.vals[k, start:end]
+        col[mask] = values[mask]
+        self.bounds = None
+        if not all(isinstance(o, int) for o in operands):
+            im = self.intmask[start:end]
+            im[mask] &= np.uint16(~(1 << k) & 0xFFFF)
+
+    # rows start to end which may be changed (all of them, or only those in blocks)
+    def getRowMask(self, start: int, end: int, blocksOnly: bool):
+        if blocksOnly:
+            return self.blockIndex[start:end] > -1
+        return np.ones(len(self.blockIndex[start:end]), dtype=bool)
+
+    # rows start to end which set both X and Y (and those which also set I and J)
+    def getXYMasks(self, start: int, end: int, blocksOnly: bool = False) -> tuple:
+        xy = ~np.isnan(self.getSlice("X", start, end)) & ~np.isnan(self.getSlice("Y", start, end)) & self.getRowMask(start, end, blocksOnly)
+        ij = xy & ~np.isnan(self.getSlice("I", start, end)) & ~np.isnan(self.getSlice("J", start, end))
+        return (xy, ij)
+
+    # The following work in place on rows start to end exactly as the
+    # GrblCommand methods of the same name do on each command
+    # blocksOnly leaves rows which are not in a block alone
+    def translate(self, x, y, start: int = 0, end: int = None, blocksOnly: bool = False) -> 'GrblProgram':
+        rows = self.getRowMask(start, end, blocksOnly)
+        xs = self.getSlice("X", start, end)
+        ys = self.getSlice("Y", start, end)
+        self.setMasked("X", start, end, ~np.isnan(xs) & rows, xs + x, [x])
+        self.setMasked("Y", start, end, ~np.isnan(ys) & rows, ys + y, [y])
+        return self
+
+    def rotate(self, angle, x, y, start: int = 0, end: int = None, blocksOnly: bool = False) -> 'GrblProgram':
+        xy, ij = self.getXYMasks(start, end, blocksOnly)
+        a = np.radians(angle)
+        co = np.cos(a)
+        si = np.sin(a)
+        xs = self.getSlice("X", start, end)
+        ys = self.getSlice("Y", start, end)
+        rx = x + co * (xs - x) - si * (ys - y)
+        ry = y + si * (xs - x) + co * (ys - y)
+        ai = xs + self.getSlice("I", start, end)
+        aj = ys + self.getSlice("J", start, end)
+        ax = x + co * (ai - x) - si * (aj - y)
+        ay = y + si * (ai - x) + co * (aj - y)
+        self.setMasked("I", start, end, ij, ax - rx, [0.5])
+        self.setMasked("J", start, end, ij, ay - ry, [0.5])
+        self.setMasked("X", start, end, xy, rx, [0.5])
+        self.setMasked("Y", start, end, xy, ry, [0.5])
+        return self
+
+    def scale(self, units, start: int = 0, end: int = None, blocksOnly: bool = False) -> 'GrblProgram':
+        xy, ij = self.getXYMasks(start, end, blocksOnly)
+        xs = self.getSlice("X", start, end)
+        ys = self.getSlice("Y", start, end)
+        nx = xs * units
+        ny = ys * units
+        self.setMasked("I", start, end, ij, nx - ((xs - self.getSlice("I", start, end)) * units), [units])
+        self.setMasked("J", start, end, ij, ny - ((ys - self.getSlice("J", start, end)) * units), [units])
+        self.setMasked("X", start, end, xy, nx, [units])
+        self.setMasked("Y", start, end, xy, ny, [units])
+        return self
+
+    def dilate(self, units, centreX, centreY, start: int = 0, end: int = None, blocksOnly: bool = False) -> 'GrblProgram':
+        xy, ij = self.getXYMasks(start, end, blocksOnly)
+        ops = [units, centreX, centreY]
+        xs = self.getSlice("X", start, end)
+        ys = self.getSlice("Y", start, end)
+        nx = centreX + ((xs - centreX) * units)
+        ny = centreY + ((ys - centreY) * units)
+        ncx = centreX + (((xs - self.getSlice("I", start, end)) - centreX) * units)
+        ncy = centreY + (((ys - self.getSlice("J", start, end)) - centreY) * units)
+        self.setMasked("I", start, end, ij, nx - ncx, ops)
+        self.setMasked("J", start, end, ij, ny - ncy, ops)
+        self.setMasked("X", start, end, xy, nx, ops)
+        self.setMasked("Y", start, end, xy, ny, ops)
+        return self
+
+    # the (start, end) rows covering blocks first to last (exclusive)
+    def getBlocksRange(self, first: int, last: int) -> tuple:
+        if first >= last:
+            raise ValueError("must supply at least one block")
+        return (int(self.blocks[first, 0]), int(self.blocks[last - 1, 1]))
+
+    # a copy of this program held entirely in (private) memory
+    def copy(self) -> 'GrblProgram':
+        return GrblProgram(self.vals.copy(), self.intmask.copy(), self.flags.copy(), self.block.copy(),
+                           self.blockIndex.copy(), dict(self.extras), self.blocks.copy(), self.modal.copy())
+
+    # writes the program as GCODE text (via a chain of GrblCommands)
+    # programs outside the config's machine_envelope are not written
+    def burp(self, outpath: str, config: GrblConfig = None):
+        self.validateEnvelope(None, config)
+        with open(outpath, "w") as f:
+            self.toCommands(config).write(f)
+
+    def getArrays(self) -> dict:
+        return {
+            "vals": self.vals, "intmask": self.intmask, "flags": self.flags,
+            "block": self.block, "blockIndex": self.blockIndex,
+            "blocks": self.blocks, "modal": self.modal
+        }
+
+    # File format (all little endian):
+    #   magic "GMLB", uint32 version, uint64 header length
+    #   a JSON header describing the dtype, shape and offset of each array plus the extras
+    #   the raw array data, each array aligned to GrblProgram.alignment bytes
+    def save(self, path: str):
+        arrays = {k: np.ascontiguousarray(a) for k, a in self.getArrays().items()}
+        # work out the offsets assuming the largest possible header size, then pad the header to it
+        desc = {}
+        header = {"version": GrblProgram.version, "params": GrblProgram.params, "arrays": desc,
+                  "extras": {str(k): v for k, v in self.extras.items()}}
+        for k, a in arrays.items():
+            desc[k] = {"dtype": a.dtype.newbyteorder("<").str, "shape": list(a.shape), "offset": 0}
+        offset = GrblProgram.align(16 + len(json.dumps(header).encode("utf-8")) + 32 * len(arrays))
+        for k, a in arrays.items():
+            desc[k]["offset"] = offset
+            offset = GrblProgram.align(offset + a.nbytes)
+        h = json.dumps(header).encode("utf-8")
+        start = desc[next(iter(desc))]["offset"] if desc else 16 + len(h)
+        if 16 + len(h) > start:
+            raise ValueError("header is larger than expected")
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(GrblProgram.magic)
+            f.write(np.array([GrblProgram.version], dtype="<u4").tobytes())
+            f.write(np.array([len(h)], dtype="<u8").tobytes())
+            f.write(h)
+            for k, a in arrays.items():
+                f.write(b"\0" * (desc[k]["offset"] - f.tell()))
+                f.write(memoryview(a.astype(a.dtype.newbyteorder("<"), copy=False)).cast("B"))
+        os.replace(tmp, path)
+
+    @staticmethod
+    def align(offset: int) -> int:
+        a = GrblProgram.alignment
+        return ((offset + a - 1) // a) * a
+
+    # loads a saved program. With mmap the arrays are read only views
+    # of the file (pages are only read when used), otherwise they are
+    # read into memory
+    @staticmethod
+    def load(path: str, mmap: bool = True) -> 'GrblProgram':
+        with open(path, "rb") as f:
+            if f.read(4) != GrblProgram.magic:
+                raise ValueError(path + " is not a GML binary program")
+            version = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+            if version != GrblProgram.version:
+                raise ValueError("unsupported GML binary program version " + str(version))
+            hlen = int(np.frombuffer(f.read(8), dtype="<u8")[0])
+            header = json.loads(f.read(hlen).decode("utf-8"))
+        if header["params"] != GrblProgram.params:
+            raise ValueError("GML binary program has different parameter columns")
+        if mmap:
+            buf = np.memmap(path, dtype=np.uint8, mode="r")
+        else:
+            buf = np.fromfile(path, dtype=np.uint8)
+        arrays = {}
+        for k, d in header["arrays"].items():
+            dt = np.dtype(d["dtype"])
+            count = int(np.prod(d["shape"])) if d["shape"] else 1
+            a = buf[d["offset"]:d["offset"] + count * dt.itemsize].view(dt).reshape(d["shape"])
+            arrays[k] = a
+        extras = {int(k): v for k, v in header["extras"].items()}
+        return GrblProgram(arrays["vals"], arrays["intmask"], arrays["flags"], arrays["block"], arrays["blockIndex"],
+                           extras, arrays["blocks"], arrays["modal"])
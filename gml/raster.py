@@ -0,0 +1,248 @@
+# pylint: disable = line-too-long
+
+# pip3 install numpy (and pillow to read image files)
+import os
+import numpy as np
+from gml.command import GrblConfig, GrblCommand
+from gml.program import GrblProgram
+
+
+class GrblRaster():
+    """
+        Engraves a grayscale image with a laser a row of pixels at a time,
+        alternately left to right and right to left so the head never
+        travels back across the image empty, setting the laser power (S)
+        by how dark each pixel is.
+
+        Neighbouring pixels of the same power are merged into a single move,
+        blank (white) pixels either end of a row are skipped, long stretches
+        of them within a row are crossed by a rapid move and blank rows are
+        skipped altogether. The image is converted with NumPy array
+        operations into the runs of pixels to burn, which are then written
+        out directly (see burp) or as a columnar GrblProgram (see toProgram)
+        without ever building a chain of GrblCommands.
+
+        The bottom left corner of the image is at X0 Y0, pixel_size is the
+        width and height of each pixel (mm). Cuts are made at cut_speed and
+        full power (black) is spindle_rpm (GRBL's $30 setting).
+    """
+    # the number of different powers used, pixels are rounded to the nearest
+    levels = 256
+    # blank stretches within a row shorter than this (mm) are burnt at zero
+    # power rather than crossed by a rapid move
+    min_gap = 1.0
+    # the most runs formatted at once when writing (see write)
+    chunk_runs = 1000000
+
+    def __init__(self, image, pixel_size: float = 0.1, config: GrblConfig = None):
+        if not pixel_size or pixel_size <= 0:
+            raise ValueError("pixel_size must be positive")
+        if not config: config = GrblConfig.current()
+        self.config = config
+        self.pixel_size = pixel_size
+        self.image = GrblRaster.toGray(image)
+        self.calculateRuns()
+
+    # reads an image file (anything pillow can open) into a grayscale array
+    @staticmethod
+    def loadImage(inpath: str) -> np.ndarray:
+        from PIL import Image
+        with Image.open(inpath) as im:
+            if im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info):
+                return GrblRaster.toGray(np.asarray(im.convert("RGBA")))
+            return GrblRaster.toGray(np.asarray(im.convert("L")))
+
+    # returns a (height, width) array of floats from 0 (black) to 1 (white)
+    # from an array of integers (0 to the largest value of the type),
+    # floats (0 to 1) or booleans, colour (RGB or RGBA) images are converted
+    # by luminance and transparent pixels are white
+    @staticmethod
+    def toGray(image) -> np.ndarray:
+        a = np.asarray(image)
+        if a.ndim not in (2, 3) or not a.size:
+            raise ValueError("image must be a (height, width) or (height, width, channels) array")
+        if a.dtype == bool:
+            a = a.astype(np.float64)
+        elif np.issubdtype(a.dtype, np.integer):
+            a = a / float(np.iinfo(a.dtype).max)
+        else:
+            a = np.clip(a.astype(np.float64), 0, 1)
+        if a.ndim == 3:
+            alpha = None
+            if a.shape[2] in (2, 4):
+                alpha = a[:, :, -1]
+                a = a[:, :, :-1]
+            a = a[:, :, 0] if a.shape[2] == 1 else a[:, :, :3] @ np.array([0.299, 0.587, 0.114])
+            if alpha is not None:
+                a = a * alpha + (1 - alpha)
+        return a
+
+    # works out the runs of pixels to burn, in the order they are burnt
+    # row (from the top), start and end (pixel columns, end exclusive, end
+    # before start when burnt right to left) and power level (0 for gaps
+    # burnt at zero power) plus whether a rapid move is needed to get to it
+    def calculateRuns(self):
+        h, w = self.image.shape
+        level = np.rint((1 - self.image) * (GrblRaster.levels - 1)).astype(np.int64)
+        # a run starts wherever the power changes along a row
+        change = np.ones((h, w), dtype=bool)
+        change[:, 1:] = level[:, 1:] != level[:, :-1]
+        r, c0 = np.nonzero(change)
+        p = level[r, c0]
+        last = np.ones(len(r), dtype=bool)
+        last[:-1] = r[1:] != r[:-1]
+        c1 = np.where(last, w, np.roll(c0, -1))
+        # blank runs are only kept when short and between runs to burn
+        burn = p > 0
+        count = np.cumsum(burn)
+        rowStart = np.flatnonzero(np.concatenate(([True], r[1:] != r[:-1])))
+        before = count - burn - np.repeat(count[rowStart] - burn[rowStart], np.diff(np.append(rowStart, len(r))))
+        after = np.repeat(count[np.append(rowStart[1:], len(r)) - 1], np.diff(np.append(rowStart, len(r)))) - count
+        keep = burn | ((before > 0) & (after > 0) & ((c1 - c0) * self.pixel_size < GrblRaster.min_gap))
+        r, c0, c1, p = r[keep], c0[keep], c1[keep], p[keep]
+        # every other row which is burnt is burnt right to left
+        # (the runs are in order along each row so those rows are reversed)
+        newRow = np.concatenate(([True], r[1:] != r[:-1]))
+        rowStart = np.flatnonzero(newRow)
+        size = np.diff(np.append(rowStart, len(r)))
+        back = np.repeat(np.arange(len(rowStart)) % 2 == 1, size)
+        first = np.repeat(rowStart, size)
+        order = np.arange(len(r))
+        order = np.where(back, 2 * first + np.repeat(size, size) - 1 - order, order)
+        r, c0, c1, p = r[order], c0[order], c1[order], p[order]
+        self.row = r
+        self.start = np.where(back, c1, c0)
+        self.end = np.where(back, c0, c1)
+        self.level = p
+        # rapid to the start of each row and across long gaps
+        self.rapid = np.ones(len(r), dtype=bool)
+        self.rapid[1:] = (r[1:] != r[:-1]) | (self.start[1:] != self.end[:-1])
+
+    def getRunCount(self) -> int:
+        return len(self.row)
+
+    # the S value for each level
+    def getPowers(self) -> np.ndarray:
+        return np.rint(self.level * (self.config.spindle_rpm / (GrblRaster.levels - 1))).astype(np.int64)
+
+    # the Y (mm) of the middle of each row
+    def getY(self, row) -> np.ndarray:
+        return (self.image.shape[0] - row - 0.5) * self.pixel_size
+
+    # the commands before and after the runs as (G, M, S) and the lines written for them
+    def getHeader(self) -> list:
+        return [((21, None, None), "G21"), ((90, None, None), "G90"), ((None, 4, 0), "M04 S00")]
+
+    def getFooter(self) -> list:
+        return [((None, 5, None), "M05"), ((0, None, None), "G00 X0.0 Y0.0"), ((None, 2, None), "M02")]
+
+    # returns the runs as a columnar program, a rapid (G00) move to the start
+    # of each row or gap followed by a G01 for each run. Each G00 starts a block
+    def toProgram(self) -> GrblProgram:
+        cfg = self.config
+        params = GrblProgram.params
+        head = self.getHeader()
+        foot = self.getFooter()
+        n = self.getRunCount()
+        # the row each run's G01 goes in, after its G00 (if any)
+        cut = len(head) + np.arange(n) + np.cumsum(self.rapid)
+        rapid = cut[self.rapid] - 1
+        total = len(head) + n + int(self.rapid.sum()) + len(foot)
+        vals = np.full((len(params), total), np.nan)
+        intmask = np.zeros(total, dtype=np.uint16)
+        G, M, X, Y, F, S = [params.index(p) for p in ["G", "M", "X", "Y", "F", "S"]]
+        for rows, cmds in [(np.arange(len(head)), head), (np.arange(total - len(foot), total), foot)]:
+            for i, ((g, m, s), _) in zip(rows.tolist(), cmds):
+                for k, v in [(G, g), (M, m), (S, s)]:
+                    if v is None: continue
+                    vals[k, i] = v
+                    intmask[i] |= 1 << k
+        vals[X, total - 2] = vals[Y, total - 2] = 0.0
+        vals[G, rapid] = 0
+        vals[X, rapid] = self.start[self.rapid] * self.pixel_size
+        vals[Y, rapid] = self.getY(self.row[self.rapid])
+        intmask[rapid] |= 1 << G
+        vals[G, cut] = 1
+        vals[X, cut] = self.end * self.pixel_size
+        vals[S, cut] = self.getPowers()
+        intmask[cut] |= (1 << G) | (1 << S)
+        if n:
+            vals[F, cut[0]] = cfg.cut_speed
+            if isinstance(cfg.cut_speed, int): intmask[cut[0]] |= 1 << F
+        # each rapid starts a block which runs up to the next
+        block = np.full(total, -1, dtype=np.int32)
+        blockIndex = np.full(total, -1, dtype=np.int32)
+        inblock = np.zeros(total, dtype=bool)
+        inblock[rapid] = True
+        inblock[cut] = True
+        starts = np.zeros(total, dtype=bool)
+        starts[rapid] = True
+        number = np.cumsum(starts) - 1
+        block[inblock] = number[inblock]
+        first = np.flatnonzero(starts)
+        # (an image with nothing to burn has no blocks)
+        if len(first):
+            blockIndex[inblock] = (np.arange(total) - first[np.maximum(number, 0)])[inblock]
+        # commands after the last block carry its number (see setPrevious)
+        block[~inblock] = np.maximum(number[~inblock], 0)
+        flags = np.full(total, GrblProgram.FLAG_VISIBLE, dtype=np.uint8)
+        return GrblProgram(vals, intmask, flags, block, blockIndex)
+
+    # writes the program to an open text file a chunk of runs at a time,
+    # returning the number of lines written. Every X, Y and S written is one
+    # of a few thousand values so each is formatted once and the lines are
+    # put together with object array operations
+    def write(self, f) -> int:
+        cfg = self.config
+        dp = cfg.max_dp
+        h, w = self.image.shape
+        text = lambda a: np.array([GrblCommand.floatToStr(v, dp) for v in a.tolist()], dtype=object)
+        xs = text(np.arange(w + 1) * self.pixel_size)
+        ys = text(self.getY(np.arange(h)))
+        levels = np.arange(GrblRaster.levels)
+        ss = np.array([str(v).zfill(2) for v in np.rint(levels * (cfg.spindle_rpm / (GrblRaster.levels - 1))).astype(np.int64).tolist()], dtype=object)
+        ret = 0
+        for _, line in self.getHeader():
+            f.write(line + "\n")
+            ret += 1
+        for s in range(0, self.getRunCount(), GrblRaster.chunk_runs):
+            e = min(s + GrblRaster.chunk_runs, self.getRunCount())
+            rapid = self.rapid[s:e]
+            cuts = "G01 X" + xs[self.end[s:e]] + " S" + ss[self.level[s:e]]
+            # the feed rate is set by the first cut
+            if not s: cuts[0] += " F" + str(cfg.cut_speed)
+            rapids = "G00 X" + xs[self.start[s:e][rapid]] + " Y" + ys[self.row[s:e][rapid]] + " (block start)"
+            lines = np.empty(e - s + len(rapids), dtype=object)
+            at = np.arange(e - s) + np.cumsum(rapid)
+            lines[at] = cuts
+            lines[at[rapid] - 1] = rapids
+            f.write("\n".join(lines.tolist()) + "\n")
+            ret += len(lines)
+        for _, line in self.getFooter():
+            f.write(line + "\n")
+            ret += 1
+        return ret
+
+    # raises a ValueError if the image goes outside the envelope (defaults
+    # to the config's machine_envelope). Every move is within the image
+    # (and the laser never moves Z) so only its extent needs checking
+    def validateEnvelope(self, envelope=None):
+        if envelope is None:
+            envelope = self.config.machine_envelope
+            if envelope is None: return
+        h, w = self.image.shape
+        msg = GrblProgram.getOutside([0.0, 0.0, np.nan, w * self.pixel_size, h * self.pixel_size, np.nan], envelope)
+        if msg: raise ValueError(msg)
+
+    # images outside the config's machine_envelope are not written
+    def burp(self, outpath: str) -> int:
+        self.validateEnvelope()
+        tmp = outpath + ".tmp"
+        with open(tmp, "w") as f:
+            ret = self.write(f)
+        os.replace(tmp, outpath)
+        return ret
+
+    # the commands as a linked chain (slow for large images, see toProgram)
+    def toCommands(self) -> GrblCommand:
+        return self.toProgram().toCommands(self.config)
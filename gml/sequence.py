@@ -0,0 +1,191 @@
+# pylint: disable = line-too-long
+
+
+class CommandSequence():
+    """
+        An index over a chain of GrblCommands so that the first and last
+        commands, the length of the chain, the index of a command and the
+        command at an index can be found without walking the chain.
+
+        The chain is split into chunks (lists of commands) and the sizes of
+        the chunks are kept in a Fenwick tree, so the index of a command
+        (the number of commands in the chunks before its own plus its row)
+        and the command at an index are both found in O(log n).
+
+        The links between the commands (next and previous) are still what
+        makes the chain. Whenever a link changes (see GrblCommand.setNext
+        and setPrevious) the chunks of the command and of the one it linked
+        to are marked as broken and, when next needed, each run of broken
+        chunks is refilled by walking from the end of the chunk before it to
+        the start of the chunk after it, so an edit only costs the chunks it
+        touches. Only when a run no longer fits in as many chunks (between
+        one and twice chunk_size commands each) are the chunks split up
+        again and the tree rebuilt.
+    """
+    # the commands in each chunk when the chunks are split up
+    chunk_size = 256
+
+    def __init__(self, first):
+        # lists of commands, the Fenwick tree of their sizes and the number of commands
+        self.chunks = []
+        self.tree = [0]
+        self.length = 0
+        # {id(chunk): position in chunks}
+        self.numbers = {}
+        # ids of chunks in which a link has changed
+        self.broken = set()
+        # a sequence which can no longer be repaired (see repair)
+        self.dead = False
+        self.chunks = self.toChunks(self.walk(first, None))
+        self.rebuild()
+
+    # returns the (repaired) sequence of the chain holding command,
+    # indexing the chain afresh if need be, or None if command can't be
+    # reached from the start of its chain (ie. has been deleted)
+    @staticmethod
+    def get(command) -> 'CommandSequence':
+        s = command.sequence
+        if s and not s.dead:
+            if s.broken: s.repair()
+            if not s.dead and s.contains(command): return s
+        first = command
+        while first.previous:
+            first = first.previous
+        s = CommandSequence(first)
+        return s if s.contains(command) else None
+
+    # whether command is indexed (at its place) in this sequence
+    def contains(self, command) -> bool:
+        if command.sequence is not self: return False
+        chunk = command.sequenceChunk
+        if id(chunk) not in self.numbers: return False
+        return command.sequenceRow < len(chunk) and chunk[command.sequenceRow] is command
+
+    # marks the chunk of command as broken (its links are changing)
+    def breakChunk(self, command):
+        if not self.dead: self.broken.add(id(command.sequenceChunk))
+
+    # the commands from start up to (not including) stop, claiming them from
+    # any other sequence (which can no longer be trusted if it still had
+    # them in an unbroken chunk). Returns None if stop is never reached
+    def walk(self, start, stop) -> list:
+        ret = []
+        c = start
+        while c is not stop:
+            if not c: return None
+            s = c.sequence
+            if s and s is not self and s.contains(c) and id(c.sequenceChunk) not in s.broken: s.dead = True
+            ret.append(c)
+            c = c.next
+        return ret
+
+    # fills each of chunks (in place) with an equal share of commands
+    def fill(self, chunks: list, commands: list):
+        n = len(commands)
+        m = len(chunks)
+        for k, chunk in enumerate(chunks):
+            chunk[:] = commands[k * n // m:(k + 1) * n // m]
+            for row, c in enumerate(chunk):
+                c.sequence = self
+                c.sequenceChunk = chunk
+                c.sequenceRow = row
+
+    # splits commands into chunks of (about) chunk_size
+    def toChunks(self, commands: list) -> list:
+        count = -(-len(commands) // CommandSequence.chunk_size)
+        ret = [[] for k in range(count)]
+        self.fill(ret, commands)
+        return ret
+
+    # refills each run of broken chunks
+    def repair(self):
+        if self.dead or not self.broken: return
+        ks = sorted(self.numbers[b] for b in self.broken if b in self.numbers)
+        self.broken = set()
+        n = len(self.chunks)
+        resized = []
+        r = 0
+        while r < len(ks):
+            k = e = ks[r]
+            while r < len(ks) and ks[r] == e:
+                e += 1
+                r += 1
+            # the links out of the unbroken chunks either side are unchanged
+            stop = self.chunks[e][0] if e < n else None
+            if k > 0:
+                start = self.chunks[k - 1][-1].next
+            elif stop:
+                start = stop
+                while start.previous:
+                    start = start.previous
+            else:
+                self.dead = True
+                return
+            commands = self.walk(start, stop)
+            if commands is None:
+                self.dead = True
+                return
+            m = e - k
+            if m <= len(commands) <= 2 * CommandSequence.chunk_size * m:
+                self.fill(self.chunks[k:e], commands)
+                for j in range(k, e):
+                    self.setSize(j, len(self.chunks[j]))
+            else:
+                resized.append((k, e, commands))
+        if not resized: return
+        for k, e, commands in reversed(resized):
+            self.chunks[k:e] = self.toChunks(commands)
+        self.rebuild()
+
+    # works out the position of each chunk and the tree of their sizes
+    def rebuild(self):
+        self.numbers = {id(c): k for k, c in enumerate(self.chunks)}
+        n = len(self.chunks)
+        self.tree = [0] * (n + 1)
+        for k, c in enumerate(self.chunks):
+            self.tree[k + 1] += len(c)
+            p = (k + 1) + ((k + 1) & -(k + 1))
+            if p <= n: self.tree[p] += self.tree[k + 1]
+        self.length = sum(len(c) for c in self.chunks)
+
+    # sets the size the tree holds for chunk k
+    def setSize(self, k: int, size: int):
+        delta = size - (self.getOffset(k + 1) - self.getOffset(k))
+        if not delta: return
+        self.length += delta
+        k += 1
+        while k < len(self.tree):
+            self.tree[k] += delta
+            k += k & -k
+
+    # the number of commands in the chunks before chunk k
+    def getOffset(self, k: int) -> int:
+        ret = 0
+        while k > 0:
+            ret += self.tree[k]
+            k -= k & -k
+        return ret
+
+    def getFirst(self):
+        return self.chunks[0][0]
+
+    def getLast(self):
+        return self.chunks[-1][-1]
+
+    def getLength(self) -> int:
+        return self.length
+
+    def getIndex(self, command) -> int:
+        return self.getOffset(self.numbers[id(command.sequenceChunk)]) + command.sequenceRow
+
+    def getAt(self, index: int):
+        if index < 0 or index >= self.length: return None
+        # descend the tree to the chunk holding index
+        k = 0
+        bit = 1 << (len(self.tree) - 1).bit_length()
+        while bit:
+            if k + bit < len(self.tree) and self.tree[k + bit] <= index:
+                k += bit
+                index -= self.tree[k]
+            bit >>= 1
+        return self.chunks[k][index]
@@ -0,0 +1,116 @@
+# pylint: disable = line-too-long
+
+from typing import List
+import os
+import concurrent.futures
+from multiprocessing import shared_memory
+import numpy as np
+from gml.program import GrblProgram
+
+
+class SharedProgram():
+    """
+        A GrblProgram whose columns live in a multiprocessing.shared_memory
+        segment, so worker processes can attach to it by name and transform
+        disjoint ranges of blocks in place. Nothing but a small handle
+        (segment name and array layout) is ever pickled, however large the
+        program, and the parent sees the workers' changes directly.
+
+        with SharedProgram.create(program) as shared:
+            shared.transformBlocks("rotate", [45, 0, 0])
+            shared.program.burp("out.nc")
+
+        The columns of shared.program are only valid until the segment is
+        closed, use shared.program.copy() to keep them.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, layout: dict, extras: dict, owner: bool):
+        self.shm = shm
+        self.layout = layout
+        self.owner = owner
+        arrays = {}
+        for k, (dtype, shape, offset) in layout.items():
+            dt = np.dtype(dtype)
+            count = int(np.prod(shape)) if shape else 1
+            arrays[k] = np.ndarray(shape, dtype=dt, buffer=shm.buf, offset=offset) if count else np.zeros(shape, dtype=dt)
+        self.program = GrblProgram(arrays["vals"], arrays["intmask"], arrays["flags"], arrays["block"], arrays["blockIndex"],
+                                   extras, arrays["blocks"], arrays["modal"])
+
+    # copies the program into a new shared memory segment
+    @staticmethod
+    def create(program: GrblProgram) -> 'SharedProgram':
+        if not program:
+            raise ValueError("must supply a program")
+        layout = {}
+        offset = 0
+        arrays = program.getArrays()
+        for k, a in arrays.items():
+            layout[k] = (a.dtype.str, tuple(a.shape), offset)
+            offset = GrblProgram.align(offset + a.nbytes)
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        ret = SharedProgram(shm, layout, program.extras, True)
+        for k, a in arrays.items():
+            getattr(ret.program, k)[...] = a
+        return ret
+
+    # the (picklable) description of the segment passed to workers
+    def getHandle(self) -> tuple:
+        return (self.shm.name, self.layout)
+
+    # attaches (in a worker process) to a segment created by create()
+    # extras are not shared, workers only ever see the numeric columns
+    @staticmethod
+    def attach(handle: tuple) -> 'SharedProgram':
+        name, layout = handle
+        return SharedProgram(shared_memory.SharedMemory(name=name), layout, None, False)
+
+    def close(self):
+        # drop the views before closing the mapping
+        self.program = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self) -> 'SharedProgram':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # runs in a worker: applies a GrblProgram transform to rows start to end
+    @staticmethod
+    def runTransform(handle: tuple, start: int, end: int, name: str, args: list) -> int:
+        shared = SharedProgram.attach(handle)
+        try:
+            getattr(shared.program, name)(*args, start=start, end=end, blocksOnly=True)
+        finally:
+            shared.close()
+        return end - start
+
+    # splits the blocks into (start, end) row ranges of about the same number of rows
+    def getRanges(self, parts: int) -> List[tuple]:
+        blocks = self.program.blocks
+        if not len(blocks):
+            return []
+        parts = max(1, min(parts, len(blocks)))
+        # cut at the blocks nearest to equal shares of the rows in blocks
+        sizes = np.cumsum(blocks[:, 1] - blocks[:, 0])
+        cuts = np.searchsorted(sizes, sizes[-1] * np.arange(1, parts) / parts)
+        edges = np.unique(np.concatenate(([0], cuts + 1, [len(blocks)])))
+        edges = edges[edges <= len(blocks)]
+        return [self.program.getBlocksRange(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+    # applies a GrblProgram transform (see GrblProgram.transforms) to the
+    # rows of every block, fanning ranges of blocks out to a process pool
+    # rows which are not in a block (headers, footers etc.) are left alone
+    def transformBlocks(self, name: str, args: list, workers: int = None, parts: int = None) -> 'SharedProgram':
+        if name not in GrblProgram.transforms:
+            raise ValueError("unknown transform '" + name + "' (must be one of " + ", ".join(GrblProgram.transforms) + ")")
+        if not parts: parts = (workers or os.cpu_count() or 1) * 4
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(SharedProgram.runTransform, self.getHandle(), s, e, name, list(args)) for s, e in self.getRanges(parts)]
+            for f in futures:
+                f.result()
+        # the workers changed the columns behind the program's back
+        self.program.bounds = None
+        return self
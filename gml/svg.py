@@ -0,0 +1,138 @@
+# pylint: disable = line-too-long
+
+# pip3 install numpy
+import os
+import numpy as np
+from gml.command import GrblConfig
+from gml.program import GrblProgram
+
+
+class GrblSvg():
+    """
+        Writes a program out as an SVG drawing, a chunk of rows at a time
+        so that even a program of millions of moves never has the whole
+        document in memory.
+
+        Each block's cuts become a single <path> (arcs as real SVG arcs) in
+        a "cuts" layer drawn the width of the tool, and every rapid (G00)
+        move is drawn as a thin line in a "rapids" layer above it. The
+        viewBox is the bounds of the program (see GrblProgram.getBounds)
+        and Y is flipped so the drawing is the right way up.
+    """
+    # the most rows turned into path data at once
+    chunk_rows = 200000
+    # space (mm) left around the bounds of the program
+    margin = 1.0
+    cut_style = 'fill="none" stroke="black" stroke-linecap="round" stroke-linejoin="round"'
+    rapid_style = 'fill="none" stroke="red" stroke-width="0.1" stroke-dasharray="0.5,0.5"'
+
+    # formats an array of numbers to at most dp decimal places (as an object
+    # array of str so they can be joined with + like the rest of the path data)
+    @staticmethod
+    def toStr(v, dp: int) -> np.ndarray:
+        return np.array(["%.12g" % f for f in np.round(v, dp).tolist()], dtype=object)
+
+    # writes the program as SVG to an open text file, returning the number
+    # of paths written
+    @staticmethod
+    def write(program: GrblProgram, f, config: GrblConfig = None) -> int:
+        if not config: config = GrblConfig.current()
+        dp = config.max_dp
+        moves = program.getMoves()
+        if program.bounds is None: program.calculateBounds(moves)
+        b = program.getBounds()
+        if np.isnan(b[[0, 1, 3, 4]]).any():
+            b = np.zeros(6)
+        m = GrblSvg.margin + config.tool_diameter / 2
+        x0, y0 = b[0] - m, b[1] - m
+        w, h = b[3] - b[0] + 2 * m, b[4] - b[1] + 2 * m
+        s = lambda v: GrblSvg.toStr(np.array([v]), dp)[0]
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<svg xmlns="http://www.w3.org/2000/svg" width="' + s(w) + 'mm" height="' + s(h) + 'mm" viewBox="' + " ".join([s(x0), s(-(y0 + h)), s(w), s(h)]) + '">\n')
+        f.write('<g transform="scale(1,-1)">\n')
+        ret = 0
+        f.write('<g id="cuts" ' + GrblSvg.cut_style + ' stroke-width="' + s(config.tool_diameter) + '">\n')
+        ret += GrblSvg.writeCuts(program, moves, f, dp)
+        f.write('</g>\n<g id="rapids" ' + GrblSvg.rapid_style + '>\n')
+        ret += GrblSvg.writeRapids(moves, f, dp)
+        f.write('</g>\n</g>\n</svg>\n')
+        return ret
+
+    # the cutting moves of each block as a path of its own (and those
+    # between blocks as paths of their own)
+    @staticmethod
+    def writeCuts(program: GrblProgram, moves: dict, f, dp: int) -> int:
+        x, y, px, py = moves["x"], moves["y"], moves["px"], moves["py"]
+        rows = np.flatnonzero(moves["moves"] & (moves["motion"] > 0) & ~np.isnan(px) & ~np.isnan(py) & ~np.isnan(x) & ~np.isnan(y))
+        # moving only in Z draws nothing
+        rows = rows[(x[rows] != px[rows]) | (y[rows] != py[rows]) | moves["arcs"][rows]]
+        if not len(rows): return 0
+        # rows outside blocks carry the number of the block before them
+        inblock = program.blockIndex[rows] > -1
+        key = np.where(inblock, program.block[rows], -2 - program.block[rows].astype(np.int64))
+        start = np.ones(len(rows), dtype=bool)
+        start[1:] = key[1:] != key[:-1]
+        end = np.ones(len(rows), dtype=bool)
+        end[:-1] = start[1:]
+        # a move is needed wherever a cut doesn't carry on from the last
+        jump = start.copy()
+        jump[1:] |= (px[rows[1:]] != x[rows[:-1]]) | (py[rows[1:]] != y[rows[:-1]])
+        for s in range(0, len(rows), GrblSvg.chunk_rows):
+            e = min(s + GrblSvg.chunk_rows, len(rows))
+            r = rows[s:e]
+            d = GrblSvg.getSegments(moves, r, dp)
+            j = jump[s:e]
+            d[j] = "M" + GrblSvg.toStr(px[r[j]], dp) + " " + GrblSvg.toStr(py[r[j]], dp) + " " + d[j]
+            st = start[s:e]
+            ids = np.where(inblock[s:e][st], ' id="block' + program.block[r[st]].astype(str).astype(object) + '"', "")
+            d[st] = "<path" + ids + ' d="' + d[st]
+            d = np.where(end[s:e], d + '"/>\n', d + " ")
+            f.write("".join(d.tolist()))
+        return int(start.sum())
+
+    # the path data of each row (a line or arcs to its end)
+    @staticmethod
+    def getSegments(moves: dict, r, dp: int) -> np.ndarray:
+        x, y = moves["x"][r], moves["y"][r]
+        ret = "L" + GrblSvg.toStr(x, dp) + " " + GrblSvg.toStr(y, dp)
+        arcs = moves["arcs"][r]
+        if not arcs.any(): return ret
+        a = r[arcs]
+        sweep = moves["sweep"][a]
+        rad = GrblSvg.toStr(moves["r1"][a], dp)
+        large = np.where(np.abs(sweep) > np.pi, " 0 1 ", " 0 0 ")
+        flag = np.where(sweep > 0, "1 ", "0 ")
+        end = GrblSvg.toStr(moves["x"][a], dp) + " " + GrblSvg.toStr(moves["y"][a], dp)
+        arc = "A" + rad + " " + rad + large + flag + end
+        # a full circle is drawn as two halves (an arc can't end where it starts)
+        full = np.abs(np.abs(sweep) - 2 * np.pi) < 1e-9
+        if full.any():
+            mx = 2 * moves["cx"][a][full] - moves["x"][a][full]
+            my = 2 * moves["cy"][a][full] - moves["y"][a][full]
+            half = "A" + rad[full] + " " + rad[full] + " 0 0 " + flag[full]
+            arc[full] = half + GrblSvg.toStr(mx, dp) + " " + GrblSvg.toStr(my, dp) + " " + half + end[full]
+        ret[arcs] = arc
+        return ret
+
+    # every rapid (G00) move across the work as a line, a path per chunk
+    @staticmethod
+    def writeRapids(moves: dict, f, dp: int) -> int:
+        x, y, px, py = moves["x"], moves["y"], moves["px"], moves["py"]
+        rows = np.flatnonzero(moves["moves"] & (moves["motion"] == 0) & ~np.isnan(px) & ~np.isnan(py) & ~np.isnan(x) & ~np.isnan(y))
+        rows = rows[(x[rows] != px[rows]) | (y[rows] != py[rows])]
+        ret = 0
+        for s in range(0, len(rows), GrblSvg.chunk_rows):
+            r = rows[s:s + GrblSvg.chunk_rows]
+            d = "M" + GrblSvg.toStr(px[r], dp) + " " + GrblSvg.toStr(py[r], dp) + " L" + GrblSvg.toStr(x[r], dp) + " " + GrblSvg.toStr(y[r], dp)
+            f.write('<path d="' + " ".join(d.tolist()) + '"/>\n')
+            ret += 1
+        return ret
+
+    # writes the program to an SVG file, returning the number of paths written
+    @staticmethod
+    def burp(program: GrblProgram, outpath: str, config: GrblConfig = None) -> int:
+        tmp = outpath + ".tmp"
+        with open(tmp, "w") as f:
+            ret = GrblSvg.write(program, f, config)
+        os.replace(tmp, outpath)
+        return ret
@@ -0,0 +1,518 @@
+# pylint: disable = line-too-long
+
+# pip3 install numpy
+from typing import List
+import re
+import math
+import xml.etree.ElementTree as ET
+import numpy as np
+from gml.command import GrblConfig
+from gml.program import GrblProgram
+from gml.offset import PathOffset
+
+
+class GrblSvgReader():
+    """
+        Reads the shapes of an SVG drawing (paths, rects, circles, ellipses,
+        lines, polylines and polygons, through any transforms) straight into
+        a columnar program, a block for each subpath, without writing or
+        parsing any GCODE text along the way.
+
+        The file is read an element at a time (each is dropped once read)
+        and the segments of shapes are converted in chunks with NumPy:
+        lines stay lines, circular arcs become G02 and G03 arcs and béziers
+        (and elliptical arcs) are split into as few lines as keep within
+        tolerance (mm) of the curve.
+
+        Coordinates are converted to mm using the width, height and viewBox
+        of the drawing (numbers without units are taken as mm) and flipped
+        so that the bottom left of the page is X0 Y0.
+    """
+    # the furthest (mm) a line may stray from the curve it replaces
+    tolerance = 0.01
+    # the most lines a single curve is split into
+    max_segments = 1000
+    # the most segments converted at once
+    chunk_segments = 100000
+    # mm per unit
+    units = {"mm": 1.0, "cm": 10.0, "in": 25.4, "pt": 25.4 / 72, "pc": 25.4 / 6, "px": 25.4 / 96, "": 1.0}
+    # elements whose contents are never drawn
+    hidden = ["defs", "clipPath", "mask", "symbol", "marker", "pattern", "metadata", "title", "desc", "style", "script"]
+    # the segments recorded for an element, each a row of the kind and up to
+    # four points (user units)
+    LINE = 0
+    CUBIC = 1
+    # centre, radii, rotation (radians), start angle and sweep
+    ARC = 2
+    token = re.compile(r"[MmZzLlHhVvCcSsQqTtAa]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+    transform = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+    number = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+
+    def __init__(self, config: GrblConfig = None):
+        if not config: config = GrblConfig.current()
+        self.config = config
+        self.paths = []
+        self.records = []
+        self.subpath = []
+        self.sub = 0
+        self.matrix = None
+
+    # reads the svg file into a columnar program
+    @staticmethod
+    def read(inpath: str, config: GrblConfig = None) -> GrblProgram:
+        reader = GrblSvgReader(config)
+        reader.parse(inpath)
+        return GrblSvgReader.toProgram(reader.paths, reader.config)
+
+    # reads every shape in the file into self.paths (PathOffsets in mm)
+    def parse(self, inpath: str):
+        # (matrix, visible, skipped) of each open element
+        stack = []
+        for event, el in ET.iterparse(inpath, events=("start", "end")):
+            tag = el.tag.rsplit("}", 1)[-1]
+            if event == "end":
+                stack.pop()
+                el.clear()
+                continue
+            if not stack:
+                stack.append((GrblSvgReader.getRootMatrix(el), True, False))
+                continue
+            m, visible, skipped = stack[-1]
+            style = GrblSvgReader.getStyle(el)
+            if skipped or tag in GrblSvgReader.hidden or style.get("display") == "none":
+                stack.append((m, False, True))
+                continue
+            if el.get("transform"):
+                m = m @ GrblSvgReader.parseTransform(el.get("transform"))
+            if style.get("visibility"):
+                visible = style["visibility"] == "visible"
+            stack.append((m, visible, False))
+            if visible and tag in ["path", "rect", "circle", "ellipse", "line", "polyline", "polygon"]:
+                # shapes are converted together until the transform changes
+                if self.matrix is not None and (len(self.records) >= GrblSvgReader.chunk_segments or (m is not self.matrix and not np.array_equal(m, self.matrix))):
+                    self.flush(self.matrix)
+                self.matrix = m
+                getattr(self, "add" + tag.capitalize())(el)
+                self.sub += 1
+        if self.matrix is not None: self.flush(self.matrix)
+
+    # the presentation attributes and style of an element as a dict
+    @staticmethod
+    def getStyle(el) -> dict:
+        ret = {k: el.get(k) for k in ["display", "visibility"] if el.get(k)}
+        for item in (el.get("style") or "").split(";"):
+            if ":" in item:
+                k, v = item.split(":", 1)
+                ret[k.strip()] = v.strip()
+        return ret
+
+    # returns (value, unit) of a length such as "210mm" (None if missing or a percentage)
+    @staticmethod
+    def parseLength(s: str) -> tuple:
+        if not s: return (None, "")
+        m = re.match(r"\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*([a-z%]*)", s)
+        if not m or m.group(2) == "%": return (None, "")
+        return (float(m.group(1)), m.group(2) if m.group(2) in GrblSvgReader.units else "")
+
+    def getNumber(self, el, name: str) -> float:
+        v = GrblSvgReader.parseLength(el.get(name))[0]
+        return v if v is not None else 0.0
+
+    # the matrix from the user units of the root svg element to mm with
+    # the bottom left of the page at 0, 0 (and Y up)
+    @staticmethod
+    def getRootMatrix(el) -> np.ndarray:
+        w, wu = GrblSvgReader.parseLength(el.get("width"))
+        h, hu = GrblSvgReader.parseLength(el.get("height"))
+        vb = [float(v) for v in GrblSvgReader.number.findall(el.get("viewBox") or "")]
+        if len(vb) != 4 or vb[2] <= 0 or vb[3] <= 0: vb = None
+        sx = GrblSvgReader.units[wu]
+        sy = GrblSvgReader.units[hu]
+        ox = oy = 0.0
+        if vb:
+            ox, oy = vb[0], vb[1]
+            if w: sx = w * sx / vb[2]
+            if h: sy = h * sy / vb[3]
+            # a viewBox without a size is in the units of the other side (or mm)
+            if not w and h: sx = sy
+            if not h and w: sy = sx
+        height = h * GrblSvgReader.units[hu] if h else (vb[3] * sy if vb else 0.0)
+        return np.array([[sx, 0, -ox * sx], [0, -sy, height + oy * sy], [0, 0, 1]])
+
+    # the matrix of an svg transform attribute
+    @staticmethod
+    def parseTransform(s: str) -> np.ndarray:
+        ret = np.eye(3)
+        for name, args in GrblSvgReader.transform.findall(s):
+            a = [float(v) for v in GrblSvgReader.number.findall(args)]
+            m = np.eye(3)
+            if name == "matrix" and len(a) == 6:
+                m = np.array([[a[0], a[2], a[4]], [a[1], a[3], a[5]], [0, 0, 1]])
+            elif name == "translate" and a:
+                m[0, 2] = a[0]
+                m[1, 2] = a[1] if len(a) > 1 else 0
+            elif name == "scale" and a:
+                m[0, 0] = a[0]
+                m[1, 1] = a[1] if len(a) > 1 else a[0]
+            elif name == "rotate" and a:
+                t = math.radians(a[0])
+                m = np.array([[math.cos(t), -math.sin(t), 0], [math.sin(t), math.cos(t), 0], [0, 0, 1]])
+                if len(a) == 3:
+                    m = np.array([[1, 0, a[1]], [0, 1, a[2]], [0, 0, 1]]) @ m @ np.array([[1, 0, -a[1]], [0, 1, -a[2]], [0, 0, 1]])
+            elif name == "skewX" and a:
+                m[0, 1] = math.tan(math.radians(a[0]))
+            elif name == "skewY" and a:
+                m[1, 0] = math.tan(math.radians(a[0]))
+            ret = ret @ m
+        return ret
+
+    # records segments (user units) of the current subpath
+    def addSegment(self, kind: int, values: list):
+        self.records.append([kind] + values + [0.0] * (8 - len(values)))
+        self.subpath.append(self.sub)
+
+    def addLine(self, el, x0=None, y0=None, x1=None, y1=None):
+        if x0 is None:
+            x0, y0, x1, y1 = [self.getNumber(el, k) for k in ["x1", "y1", "x2", "y2"]]
+        self.addSegment(GrblSvgReader.LINE, [x0, y0, x1, y1])
+
+    # an elliptical arc from its centre
+    def addEllipticalArc(self, cx, cy, rx, ry, phi, start, sweep):
+        self.addSegment(GrblSvgReader.ARC, [cx, cy, rx, ry, phi, start, sweep])
+
+    # an svg (endpoint) arc converted to its centre (SVG 1.1 F.6.5)
+    def addArc(self, x0, y0, rx, ry, angle, large, sweep, x1, y1):
+        rx, ry = abs(rx), abs(ry)
+        if rx < PathOffset.eps or ry < PathOffset.eps:
+            self.addLine(None, x0, y0, x1, y1)
+            return
+        if math.hypot(x1 - x0, y1 - y0) < PathOffset.eps: return
+        phi = math.radians(angle)
+        co, si = math.cos(phi), math.sin(phi)
+        dx, dy = (x0 - x1) / 2, (y0 - y1) / 2
+        x = co * dx + si * dy
+        y = -si * dx + co * dy
+        # radii too small to reach are scaled up
+        lam = (x * x) / (rx * rx) + (y * y) / (ry * ry)
+        if lam > 1:
+            rx *= math.sqrt(lam)
+            ry *= math.sqrt(lam)
+        num = rx * rx * ry * ry - rx * rx * y * y - ry * ry * x * x
+        den = rx * rx * y * y + ry * ry * x * x
+        k = math.sqrt(max(num, 0) / den) if den else 0
+        if large == sweep: k = -k
+        ccx = k * rx * y / ry
+        ccy = -k * ry * x / rx
+        cx = co * ccx - si * ccy + (x0 + x1) / 2
+        cy = si * ccx + co * ccy + (y0 + y1) / 2
+        t0 = math.atan2((y - ccy) / ry, (x - ccx) / rx)
+        t1 = math.atan2((-y - ccy) / ry, (-x - ccx) / rx)
+        dt = (t1 - t0) % (2 * math.pi)
+        if not sweep and dt > 0: dt -= 2 * math.pi
+        self.addEllipticalArc(cx, cy, rx, ry, phi, t0, dt)
+
+    # reads the commands of a path's d attribute
+    def addPath(self, el):
+        toks = GrblSvgReader.token.findall(el.get("d") or "")
+        i = 0
+        cmd = None
+        cx = cy = sx = sy = 0.0
+        # the last control point (for S and T)
+        lc = lq = None
+        n = len(toks)
+
+        def num() -> float:
+            nonlocal i
+            v = float(toks[i])
+            i += 1
+            return v
+
+        def flag() -> int:
+            # flags may run into the next number (ie. "a1 1 0 01 5 5")
+            nonlocal i
+            t = toks[i]
+            if len(t) > 1 and t[0] in "01":
+                toks[i] = t[1:]
+                return int(t[0])
+            i += 1
+            return int(float(t))
+
+        while i < n:
+            if toks[i].isalpha():
+                cmd = toks[i]
+                i += 1
+                if cmd in "Zz":
+                    if math.hypot(cx - sx, cy - sy) > PathOffset.eps:
+                        self.addLine(None, cx, cy, sx, sy)
+                    cx, cy = sx, sy
+                    lc = lq = None
+                    self.sub += 1
+                    continue
+            if cmd is None:
+                raise ValueError("path data must start with a move")
+            if i >= n or toks[i].isalpha():
+                continue
+            rel = cmd.islower()
+            ox, oy = (cx, cy) if rel else (0.0, 0.0)
+            c = cmd.upper()
+            try:
+                if c == "M":
+                    self.sub += 1
+                    cx, cy = ox + num(), oy + num()
+                    sx, sy = cx, cy
+                    # further pairs are lines
+                    cmd = "l" if rel else "L"
+                    lc = lq = None
+                    continue
+                if c == "L":
+                    x, y = ox + num(), oy + num()
+                    self.addLine(None, cx, cy, x, y)
+                elif c == "H":
+                    x, y = ox + num(), cy
+                    self.addLine(None, cx, cy, x, y)
+                elif c == "V":
+                    x, y = cx, (cy if rel else 0.0) + num()
+                    self.addLine(None, cx, cy, x, y)
+                elif c in "CS":
+                    if c == "C":
+                        x1, y1 = ox + num(), oy + num()
+                    else:
+                        x1, y1 = (2 * cx - lc[0], 2 * cy - lc[1]) if lc else (cx, cy)
+                    x2, y2, x, y = ox + num(), oy + num(), ox + num(), oy + num()
+                    self.addSegment(GrblSvgReader.CUBIC, [cx, cy, x1, y1, x2, y2, x, y])
+                    lc = (x2, y2)
+                    cx, cy = x, y
+                    lq = None
+                    continue
+                elif c in "QT":
+                    if c == "Q":
+                        qx, qy = ox + num(), oy + num()
+                    else:
+                        qx, qy = (2 * cx - lq[0], 2 * cy - lq[1]) if lq else (cx, cy)
+                    x, y = ox + num(), oy + num()
+                    # as the identical cubic
+                    self.addSegment(GrblSvgReader.CUBIC, [cx, cy, cx + 2 * (qx - cx) / 3, cy + 2 * (qy - cy) / 3, x + 2 * (qx - x) / 3, y + 2 * (qy - y) / 3, x, y])
+                    lq = (qx, qy)
+                    cx, cy = x, y
+                    lc = None
+                    continue
+                elif c == "A":
+                    rx, ry, angle = num(), num(), num()
+                    large, sweep = flag(), flag()
+                    x, y = ox + num(), oy + num()
+                    self.addArc(cx, cy, rx, ry, angle, large, sweep, x, y)
+                else:
+                    raise ValueError("unknown path command " + cmd)
+            except IndexError as e:
+                raise ValueError("path data ends part way through a command") from e
+            cx, cy = x, y
+            lc = lq = None
+        self.sub += 1
+
+    def addRect(self, el):
+        x, y, w, h = [self.getNumber(el, k) for k in ["x", "y", "width", "height"]]
+        if w <= 0 or h <= 0: return
+        rx = GrblSvgReader.parseLength(el.get("rx"))[0]
+        ry = GrblSvgReader.parseLength(el.get("ry"))[0]
+        if rx is None: rx = ry
+        if ry is None: ry = rx
+        rx = min(rx or 0.0, w / 2)
+        ry = min(ry or 0.0, h / 2)
+        self.sub += 1
+        corners = [(x + w - rx, y + ry, -math.pi / 2), (x + w - rx, y + h - ry, 0.0), (x + rx, y + h - ry, math.pi / 2), (x + rx, y + ry, math.pi)]
+        for k, (ccx, ccy, a) in enumerate(corners):
+            # the side leading to each corner then (if rounded) the corner
+            px, py = corners[k - 1][0] + rx * math.cos(a), corners[k - 1][1] + ry * math.sin(a)
+            qx, qy = ccx + rx * math.cos(a), ccy + ry * math.sin(a)
+            if math.hypot(qx - px, qy - py) > PathOffset.eps:
+                self.addLine(None, px, py, qx, qy)
+            if rx > 0 and ry > 0:
+                self.addEllipticalArc(ccx, ccy, rx, ry, 0.0, a, math.pi / 2)
+        self.sub += 1
+
+    def addCircle(self, el):
+        r = self.getNumber(el, "r")
+        self.addEllipse(el, r, r)
+
+    def addEllipse(self, el, rx=None, ry=None):
+        if rx is None:
+            rx, ry = self.getNumber(el, "rx"), self.getNumber(el, "ry")
+        if rx <= 0 or ry <= 0: return
+        cx, cy = self.getNumber(el, "cx"), self.getNumber(el, "cy")
+        self.sub += 1
+        self.addEllipticalArc(cx, cy, rx, ry, 0.0, 0.0, math.pi)
+        self.addEllipticalArc(cx, cy, rx, ry, 0.0, math.pi, math.pi)
+        self.sub += 1
+
+    def addPolyline(self, el, closed: bool = False):
+        v = [float(s) for s in GrblSvgReader.number.findall(el.get("points") or "")]
+        pts = list(zip(v[0::2], v[1::2]))
+        if closed and len(pts) > 2: pts.append(pts[0])
+        self.sub += 1
+        for (x0, y0), (x1, y1) in zip(pts[:-1], pts[1:]):
+            self.addLine(None, x0, y0, x1, y1)
+        self.sub += 1
+
+    def addPolygon(self, el):
+        self.addPolyline(el, True)
+
+    # converts the recorded segments to mm with the matrix m and adds a
+    # PathOffset for each subpath to self.paths
+    def flush(self, m: np.ndarray):
+        if not self.records: return
+        r = np.array(self.records)
+        sub = np.array(self.subpath)
+        self.records = []
+        self.subpath = []
+        kind = r[:, 0].astype(np.int64)
+        tol = GrblSvgReader.tolerance
+        apply = lambda x, y: (m[0, 0] * x + m[0, 1] * y + m[0, 2], m[1, 0] * x + m[1, 1] * y + m[1, 2])
+        det = m[0, 0] * m[1, 1] - m[0, 1] * m[1, 0]
+        # uniform scale, rotation and reflection keep circles circles
+        similar = abs(abs(m[0, 0]) - abs(m[1, 1])) < 1e-9 * max(abs(det), 1) and abs(m[0, 1] * m[0, 0] + m[1, 1] * m[1, 0]) < 1e-9 * max(abs(det), 1)
+        scale = math.sqrt(abs(det))
+        arc = kind == GrblSvgReader.ARC
+        cubic = kind == GrblSvgReader.CUBIC
+        circle = arc & similar & (np.abs(r[:, 3] - r[:, 4]) < PathOffset.eps)
+        ellipse = arc & ~circle
+        # the number of lines each segment becomes
+        count = np.ones(len(r), dtype=np.int64)
+        if cubic.any():
+            px, py = apply(r[cubic][:, [1, 3, 5, 7]], r[cubic][:, [2, 4, 6, 8]])
+            dd = np.maximum(np.hypot(px[:, 0] - 2 * px[:, 1] + px[:, 2], py[:, 0] - 2 * py[:, 1] + py[:, 2]),
+                            np.hypot(px[:, 1] - 2 * px[:, 2] + px[:, 3], py[:, 1] - 2 * py[:, 2] + py[:, 3]))
+            # a cubic strays at most 6 * dd / 8 / n^2 from its chords
+            count[cubic] = np.clip(np.ceil(np.sqrt(0.75 * dd / tol)), 1, GrblSvgReader.max_segments)
+        if ellipse.any():
+            rmax = np.maximum(r[ellipse, 3], r[ellipse, 4]) * np.linalg.norm(m[:2, :2], 2)
+            step = 2 * np.arccos(np.clip(1 - tol / np.maximum(rmax, tol), -1, 1))
+            count[ellipse] = np.clip(np.ceil(np.abs(r[ellipse, 7]) / np.maximum(step, 1e-9)), 1, GrblSvgReader.max_segments)
+        src = np.repeat(np.arange(len(r)), count)
+        k = np.arange(len(src)) - np.repeat(np.cumsum(count) - count, count) + 1
+        t = k / count[src]
+        s = r[src]
+        # the end of every line (or arc) in user units
+        ex, ey = s[:, 3].copy(), s[:, 4].copy()
+        c = cubic[src]
+        if c.any():
+            u = t[c]
+            a, b, d, e = (1 - u) ** 3, 3 * (1 - u) ** 2 * u, 3 * (1 - u) * u * u, u ** 3
+            cs = s[c]
+            ex[c] = a * cs[:, 1] + b * cs[:, 3] + d * cs[:, 5] + e * cs[:, 7]
+            ey[c] = a * cs[:, 2] + b * cs[:, 4] + d * cs[:, 6] + e * cs[:, 8]
+        a = arc[src]
+        if a.any():
+            cs = s[a]
+            th = cs[:, 6] + cs[:, 7] * t[a]
+            co, si = np.cos(cs[:, 5]), np.sin(cs[:, 5])
+            ux, uy = cs[:, 3] * np.cos(th), cs[:, 4] * np.sin(th)
+            ex[a] = cs[:, 1] + co * ux - si * uy
+            ey[a] = cs[:, 2] + si * ux + co * uy
+        # the start of each segment
+        sx, sy = r[:, 1].copy(), r[:, 2].copy()
+        if arc.any():
+            cs = r[arc]
+            co, si = np.cos(cs[:, 5]), np.sin(cs[:, 5])
+            ux, uy = cs[:, 3] * np.cos(cs[:, 6]), cs[:, 4] * np.sin(cs[:, 6])
+            sx[arc] = cs[:, 1] + co * ux - si * uy
+            sy[arc] = cs[:, 2] + si * ux + co * uy
+        ex, ey = apply(ex, ey)
+        sx, sy = apply(sx, sy)
+        out = np.full(len(src), PathOffset.LINE)
+        ccx = np.full(len(src), np.nan)
+        ccy = np.full(len(src), np.nan)
+        ci = circle[src]
+        if ci.any():
+            # angles increase anticlockwise unless the matrix mirrors them
+            ccw = (s[ci, 7] > 0) == (det > 0)
+            out[ci] = np.where(ccw, PathOffset.CCW, PathOffset.CW)
+            ccx[ci], ccy[ci] = apply(s[ci, 1], s[ci, 2])
+        # split into subpaths (a new one wherever a segment doesn't start where the last ended)
+        seg = sub[src]
+        first = np.ones(len(src), dtype=bool)
+        first[1:] = seg[1:] != seg[:-1]
+        starts = first & (k == 1)
+        gap = np.zeros(len(src), dtype=bool)
+        gap[1:] = (k[1:] == 1) & (np.hypot(sx[src[1:]] - ex[:-1], sy[src[1:]] - ey[:-1]) > PathOffset.gap_tolerance)
+        starts |= gap
+        # zero length lines are dropped
+        keep = (out != PathOffset.LINE) | (np.hypot(ex - np.where(k == 1, sx[src], np.roll(ex, 1)), ey - np.where(k == 1, sy[src], np.roll(ey, 1))) > PathOffset.eps)
+        edges = np.flatnonzero(starts).tolist() + [len(src)]
+        for p, q in zip(edges[:-1], edges[1:]):
+            kk = np.flatnonzero(keep[p:q]) + p
+            if not len(kk): continue
+            self.paths.append(PathOffset(np.concatenate(([sx[src[p]]], ex[kk])), np.concatenate(([sy[src[p]]], ey[kk])), out[kk], ccx[kk], ccy[kk]))
+
+    # builds a program cutting each path as a block (as sanitise lays them out)
+    @staticmethod
+    def toProgram(paths: List[PathOffset], config: GrblConfig = None) -> GrblProgram:
+        if not config: config = GrblConfig.current()
+        cfg = config
+        params = GrblProgram.params
+        G, M, X, Y, Z, I, J, F, S = [params.index(p) for p in ["G", "M", "X", "Y", "Z", "I", "J", "F", "S"]]
+        head = 3
+        foot = 4
+        n = np.array([p.getLength() for p in paths], dtype=np.int64)
+        # evacuate, rapid to the start, penetrate then cut
+        size = n + 3
+        base = head + np.cumsum(size) - size
+        total = head + int(size.sum()) + foot
+        vals = np.full((len(params), total), np.nan)
+        intmask = np.zeros(total, dtype=np.uint16)
+
+        def put(k: int, rows, v):
+            vals[k, rows] = v
+            if isinstance(v, int): intmask[rows] |= 1 << k
+
+        put(M, 0, 3)
+        put(S, 0, cfg.spindle_rpm)
+        put(G, 1, 21)
+        put(G, 2, 90)
+        evac = np.concatenate((base, [total - foot]))
+        put(G, evac, 0)
+        put(Z, evac, cfg.evacuation_height)
+        put(F, evac, cfg.fast_travel_speed)
+        put(M, total - 3, 5)
+        put(G, total - 2, 0)
+        put(X, total - 2, 0.0)
+        put(Y, total - 2, 0.0)
+        put(M, total - 1, 2)
+        rapid = base + 1
+        put(G, rapid, 0)
+        if len(paths):
+            vals[X, rapid] = [p.x[0] for p in paths]
+            vals[Y, rapid] = [p.y[0] for p in paths]
+        put(F, rapid, cfg.fast_travel_speed)
+        pen = base + 2
+        put(G, pen, 1)
+        put(Z, pen, cfg.depth_step)
+        put(F, pen, cfg.penetrate_speed)
+        cut = np.repeat(base + 3, n) + np.arange(int(n.sum())) - np.repeat(np.cumsum(n) - n, n)
+        if len(paths):
+            kind = np.concatenate([p.kind for p in paths])
+            ex = np.concatenate([p.x[1:] for p in paths])
+            ey = np.concatenate([p.y[1:] for p in paths])
+            sx = np.concatenate([p.x[:-1] for p in paths])
+            sy = np.concatenate([p.y[:-1] for p in paths])
+            cx = np.concatenate([p.cx for p in paths])
+            cy = np.concatenate([p.cy for p in paths])
+            vals[G, cut] = np.where(kind == PathOffset.CW, 2, np.where(kind == PathOffset.CCW, 3, 1))
+            intmask[cut] |= 1 << G
+            vals[X, cut] = ex
+            vals[Y, cut] = ey
+            arc = kind != PathOffset.LINE
+            vals[I, cut[arc]] = cx[arc] - sx[arc]
+            vals[J, cut[arc]] = cy[arc] - sy[arc]
+            put(F, base[n > 0] + 3, cfg.cut_speed)
+        block = np.zeros(total, dtype=np.int32)
+        blockIndex = np.full(total, -1, dtype=np.int32)
+        number = np.repeat(np.arange(len(paths)), size)
+        within = np.arange(int(size.sum())) - np.repeat(base - head, size)
+        rows = np.arange(head, total - foot)
+        block[rows] = number
+        blockIndex[rows] = np.where(within > 0, within - 1, -1)
+        # commands after the last block carry its number (see setPrevious)
+        block[total - foot:] = max(len(paths) - 1, 0)
+        flags = np.full(total, GrblProgram.FLAG_VISIBLE, dtype=np.uint8)
+        flags[pen] |= GrblProgram.FLAG_PENETRATE
+        return GrblProgram(vals, intmask, flags, block, blockIndex)
@@ -0,0 +1,117 @@
+# pylint: disable = line-too-long, broad-except
+
+from typing import List
+import os
+import time
+from gml.command import GrblConfig, GrblCommand
+from gml.pipeline import GrblPipeline
+
+
+class GrblWatch():
+    """
+        Reprocesses an .nc or .svg file whenever it changes, so an edit made
+        in Inkscape (or by hand) shows up in the output straight away.
+
+        The blocks of the last run are kept by key (see
+        GrblCommand.getBlockKey) and only the blocks which are new or have
+        changed are sanitised again (see GrblCommand.getCachedBlocks). The
+        leading transforms which give the same result block by block as on
+        the whole program (see block_local) are applied to each block as it
+        is sanitised and so are kept with it, the rest (and sorting and the
+        removal of duplicate blocks) are applied to the whole program, so
+        the output is just as Batch would write it.
+        Files are polled (no extra dependencies) every interval seconds.
+    """
+    # seconds between looking at the input files
+    interval = 0.25
+    # the block passes (see GrblCommand.block_passes) which only ever change
+    # the blocks themselves. Others (ie. translate) move the lines between
+    # blocks (the footer etc.) too when applied to the whole program
+    block_local = ["pointify", "despeckle"]
+
+    def __init__(self, infile: str, outfile: str, config: GrblConfig = None, transforms=None):
+        self.infile = infile
+        self.outfile = outfile
+        self.config = config or GrblConfig.current()
+        transforms = transforms or []
+        k = 0
+        while k < len(transforms) and transforms[k][0] in GrblWatch.block_local:
+            k += 1
+        # (name, [args]) applied to each block, then to the whole program
+        self.passes = transforms[:k]
+        self.transforms = transforms[k:]
+        # {key: sanitised block} of the last run
+        self.blocks = {}
+        # the modification time and size of the input when last processed
+        self.stamp = None
+
+    def getStamp(self) -> tuple:
+        st = os.stat(self.infile)
+        return (st.st_mtime_ns, st.st_size)
+
+    # processes the input if it has changed since it was last processed
+    # returning the result (see process) or None if it hasn't changed (or
+    # can't be read just now, ie. while it is being saved)
+    def poll(self) -> dict:
+        try:
+            stamp = self.getStamp()
+        except OSError:
+            return None
+        if stamp == self.stamp: return None
+        self.stamp = stamp
+        return self.process()
+
+    # reads, sanitises, transforms and writes the file. Never raises,
+    # returning a dict as Batch.processFile does (with the number of
+    # blocks and how many of them were reused from the last run)
+    def process(self) -> dict:
+        ret = {"infile": self.infile, "outfile": self.outfile, "ok": False, "cached": False, "seconds": 0.0, "lines": 0, "error": None, "blocks": 0, "reused": 0}
+        start = time.perf_counter()
+        try:
+            cfg = self.config
+            if self.infile.lower().endswith(".svg"):
+                commands = GrblCommand.fromSvg(self.infile, cfg)
+            else:
+                commands = GrblCommand.slurpFile(self.infile, cfg)
+            transforms = self.transforms
+            if cfg.auto_sanitise:
+                before = set(self.blocks)
+                commands = commands.sanitise(self.passes, self.blocks)
+                ret.update(commands.getMeta() or {})
+                ret["blocks"] = len(self.blocks)
+                ret["reused"] = len(before & set(self.blocks))
+            else:
+                transforms = self.passes + transforms
+            commands = GrblPipeline(transforms).run(commands, ret)
+            commands.burp(self.outfile)
+            ret["lines"] = commands.getFirst().getLength()
+            ret["ok"] = True
+        except Exception as e:
+            ret["error"] = type(e).__name__ + ": " + str(e)
+        ret["seconds"] = time.perf_counter() - start
+        return ret
+
+    @staticmethod
+    def report(r: dict) -> str:
+        if not r["ok"]:
+            return "FAIL {:8.3f}s  {} : {}\n".format(r["seconds"], r["infile"], r["error"])
+        return "OK   {:8.3f}s  {} -> {} ({} lines, {} of {} blocks reused)\n".format(r["seconds"], r["infile"], r["outfile"], r["lines"], r["reused"], r["blocks"])
+
+    # polls each of the watches (processing every file to begin with)
+    # passing each result to output, until interrupted or (if given)
+    # until rounds polls have been made
+    @staticmethod
+    def run(watches: List['GrblWatch'], interval: float = None, output=None, rounds: int = None):
+        if interval is None: interval = GrblWatch.interval
+        if not output: output = lambda r: print(GrblWatch.report(r), end="", flush=True)
+        n = 0
+        try:
+            while rounds is None or n < rounds:
+                for w in watches:
+                    r = w.poll()
+                    if r: output(r)
+                n += 1
+                if rounds is None or n < rounds:
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,54 @@
+# python -m unittest discover tests
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gml.batch import Batch
+
+# the same square twice, the second is removed as a duplicate
+SQUARE = """G00 X10 Y10
+G01 Z-0.250000 F100.0(Penetrate)
+G01 X20 Y10 F400
+G01 X20 Y20
+G01 X10 Y20
+G01 X10 Y10
+G00 Z1.000000
+"""
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.infile = os.path.join(self.dir.name, "a.nc")
+        with open(self.infile, "w") as f:
+            f.write("G21\nG00 Z1.000000\n" + SQUARE + "\n" + SQUARE)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    # a cached run reports (and writes) just as the first did
+    def testHitKeepsMeta(self):
+        outfile = os.path.join(self.dir.name, "a_.nc")
+        cachedir = os.path.join(self.dir.name, "cache")
+        results = []
+        for _ in range(2):
+            r = Batch.processFile(self.infile, outfile, None, [("merge", [])], cachedir)
+            self.assertTrue(r["ok"], r["error"])
+            with open(outfile) as f:
+                results.append((r, f.read()))
+        (cold, first), (hit, second) = results
+        self.assertFalse(cold["cached"])
+        self.assertTrue(hit["cached"])
+        self.assertEqual(1, cold["duplicates"])
+        self.assertIn("segments_before", cold)
+        for r in [cold, hit]:
+            del r["cached"], r["seconds"]
+        self.assertEqual(cold, hit)
+        self.assertEqual(first, second)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+# python -m unittest discover tests
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gml import GrblCommand
+from gml.offset import PathOffset
+from gml.fill import PathFill
+
+SQUARE = """G21
+G00 Z1.000000
+G00 X10 Y10
+
+G01 Z-0.250000 F100.0(Penetrate)
+G01 X20 Y10 F400
+G01 X20 Y20
+G01 X10 Y20
+G01 X10 Y10
+G00 Z1.000000
+"""
+
+
+def square(x, y, side) -> PathOffset:
+    return PathOffset([x, x + side, x + side, x, x], [y, y, y + side, y + side, y], [PathOffset.LINE] * 4, [0] * 4, [0] * 4)
+
+
+class TestFill(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.infile = os.path.join(self.dir.name, "a.nc")
+        with open(self.infile, "w") as f:
+            f.write(SQUARE)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    # lines 1mm apart across a 10mm square with a 4mm hole cut 84mm,
+    # none of it inside the hole, whatever their angle
+    def testHatch(self):
+        fill = PathFill([square(0, 0, 10), square(3, 3, 4)])
+        for angle in [0, 90]:
+            strands = fill.hatch(1.0, angle)
+            self.assertTrue(strands)
+            length = 0.0
+            for x, y in strands:
+                # every other move is a line, those between join the lines
+                length += float(np.sum(np.hypot(x[1::2] - x[::2], y[1::2] - y[::2])))
+                mx = (x[1:] + x[:-1]) / 2
+                my = (y[1:] + y[:-1]) / 2
+                self.assertFalse(np.any((mx > 3) & (mx < 7) & (my > 3) & (my < 7)))
+                # (the moves between lines may run along the edge)
+                self.assertTrue(np.all(fill.getInside(mx[::2], my[::2])))
+            self.assertAlmostEqual(84.0, length)
+
+    # the fill follows the outline as new blocks
+    def testProgram(self):
+        commands = GrblCommand.processGrbl(self.infile, os.path.join(self.dir.name, "a_.nc"))
+        filled = commands.hatch(1.0)
+        b = filled.toProgram().getBlockBounds()
+        self.assertGreater(len(b), 1)
+        self.assertEqual([10, 10, 20, 20], [b[0][0], b[0][1], b[0][3], b[0][4]])
+        for k in range(1, len(b)):
+            self.assertTrue(10 <= b[k][0] and b[k][3] <= 20 and 10 <= b[k][1] and b[k][4] <= 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
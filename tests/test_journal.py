@@ -0,0 +1,81 @@
+# python -m unittest discover tests
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gml import GrblCommand
+
+SQUARE = """G21
+G00 Z1.000000
+G00 X10 Y10
+
+G01 Z-0.250000 F100.0(Penetrate)
+G01 X20 Y10 F400
+G01 X20 Y20
+G01 X10 Y20
+G01 X10 Y10
+G00 Z1.000000
+"""
+
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.infile = os.path.join(self.dir.name, "a.nc")
+        with open(self.infile, "w") as f:
+            f.write(SQUARE)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def getText(self, commands) -> list:
+        ret = []
+        c = commands.getFirst()
+        while c:
+            ret.append(str(c))
+            c = c.getNext()
+        return ret
+
+    # rolling back leaves the program as it was before the edit
+    def testRollback(self):
+        commands = GrblCommand.processGrbl(self.infile, os.path.join(self.dir.name, "a_.nc"))
+        before = self.getText(commands)
+        journal = commands.edit()
+        commands.translate(10, 5)
+        commands.scale(2)
+        self.assertNotEqual(before, self.getText(commands))
+        journal.rollback()
+        self.assertEqual(before, self.getText(commands))
+
+    # a journal open in one thread doesn't record edits made in another
+    def testThreads(self):
+        mine = GrblCommand.processGrbl(self.infile, os.path.join(self.dir.name, "a_.nc"))
+        theirs = GrblCommand.processGrbl(self.infile, os.path.join(self.dir.name, "b_.nc"))
+        before = self.getText(mine)
+        opened = threading.Event()
+        edited = threading.Event()
+
+        def other():
+            opened.wait()
+            theirs.translate(10, 5)
+            edited.set()
+
+        t = threading.Thread(target=other)
+        t.start()
+        journal = mine.edit()
+        opened.set()
+        edited.wait()
+        mine.translate(3, 3)
+        self.assertEqual(0, len([c for c, state in journal.saved.values() if c.getFirst() is theirs.getFirst()]))
+        journal.rollback()
+        t.join()
+        self.assertEqual(before, self.getText(mine))
+        self.assertNotEqual(before, self.getText(theirs))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+# python -m unittest discover tests
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gml import GrblCommand
+from gml.level import HeightMap
+
+SQUARE = """G21
+G00 Z1.000000
+G00 X10 Y10
+
+G01 Z-0.250000 F100.0(Penetrate)
+G01 X20 Y10 F400
+G01 X20 Y20
+G01 X10 Y20
+G01 X10 Y10
+G00 Z1.000000
+"""
+
+
+class TestLevel(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.infile = os.path.join(self.dir.name, "a.nc")
+        with open(self.infile, "w") as f:
+            f.write(SQUARE)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def getCuts(self, commands) -> list:
+        ret = []
+        c = commands.getFirst()
+        while c:
+            if c.isCutCommand() and (c.nn("X") or c.nn("Y")): ret.append(c)
+            c = c.getNext()
+        return ret
+
+    # a surface higher than the cut is deep leaves cuts above zero, which
+    # must still be cuts (not lifts) and survive being read back in
+    def testPositiveHeightMap(self):
+        commands = GrblCommand.processGrbl(self.infile, os.path.join(self.dir.name, "a_.nc"))
+        blocks = len(commands.getBlocks())
+        levelled = commands.level(HeightMap([0, 100], [0, 100], np.full((2, 2), 0.4)))
+        cuts = self.getCuts(levelled)
+        self.assertTrue(cuts)
+        for c in cuts:
+            self.assertGreater(c.getZ(), 0)
+            self.assertTrue(c.isLevelledCut())
+            self.assertFalse(c.isEvacuation())
+            self.assertFalse(c.isPenetrate())
+        outfile = os.path.join(self.dir.name, "b.nc")
+        levelled.burp(outfile)
+        again = GrblCommand.processGrbl(outfile, os.path.join(self.dir.name, "b_.nc"))
+        self.assertEqual(blocks, len(again.getBlocks()))
+        self.assertEqual(len(cuts), len(self.getCuts(again)))
+        for c in self.getCuts(again):
+            self.assertFalse(c.isCommand("G00"))
+            self.assertFalse(c.isEvacuation())
+
+    # a plunge without a (Penetrate) comment (ie. written by hand) is not
+    # a cut, only moves across the work are
+    def testPlungeNotLevelled(self):
+        with open(self.infile, "w") as f:
+            f.write(SQUARE.replace("F100.0(Penetrate)", "F100.0"))
+        commands = GrblCommand.processGrbl(self.infile, os.path.join(self.dir.name, "a_.nc"))
+        levelled = commands.level(HeightMap([0, 100], [0, 100], np.full((2, 2), 0.4)))
+        c = levelled.getFirst()
+        plunges = 0
+        while c:
+            if c.isCommand("G01") and not (c.nn("X") or c.nn("Y")):
+                plunges += 1
+                self.assertFalse(c.isLevelledCut())
+            c = c.getNext()
+        self.assertEqual(1, plunges)
+        self.assertTrue(all(c.isLevelledCut() for c in self.getCuts(levelled)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+# python -m unittest discover tests
+import os
+import sys
+import math
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gml import GrblCommand
+from gml.merge import PathMerge
+
+
+class TestMerge(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def slurp(self, text: str) -> GrblCommand:
+        infile = os.path.join(self.dir.name, "a.nc")
+        with open(infile, "w") as f:
+            f.write("G21\nG90\n" + text)
+        return GrblCommand.slurpFile(infile)
+
+    # the cutting moves as (x, y) points
+    @staticmethod
+    def getPoints(commands) -> np.ndarray:
+        ret = []
+        c = commands.getFirst()
+        while c:
+            if c.isCommand("G01") and c.nn("X"): ret.append((c.getX(), c.getY()))
+            c = c.getNext()
+        return np.array(ret)
+
+    # a single move speeds up and slows down at the acceleration, reaching
+    # its feed rate if it is long enough
+    def testEstimateTime(self):
+        a = PathMerge.acceleration
+        v = 10.0
+        commands = self.slurp("G00 X0 Y0\nG01 X100 Y0 F600\n")
+        self.assertAlmostEqual(2 * v / a + (100 - v * v / a) / v, PathMerge.estimateTime(commands.toProgram()))
+        commands = self.slurp("G00 X0 Y0\nG01 X0.1 Y0 F600\n")
+        self.assertAlmostEqual(2 * math.sqrt(a * 0.1) / a, PathMerge.estimateTime(commands.toProgram()))
+
+    # a line wandering by less than the tolerance is merged into a single
+    # move which (without its corners) takes less time
+    def testMerge(self):
+        x = np.arange(0, 10.01, 0.2)
+        y = np.where(np.arange(len(x)) % 2 == 1, 0.008, 0.0)
+        cuts = "".join("G01 X{:.3f} Y{:.3f}\n".format(px, py) for px, py in zip(x[1:], y[1:]))
+        commands = self.slurp("G00 Z1\nG00 X0 Y0\nG01 Z-0.25 F6000\n" + cuts + "G00 Z1\n")
+        merged = commands.merge()
+        meta = merged.getMeta()
+        # (the plunge and then the cuts)
+        self.assertEqual(len(x), meta["segments_before"])
+        self.assertEqual(2, meta["segments_after"])
+        self.assertLess(meta["time_after"], meta["time_before"])
+        self.assertAlmostEqual(meta["time_after"], PathMerge.estimateTime(merged.toProgram()))
+        points = self.getPoints(merged)
+        self.assertEqual([[10.0, 0.0]], points.tolist())
+
+    # corners are kept where the merged move would pass further than the
+    # tolerance from them (here 0.025mm)
+    def testTolerance(self):
+        cuts = "G01 X1 Y0\nG01 X2 Y0.05\nG01 X3 Y0\nG01 X4 Y0\n"
+        merged = self.slurp("G00 Z1\nG00 X0 Y0\nG01 Z-0.25 F6000\n" + cuts + "G00 Z1\n").merge()
+        self.assertEqual([[1.0, 0.0], [2.0, 0.05], [3.0, 0.0], [4.0, 0.0]], self.getPoints(merged).tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
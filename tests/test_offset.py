@@ -0,0 +1,68 @@
+# python -m unittest discover tests
+import os
+import sys
+import math
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gml import GrblCommand
+from gml.offset import PathOffset
+
+SQUARE = """G21
+G00 Z1.000000
+G00 X10 Y10
+
+G01 Z-0.250000 F100.0(Penetrate)
+G01 X20 Y10 F400
+G01 X20 Y20
+G01 X10 Y20
+G01 X10 Y10
+G00 Z1.000000
+"""
+
+
+class TestOffset(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.infile = os.path.join(self.dir.name, "a.nc")
+        with open(self.infile, "w") as f:
+            f.write(SQUARE)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    # a square of side s offset by r has side s + 2r whatever the join,
+    # the corners being square (miter), cut off (bevel) or quarter circles (round)
+    def testSquare(self):
+        s, r = 10.0, 1.0
+        square = PathOffset([0, s, s, 0, 0], [0, 0, s, s, 0], [PathOffset.LINE] * 4, [0] * 4, [0] * 4)
+        areas = {"miter": (s + 2 * r) ** 2, "bevel": (s + 2 * r) ** 2 - 2 * r * r, "round": s * s + 4 * s * r + math.pi * r * r}
+        for join, area in areas.items():
+            paths = square.offset(r, join)
+            self.assertEqual(1, len(paths))
+            p = paths[0]
+            self.assertTrue(p.isClosed())
+            for v in [p.x.min(), p.y.min()]:
+                self.assertAlmostEqual(-r, v)
+            for v in [p.x.max(), p.y.max()]:
+                self.assertAlmostEqual(s + r, v)
+            self.assertAlmostEqual(area, abs(p.getArea()))
+        self.assertEqual(4, len([k for k in square.offset(r, "round")[0].kind if k != PathOffset.LINE]))
+        # inwards the corners stay square, and the square vanishes once r reaches half of s
+        inner = square.offset(-r)[0]
+        self.assertAlmostEqual((s - 2 * r) ** 2, abs(inner.getArea()))
+        self.assertEqual([], square.offset(-s / 2 - r))
+
+    # offsetting a program offsets each of its blocks
+    def testProgram(self):
+        commands = GrblCommand.processGrbl(self.infile, os.path.join(self.dir.name, "a_.nc"))
+        for r in [2.0, -2.0]:
+            b = commands.offset(r, "miter").toProgram().getBlockBounds()
+            self.assertEqual(1, len(b))
+            self.assertEqual([10 - r, 10 - r, 20 + r, 20 + r], [b[0][0], b[0][1], b[0][3], b[0][4]])
+
+
+if __name__ == "__main__":
+    unittest.main()
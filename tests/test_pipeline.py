@@ -0,0 +1,90 @@
+# python -m unittest discover tests
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gml import GrblCommand
+from gml.pipeline import GrblPipeline
+
+# a square and a circle (as two arcs)
+SHAPES = """G21
+G00 Z1.000000
+G00 X10 Y10
+
+G01 Z-0.250000 F100.0(Penetrate)
+G01 X20 Y10 F400
+G01 X20 Y20
+G01 X10 Y20
+G01 X10 Y10
+G00 Z1.000000
+G00 X34 Y15
+
+G01 Z-0.250000 F100.0(Penetrate)
+G02 X26 Y15 I-4 J0 F400
+G02 X34 Y15 I4 J0
+G00 Z1.000000
+"""
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.infile = os.path.join(self.dir.name, "a.nc")
+        with open(self.infile, "w") as f:
+            f.write(SHAPES)
+        self.commands = GrblCommand.processGrbl(self.infile, os.path.join(self.dir.name, "a_.nc"))
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    @staticmethod
+    def getText(commands) -> list:
+        ret = []
+        c = commands.getFirst()
+        while c:
+            ret.append(str(c))
+            c = c.getNext()
+        return ret
+
+    # the result of each pass applied to the whole program in turn
+    def applyEach(self, passes) -> list:
+        commands = self.commands.__deepcopy__().getFirst()
+        for name, args in passes:
+            foo = getattr(commands, name)(*args)
+            if foo: commands = foo.getFirst()
+        return self.getText(commands)
+
+    # fusing the line passes into one walk gives the same program as
+    # applying them one after the other
+    def testLinePasses(self):
+        passes = [("setCutSpeed", [120]), ("setFastTravelSpeed", [900]), ("setEvacuateHeight", [2]), ("setPenetrateSpeed", [40]),
+                  ("setPenetrateDepth", [0.5]), ("translate", [3, -2]), ("scale", [1.5])]
+        expected = self.applyEach(passes)
+        self.assertNotEqual(self.getText(self.commands), expected)
+        pipeline = GrblPipeline(passes)
+        self.assertEqual(1, pipeline.getWalks())
+        self.assertEqual(expected, self.getText(pipeline.run(self.commands.__deepcopy__())))
+
+    # passes on the whole program split the line passes into separate walks
+    def testWholePasses(self):
+        passes = [("translate", [3, -2]), ("setPenetrateDepth", [0.5]), ("offset", [1.0]), ("scale", [2]), ("setCutSpeed", [150])]
+        expected = self.applyEach(passes)
+        pipeline = GrblPipeline(passes)
+        self.assertEqual(2, pipeline.getWalks())
+        self.assertEqual(expected, self.getText(pipeline.run(self.commands.__deepcopy__())))
+
+    def testLoad(self):
+        filename = os.path.join(self.dir.name, "pipeline.txt")
+        with open(filename, "w") as f:
+            f.write("# pipeline.txt\nsetCutSpeed 150\n\ntranslate 10 10\nscale 2 # twice the size\n")
+        pipeline = GrblPipeline.load(filename)
+        self.assertEqual([("setCutSpeed", [150]), ("translate", [10, 10]), ("scale", [2])], pipeline.passes)
+        with self.assertRaises(ValueError):
+            GrblPipeline([("noSuchPass", [])])
+
+
+if __name__ == "__main__":
+    unittest.main()
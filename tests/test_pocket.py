@@ -0,0 +1,63 @@
+# python -m unittest discover tests
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gml.offset import PathOffset
+from gml.fill import PathFill
+from gml.pocket import PathPocket
+
+
+def circle(cx, cy, r) -> PathOffset:
+    return PathOffset([cx + r, cx - r, cx + r], [cy, cy, cy], [PathOffset.CCW] * 2, [cx] * 2, [cy] * 2)
+
+
+class TestPocket(unittest.TestCase):
+
+    def setUp(self):
+        self.outline = PathOffset([0, 12, 12, 0, 0], [0, 0, 10, 10, 0], [PathOffset.LINE] * 4, [0] * 4, [0] * 4)
+        # (cx, cy, r)
+        self.holes = [(6, 5, 2), (2, 8, 1)]
+        self.step = 0.3
+
+    # the points (every 0.05mm) along each strand
+    @staticmethod
+    def getPoints(strands) -> tuple:
+        xs, ys = [], []
+        for s in strands:
+            x, y = s.linearise(0.001)[:2]
+            for k in range(len(x) - 1):
+                n = max(2, int(np.hypot(x[k + 1] - x[k], y[k + 1] - y[k]) / 0.05) + 1)
+                xs.append(np.linspace(x[k], x[k + 1], n))
+                ys.append(np.linspace(y[k], y[k + 1], n))
+        return (np.concatenate(xs), np.concatenate(ys))
+
+    # the cuts (rings and the moves between them) stay inside the pocket
+    # and out of the holes, and every point of the pocket is within a step of a cut
+    def testHoles(self):
+        strands = PathPocket.pocket(self.outline, self.step, [circle(*h) for h in self.holes])
+        self.assertTrue(strands)
+        x, y = self.getPoints(strands)
+        # (holes are clipped as lines within chord_tolerance of their arcs)
+        tol = PathFill.chord_tolerance
+        self.assertTrue(np.all((x > -tol) & (x < 12 + tol) & (y > -tol) & (y < 10 + tol)))
+        for cx, cy, r in self.holes:
+            self.assertTrue(np.all(np.hypot(x - cx, y - cy) > r - tol))
+        gx, gy = [v.ravel() for v in np.meshgrid(np.arange(0.5, 12, 0.5), np.arange(0.5, 10, 0.5))]
+        outside = np.ones(len(gx), dtype=bool)
+        for cx, cy, r in self.holes:
+            outside &= np.hypot(gx - cx, gy - cy) > r + self.step
+        gx, gy = gx[outside], gy[outside]
+        nearest = np.min(np.hypot(gx[:, None] - x[None, :], gy[:, None] - y[None, :]), axis=1)
+        self.assertTrue(np.all(nearest <= self.step))
+
+    # rings are joined so a square pocket (with nothing to go around) is a single strand
+    def testSquare(self):
+        strands = PathPocket.pocket(self.outline, self.step)
+        self.assertEqual(1, len(strands))
+
+
+if __name__ == "__main__":
+    unittest.main()
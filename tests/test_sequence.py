@@ -0,0 +1,82 @@
+# python -m unittest discover tests
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gml import GrblCommand
+from gml.sequence import CommandSequence
+
+
+class TestSequence(unittest.TestCase):
+
+    def setUp(self):
+        # small chunks so edits split, refill and rebuild them often
+        self.chunk_size = CommandSequence.chunk_size
+        CommandSequence.chunk_size = 3
+        self.random = random.Random(1)
+
+    def tearDown(self):
+        CommandSequence.chunk_size = self.chunk_size
+
+    # the chain as a list, walked along the links from the first command
+    @staticmethod
+    def walk(first) -> list:
+        ret = []
+        c = first
+        while c:
+            ret.append(c)
+            c = c.next
+        return ret
+
+    def check(self, first):
+        chain = self.walk(first)
+        self.assertEqual(len(chain), first.getLength())
+        for k in self.random.sample(range(len(chain)), min(20, len(chain))):
+            c = chain[k]
+            self.assertEqual(k, c.getIndex())
+            self.assertIs(c, first.getAt(k))
+            self.assertIs(first, c.getFirst())
+            self.assertIs(chain[-1], c.getLast())
+            self.assertEqual(len(chain) - k, c.getLength())
+        self.assertIsNone(first.getAt(len(chain)))
+
+    # getIndex and getAt agree with walking the chain through random inserts and removals
+    def testEdits(self):
+        first = GrblCommand("G01 X0 Y0")
+        c = first
+        for i in range(1, 200):
+            c = c.append("G01 X" + str(i) + " Y0")
+        self.check(first)
+        for step in range(1000):
+            chain = self.walk(first)
+            t = chain[self.random.randrange(len(chain))]
+            op = self.random.random()
+            if op < 0.3:
+                t.insertObjectAfter(GrblCommand("G01 X5 Y5"))
+            elif op < 0.5:
+                t.insertObjectBefore(GrblCommand("G01 X5 Y5"))
+                if t is first: first = first.previous
+            elif op < 0.8 and len(chain) > 3:
+                if t is first: first = first.next
+                t.delete()
+            elif op < 0.9:
+                a = GrblCommand("G01 X7 Y7")
+                a.append("G01 X8 Y8").append("G01 X9 Y9")
+                chain[-1].appendObject(a)
+            else:
+                first.prependObject(GrblCommand("G01 X6 Y6"))
+                first = first.previous
+            if step % 10 == 0: self.check(first)
+        self.check(first)
+        # a deleted command is no longer part of the chain
+        t = first.getAt(10)
+        after = t.next
+        t.delete()
+        self.assertIs(after, first.getAt(10))
+        self.assertEqual(10, after.getIndex())
+
+
+if __name__ == "__main__":
+    unittest.main()
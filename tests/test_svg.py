@@ -0,0 +1,86 @@
+# python -m unittest discover tests
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gml.svgread import GrblSvgReader
+
+# a 20mm page with a rect and a circle, and the same again moved by a
+# transform and drawn in a viewBox of half the size (so twice as large)
+SHAPES = """<svg xmlns="http://www.w3.org/2000/svg" width="20mm" height="20mm" viewBox="0 0 {0} {0}">
+<g transform="translate({1},{2})">
+<rect x="1" y="1" width="12" height="10"/><circle cx="6" cy="5" r="2"/>
+</g>
+</svg>
+"""
+
+
+class TestSvg(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def read(self, box, dx, dy):
+        infile = os.path.join(self.dir.name, "a.svg")
+        with open(infile, "w") as f:
+            f.write(SHAPES.format(box, dx, dy))
+        return GrblSvgReader.read(infile).toCommands()
+
+    # the moves of each block as (G, X, Y, I, J) rounded to 1/1000mm
+    @staticmethod
+    def getMoves(commands) -> list:
+        ret = []
+        c = commands.getFirst()
+        while c:
+            if c.nn("X") and c.nn("Y") and not c.isCommand("G00"):
+                ret.append((c.vals["G"],) + tuple(round(c.vals[p], 3) if c.nn(p) else None for p in ["X", "Y", "I", "J"]))
+            c = c.getNext()
+        return ret
+
+    # shapes are in mm from the bottom left of the page, circles are arcs
+    def testShapes(self):
+        moves = self.getMoves(self.read(20, 0, 0))
+        # the rect from its top left corner (y flipped), then the circle
+        # as two clockwise (once flipped) half circles about (6, 15)
+        self.assertEqual([
+            (1, 13.0, 19.0, None, None), (1, 13.0, 9.0, None, None), (1, 1.0, 9.0, None, None), (1, 1.0, 19.0, None, None),
+            (2, 4.0, 15.0, -2.0, 0.0), (2, 8.0, 15.0, 2.0, 0.0),
+        ], moves)
+
+    # transforms and the viewBox scale and move the shapes (the page is
+    # now 10 units high, so y = 2 * (10 - y))
+    def testTransform(self):
+        moves = self.getMoves(self.read(10, 1, -1))
+        self.assertEqual([
+            (1, 28.0, 20.0, None, None), (1, 28.0, 0.0, None, None), (1, 4.0, 0.0, None, None), (1, 4.0, 20.0, None, None),
+            (2, 10.0, 12.0, -4.0, 0.0), (2, 18.0, 12.0, 4.0, 0.0),
+        ], moves)
+
+    # béziers become lines within tolerance of the curve
+    def testBezier(self):
+        infile = os.path.join(self.dir.name, "a.svg")
+        with open(infile, "w") as f:
+            f.write('<svg xmlns="http://www.w3.org/2000/svg" width="20mm" height="20mm" viewBox="0 0 20 20"><path d="M 1 11 C 1 5 5 1 11 1"/></svg>')
+        moves = self.getMoves(GrblSvgReader.read(infile).toCommands())
+        self.assertGreater(len(moves), 2)
+        self.assertTrue(all(m[0] == 1 for m in moves))
+        t = np.linspace(0, 1, 100001)[:, None]
+        p = [np.array([1, 9]), np.array([1, 15]), np.array([5, 19]), np.array([11, 19])]
+        curve = (1 - t) ** 3 * p[0] + 3 * (1 - t) ** 2 * t * p[1] + 3 * (1 - t) * t * t * p[2] + t ** 3 * p[3]
+        x = np.array([m[1] for m in moves])
+        y = np.array([m[2] for m in moves])
+        # the midpoints of the lines are furthest from the curve
+        for px, py in [(x, y), ((x[1:] + x[:-1]) / 2, (y[1:] + y[:-1]) / 2)]:
+            far = np.max(np.min(np.hypot(curve[:, 0][None, :] - px[:, None], curve[:, 1][None, :] - py[:, None]), axis=1))
+            self.assertLess(far, GrblSvgReader.tolerance + 0.001)
+        self.assertEqual((11.0, 19.0), (x[-1], y[-1]))
+
+
+if __name__ == "__main__":
+    unittest.main()